@@ -0,0 +1,287 @@
+"""Columnar analytics export and the distributions computed from it.
+
+The export streams `wishes` and `payment_transactions` out of MongoDB in
+chunks, month by month along the created_at index, into Parquet files
+partitioned Hive-style by month:
+
+    analytics/
+      manifest.json
+      exports/20250601T020000-3f2a.../
+        wishes/month=2025-06/part-0.parquet
+        payment_transactions/month=2025-06/part-0.parquet
+
+Every export goes into a directory of its own; once it is complete a single
+os.replace of manifest.json points readers at it, so they never see half a
+dataset or a mix of two exports. The previous export is kept for readers
+still on it, older ones are removed. Names, emails and PayPal ids are left
+out. Run it from cron:
+
+    python analytics.py --out analytics --chunk-size 5000
+
+summarize() answers /api/admin/analytics from those files with numpy,
+without touching the live database.
+"""
+import argparse
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+MANIFEST = "manifest.json"
+EXPORTS = "exports"
+
+SCHEMAS = {
+    "wishes": pa.schema([
+        ("id", pa.string()),
+        ("category", pa.string()),
+        ("urgency", pa.string()),
+        ("currency", pa.string()),
+        ("amount_needed", pa.float64()),
+        ("donations_received", pa.float64()),
+        ("donor_count", pa.int64()),
+        ("fulfillment_percentage", pa.float64()),
+        ("status", pa.string()),
+        ("payment_status", pa.string()),
+        ("created_at", pa.timestamp("ms")),
+        ("fulfilled_at", pa.timestamp("ms")),
+    ]),
+    "payment_transactions": pa.schema([
+        ("id", pa.string()),
+        ("purpose", pa.string()),
+        ("status", pa.string()),
+        ("amount", pa.float64()),
+        ("currency", pa.string()),
+        ("wish_id", pa.string()),
+        ("items", pa.list_(pa.struct([("wish_id", pa.string()), ("amount", pa.float64())]))),
+        ("created_at", pa.timestamp("ms")),
+        ("updated_at", pa.timestamp("ms")),
+    ]),
+}
+
+DONATION_PERCENTILES = [10, 25, 50, 75, 90, 99]
+FULFILLMENT_PERCENTILES = [25, 50, 75, 90]
+
+
+# Export
+def _month_starts(collection):
+    """First instant of every month between the oldest and newest created_at"""
+    oldest = collection.find_one({"created_at": {"$exists": True}}, {"created_at": 1}, sort=[("created_at", 1)])
+    newest = collection.find_one({"created_at": {"$exists": True}}, {"created_at": 1}, sort=[("created_at", -1)])
+    if oldest is None:
+        return
+    year, month = oldest["created_at"].year, oldest["created_at"].month
+    while (year, month) <= (newest["created_at"].year, newest["created_at"].month):
+        yield datetime(year, month, 1)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _next_month(start: datetime) -> datetime:
+    return datetime(start.year + 1, 1, 1) if start.month == 12 else datetime(start.year, start.month + 1, 1)
+
+
+def export_collection(collection, schema: pa.Schema, directory: str, chunk_size: int) -> dict:
+    """Write one Parquet file per month, `chunk_size` documents per row group"""
+    fields = schema.names
+    projection = {"_id": 0, **{field: 1 for field in fields}}
+    counts = {}
+    for start in _month_starts(collection):
+        cursor = collection.find(
+            {"created_at": {"$gte": start, "$lt": _next_month(start)}}, projection
+        ).batch_size(chunk_size)
+        writer = None
+        columns = {field: [] for field in fields}
+        rows = 0
+        for document in cursor:
+            for field in fields:
+                columns[field].append(document.get(field))
+            rows += 1
+            if len(columns["id"]) == chunk_size:
+                writer = _write_chunk(writer, columns, schema, directory, start)
+        if columns["id"]:
+            writer = _write_chunk(writer, columns, schema, directory, start)
+        if writer:
+            writer.close()
+            counts[start.strftime("%Y-%m")] = rows
+    return counts
+
+
+def _write_chunk(writer, columns: dict, schema: pa.Schema, directory: str, month: datetime):
+    if writer is None:
+        partition = os.path.join(directory, f"month={month.strftime('%Y-%m')}")
+        os.makedirs(partition, exist_ok=True)
+        writer = pq.ParquetWriter(os.path.join(partition, "part-0.parquet"), schema, compression="zstd")
+    writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+    for values in columns.values():
+        values.clear()
+    return writer
+
+
+def export(db, root: str, chunk_size: int = 5000) -> dict:
+    """Export every dataset into a new directory under `root` and swap it in, returns the manifest"""
+    started = datetime.utcnow()
+    version = f"{started:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    directory = os.path.join(root, EXPORTS, version)
+    os.makedirs(directory)
+    manifest = {
+        "exported_at": started.isoformat(),
+        "chunk_size": chunk_size,
+        "directory": os.path.join(EXPORTS, version),
+        "datasets": {}
+    }
+    try:
+        for name, schema in SCHEMAS.items():
+            months = export_collection(db[name], schema, os.path.join(directory, name), chunk_size)
+            manifest["datasets"][name] = {"rows": sum(months.values()), "months": months}
+        previous = read_manifest(root)
+        with open(os.path.join(root, f"{MANIFEST}.tmp"), "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(os.path.join(root, f"{MANIFEST}.tmp"), os.path.join(root, MANIFEST))
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    keep = {version, os.path.basename(previous.get("directory", "")) if previous else ""}
+    for entry in os.listdir(os.path.join(root, EXPORTS)):
+        if entry not in keep:
+            shutil.rmtree(os.path.join(root, EXPORTS, entry), ignore_errors=True)
+    return manifest
+
+
+# Analysis
+def read_manifest(root: str):
+    try:
+        with open(os.path.join(root, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def load(root: str, name: str, columns: list, since: str = None, until: str = None,
+         manifest: dict = None) -> pa.Table:
+    """Columns of one dataset of the export `manifest` names (default the current one),
+    reading only the month partitions in [since, until]"""
+    manifest = manifest or read_manifest(root) or {}
+    directory = os.path.join(root, manifest.get("directory", ""), name)
+    months = sorted(entry[len("month="):] for entry in os.listdir(directory)) if os.path.isdir(directory) else []
+    tables = [
+        pq.read_table(os.path.join(directory, f"month={month}"), columns=columns)
+        for month in months
+        if (since is None or month >= since) and (until is None or month <= until)
+    ]
+    if not tables:
+        return SCHEMAS[name].empty_table().select(columns)
+    return pa.concat_tables(tables)
+
+
+def _percentiles(values: np.ndarray, percentiles: list) -> dict:
+    if not len(values):
+        return {f"p{p}": None for p in percentiles}
+    return {f"p{p}": round(float(value), 2) for p, value in zip(percentiles, np.percentile(values, percentiles))}
+
+
+def donation_sizes(transactions: pa.Table, fx, currency: str) -> dict:
+    """Percentiles of single donations (cart items count separately) in `currency`"""
+    completed = transactions.filter(pc.equal(transactions["status"], "completed"))
+    single = completed.filter(pc.equal(completed["purpose"], "donation"))
+    carts = completed.filter(pc.equal(completed["purpose"], "cart"))
+    items = pc.list_flatten(carts["items"])
+    amounts = np.concatenate([
+        single["amount"].to_numpy(zero_copy_only=False),
+        pc.struct_field(items, "amount").to_numpy(zero_copy_only=False) if len(items) else np.array([])
+    ]).astype(float)
+    item_counts = pc.list_value_length(carts["items"]).to_numpy(zero_copy_only=False)
+    currencies = np.concatenate([
+        single["currency"].to_numpy(zero_copy_only=False),
+        np.repeat(carts["currency"].to_numpy(zero_copy_only=False), item_counts)
+    ]).astype(str)
+    currencies = np.char.upper(currencies)
+
+    codes, inverse = np.unique(currencies, return_inverse=True)
+    converted = amounts * fx.factors(codes.tolist(), currency)[inverse] if len(amounts) else amounts
+    known = ~np.isnan(converted)
+    values = converted[known]
+    return {
+        "count": int(len(values)),
+        "total": round(float(values.sum()), 2),
+        "mean": round(float(values.mean()), 2) if len(values) else None,
+        **_percentiles(values, DONATION_PERCENTILES),
+        "unconverted": int((~known).sum())
+    }
+
+
+def time_to_fulfillment(wishes: pa.Table) -> dict:
+    """Hours from creation to fulfillment, over wishes that record fulfilled_at"""
+    fulfilled = wishes.filter(pc.is_valid(wishes["fulfilled_at"]))
+    hours = (fulfilled["fulfilled_at"].to_numpy(zero_copy_only=False)
+             - fulfilled["created_at"].to_numpy(zero_copy_only=False)) / np.timedelta64(1, "h")
+    return {
+        "count": int(len(hours)),
+        "mean_hours": round(float(hours.mean()), 1) if len(hours) else None,
+        **{key: value if value is None else round(value, 1)
+           for key, value in _percentiles(hours, FULFILLMENT_PERCENTILES).items()}
+    }
+
+
+def category_conversion(wishes: pa.Table) -> list:
+    """Per category: created -> posting fee paid -> fulfilled"""
+    categories = np.array(wishes["category"].to_numpy(zero_copy_only=False), dtype=str)
+    paid = np.array(wishes["payment_status"].to_numpy(zero_copy_only=False), dtype=str) == "paid"
+    fulfilled = paid & (np.array(wishes["status"].to_numpy(zero_copy_only=False), dtype=str) == "fulfilled")
+    names, inverse, created = np.unique(categories, return_inverse=True, return_counts=True)
+    paid_counts = np.bincount(inverse, weights=paid, minlength=len(names))
+    fulfilled_counts = np.bincount(inverse, weights=fulfilled, minlength=len(names))
+    paid_rate = paid_counts / created
+    fulfilled_rate = fulfilled_counts / np.maximum(paid_counts, 1)
+    return [
+        {
+            "category": str(name),
+            "created": int(created[index]),
+            "paid": int(paid_counts[index]),
+            "fulfilled": int(fulfilled_counts[index]),
+            "paid_rate": round(float(paid_rate[index]), 3),
+            "fulfillment_rate": round(float(fulfilled_rate[index]), 3)
+        }
+        for index, name in enumerate(names)
+    ]
+
+
+def summarize(root: str, fx, currency: str, since: str = None, until: str = None, manifest: dict = None) -> dict:
+    # Both datasets from the same export, even if a new one is swapped in meanwhile
+    manifest = manifest or read_manifest(root)
+    transactions = load(root, "payment_transactions", ["purpose", "status", "amount", "currency", "items"],
+                        since, until, manifest)
+    wishes = load(root, "wishes", ["category", "status", "payment_status", "created_at", "fulfilled_at"],
+                  since, until, manifest)
+    return {
+        "currency": currency,
+        "since": since,
+        "until": until,
+        "donation_size": donation_sizes(transactions, fx, currency),
+        "time_to_fulfillment": time_to_fulfillment(wishes),
+        "categories": category_conversion(wishes)
+    }
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Export wishes and payment transactions to Parquet")
+    parser.add_argument("--out", default=os.environ.get('ANALYTICS_DIR', 'analytics'))
+    parser.add_argument("--chunk-size", type=int, default=5000, help="documents per cursor batch and row group")
+    args = parser.parse_args()
+
+    client = MongoClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017'))
+    manifest = export(client[os.environ.get('MONGO_DB_NAME', 'wishplatform')], args.out, chunk_size=args.chunk_size)
+    for name, dataset in manifest["datasets"].items():
+        print(f"Exported {dataset['rows']} {name} in {len(dataset['months'])} monthly partitions")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Streaming risk scores for payment attempts.
+
+Card testing and similar probes come in bursts: many payments created from
+one client, many tiny donations from one PayPal payer, a flood of tiny
+donations to one wish. The scorer keeps the latest events of every client,
+payer and wish in fixed-size NumPy ring buffers (one row of `depth` slots
+per key, least recently seen keys evicted), so scoring an event is a few
+vector operations on one short row.
+
+Every signal is a value in [0, 1]; they combine as independent evidence,
+score = 1 - prod(1 - signal). Windows live in each worker's memory.
+"""
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Which signals count for which kind of key: a popular wish legitimately
+# gets many donations, only a run of tiny ones is suspicious
+SIGNALS = {
+    "client": ("velocity", "burst"),
+    "payer": ("velocity", "burst", "tiny"),
+    "wish": ("tiny",),
+}
+
+
+class RollingWindows:
+    """Last `depth` (time, amount) events for up to `capacity` keys"""
+
+    def __init__(self, capacity: int, depth: int):
+        self.capacity = capacity
+        self.depth = depth
+        self.times = np.full((capacity, depth), -np.inf)
+        self.amounts = np.zeros((capacity, depth), dtype=np.float32)
+        self.written = np.zeros(capacity, dtype=np.int64)
+        self.slots = OrderedDict()  # key -> row, least recently seen first
+
+    def observe(self, key, at: float, amount: float):
+        """Record an event, returns the key's (times, amounts) rows including it"""
+        slot = self.slots.pop(key, None)
+        if slot is None:
+            if len(self.slots) < self.capacity:
+                slot = len(self.slots)
+            else:
+                _, slot = self.slots.popitem(last=False)
+            self.times[slot] = -np.inf
+            self.amounts[slot] = 0
+            self.written[slot] = 0
+        self.slots[key] = slot
+        position = self.written[slot] % self.depth
+        self.written[slot] += 1
+        self.times[slot, position] = at
+        self.amounts[slot, position] = amount
+        return self.times[slot], self.amounts[slot]
+
+
+class RiskScorer:
+    def __init__(self, window: float = 600.0, max_events: int = 10, burst_gap: float = 2.0,
+                 tiny_amount: float = 1.0, depth: int = 32, capacity: int = 10000):
+        self.window = window
+        self.max_events = max_events
+        self.burst_gap = burst_gap
+        self.tiny_amount = tiny_amount
+        # Deep enough to see twice max_events, where velocity saturates
+        depth = max(depth, 2 * max_events)
+        self.windows = {kind: RollingWindows(capacity, depth) for kind in SIGNALS}
+        self._lock = threading.Lock()
+
+    def assess(self, at: float, amount: float = 0.0, client: str = None, payer: str = None,
+               wish_amounts: dict = None):
+        """Record an attempt and score it, returns (score, {"<kind>.<signal>": value})
+
+        `at` is a timestamp in seconds, amounts are in one reference currency;
+        wish_amounts is {wish_id: amount} for donations.
+        """
+        events = [("client", client, amount), ("payer", payer, amount)]
+        events += [("wish", wish_id, wish_amount) for wish_id, wish_amount in (wish_amounts or {}).items()]
+        signals = {}
+        with self._lock:
+            for kind, key, value in events:
+                if key is None:
+                    continue
+                times, amounts = self.windows[kind].observe(key, at, value)
+                for name, signal in self._signals(kind, times, amounts, at).items():
+                    signals[f"{kind}.{name}"] = max(signal, signals.get(f"{kind}.{name}", 0.0))
+        score = 1.0 - math.prod(1.0 - signal for signal in signals.values())
+        return round(score, 3), {name: round(signal, 3) for name, signal in signals.items() if signal > 0}
+
+    def _signals(self, kind: str, times: np.ndarray, amounts: np.ndarray, at: float) -> dict:
+        recent = times > at - self.window
+        count = int(np.count_nonzero(recent))
+        signals = {}
+        for name in SIGNALS[kind]:
+            if name == "velocity":
+                # Nothing up to max_events in the window, certain at twice that
+                signals[name] = min(max(count - self.max_events, 0) / self.max_events, 1.0)
+            elif name == "burst":
+                # Events less than burst_gap apart; one double click is fine
+                ordered = np.sort(times[recent])
+                short = int(np.count_nonzero(ordered[1:] - ordered[:-1] < self.burst_gap))
+                signals[name] = min(max(short - 1, 0) / 4, 1.0)
+            elif name == "tiny":
+                tiny = int(np.count_nonzero(recent & (amounts < self.tiny_amount)))
+                signals[name] = min(max(tiny - 2, 0) / 4, 1.0)
+        return signals
+
+    def stats(self) -> dict:
+        return {kind: len(windows.slots) for kind, windows in self.windows.items()}
@@ -0,0 +1,64 @@
+import threading
+import time
+
+
+class LocalCache:
+    """Per-worker cache of computed API responses, grouped by namespace.
+
+    Entries expire after `ttl` seconds as a safety net, but the normal path is
+    explicit invalidation: the worker that handles a write invalidates right
+    away and the change-stream watcher does the same in every other worker.
+    Each namespace carries a generation number so a value computed before an
+    invalidation is never stored after it.
+    """
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._generations = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def generation(self, namespace: str) -> tuple:
+        return self._epoch, self._generations.get(namespace, 0)
+
+    def get(self, namespace: str, key=None):
+        entry = self._entries.get((namespace, key))
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._entries.pop((namespace, key), None)
+            return None
+        return value
+
+    def set(self, namespace: str, key, value, generation: tuple = None):
+        with self._lock:
+            if generation is not None and generation != self.generation(namespace):
+                return
+            if len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)), None)
+            self._entries[(namespace, key)] = (time.monotonic() + self.ttl, value)
+
+    def get_or_compute(self, namespace: str, key, compute):
+        value = self.get(namespace, key)
+        if value is None:
+            generation = self.generation(namespace)
+            value = compute()
+            self.set(namespace, key, value, generation)
+        return value
+
+    def invalidate(self, *namespaces: str):
+        with self._lock:
+            for namespace in namespaces:
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            self._entries = {
+                entry_key: entry for entry_key, entry in self._entries.items()
+                if entry_key[0] not in namespaces
+            }
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries = {}
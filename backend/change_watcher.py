@@ -0,0 +1,113 @@
+"""Cross-worker cache invalidation driven by MongoDB change streams.
+
+Every API worker runs one ChangeStreamWatcher. It follows inserts, updates
+and deletes on the watched collections and invalidates the matching
+namespaces of the worker's LocalCache, so a write handled by one worker is
+visible to all others within milliseconds instead of after the cache TTL.
+
+Change streams need a replica set. To try it locally, start a single-node
+replica set and point MONGO_URL at it:
+
+    mongod --replSet rs0 --dbpath /tmp/rs0 --port 27017
+    mongosh --eval 'rs.initiate()'
+    MONGO_URL="mongodb://localhost:27017/?replicaSet=rs0" python ../scripts/check_change_streams.py
+
+Against a standalone mongod the watcher logs a warning and exits, and caches
+fall back to local invalidation plus TTL expiry.
+
+A worker's cache starts empty, so there is nothing to invalidate from before
+it booted: each watcher opens its stream at "now" and keeps the resume token
+in memory only, to pick up where it left off after a dropped connection.
+"""
+import logging
+import threading
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Error codes meaning the resume token can no longer be used
+RESUME_TOKEN_LOST_CODES = {136, 280, 286}
+CHANGE_STREAMS_UNSUPPORTED_CODE = 40573
+
+
+class ChangeStreamWatcher:
+    """Follow a database change stream and invalidate local cache namespaces"""
+
+    def __init__(self, db, cache, namespaces_by_collection: dict):
+        self.db = db
+        self.cache = cache
+        self.namespaces_by_collection = namespaces_by_collection
+        self._resume_token = None
+        self._stream = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="change-stream-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        stream = self._stream
+        if stream is not None:
+            try:
+                stream.close()
+            except PyMongoError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _pipeline(self):
+        return [
+            {"$match": {"ns.coll": {"$in": list(self.namespaces_by_collection)}}},
+            {"$project": {"ns": 1, "operationType": 1}}
+        ]
+
+    def _run(self):
+        backoff = 0.5
+        while not self._stopped.is_set():
+            try:
+                with self.db.watch(self._pipeline(), resume_after=self._resume_token) as stream:
+                    self._stream = stream
+                    backoff = 0.5
+                    while not self._stopped.is_set() and stream.alive:
+                        change = stream.try_next()
+                        self._resume_token = stream.resume_token
+                        if change is not None:
+                            self._handle(change)
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAMS_UNSUPPORTED_CODE:
+                    logger.warning("Change streams are not supported by this MongoDB deployment; "
+                                   "cross-worker cache invalidation is disabled")
+                    return
+                if e.code in RESUME_TOKEN_LOST_CODES:
+                    logger.warning("Change stream history lost, clearing local caches: %s", e)
+                    self._resume_token = None
+                    self.cache.clear()
+                    continue
+                logger.warning("Change stream failed: %s", e)
+            except PyMongoError as e:
+                if self._stopped.is_set():
+                    break
+                logger.warning("Change stream interrupted: %s", e)
+            finally:
+                self._stream = None
+
+            # We may have missed events while disconnected
+            self.cache.clear()
+            self._stopped.wait(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def _handle(self, change: dict):
+        collection = change.get("ns", {}).get("coll")
+        operation = change.get("operationType")
+        if operation in ("drop", "dropDatabase", "rename", "invalidate"):
+            if operation == "invalidate":
+                # The stream cannot be resumed past an invalidate event
+                self._resume_token = None
+            self.cache.clear()
+            return
+        namespaces = self.namespaces_by_collection.get(collection)
+        if namespaces:
+            self.cache.invalidate(*namespaces)
@@ -0,0 +1,146 @@
+"""gzip / brotli response compression with precompressed cache entries.
+
+CompressionMiddleware compresses any buffered response above a size
+threshold, choosing the encoding from the client's Accept-Encoding. Hot
+cached endpoints go one step further: they store a CachedBody holding the
+encoded JSON and each compressed variant, compressed once on first use, so
+a cache hit only picks the right bytes.
+
+brotli is optional; without it only gzip is offered.
+"""
+import gzip
+import json
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# Preference order when the client accepts several
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+SKIPPED_MEDIA_TYPES = (b"text/event-stream", b"image/", b"video/", b"audio/", b"application/zip")
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def negotiate(accept_encoding: str):
+    """Best supported encoding acceptable to the client, or None"""
+    if not accept_encoding:
+        return None
+    offered = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip()] = quality
+    for encoding in ENCODINGS:
+        if offered.get(encoding, offered.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+class CachedBody:
+    """Encoded JSON body plus lazily built compressed variants"""
+
+    __slots__ = ("identity", "_variants", "minimum_size")
+
+    def __init__(self, content, minimum_size: int = 1024):
+        self.identity = json.dumps(
+            jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+        self.minimum_size = minimum_size
+        self._variants = {}
+
+    def variant(self, encoding):
+        if encoding is None or len(self.identity) < self.minimum_size:
+            return None, self.identity
+        body = self._variants.get(encoding)
+        if body is None:
+            body = self._variants[encoding] = compress(self.identity, encoding)
+        return encoding, body
+
+    def precompress(self):
+        for encoding in ENCODINGS:
+            self.variant(encoding)
+        return self
+
+    def response(self, accept_encoding: str) -> Response:
+        encoding, body = self.variant(negotiate(accept_encoding))
+        headers = {"Vary": "Accept-Encoding"}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers", []))
+        encoding = negotiate(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def compressing_send(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                response_headers = dict(message.get("headers", []))
+                content_type = response_headers.get(b"content-type", b"")
+                if (b"content-encoding" in response_headers
+                        or any(content_type.startswith(skipped) for skipped in SKIPPED_MEDIA_TYPES)):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+            if message["type"] == "http.response.body":
+                body = message.get("body", b"")
+                if message.get("more_body", False) or len(body) < self.minimum_size:
+                    # Streaming or small responses go out as they are
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressed = compress(body, encoding)
+                vary = [value for name, value in start_message.get("headers", []) if name == b"vary"]
+                response_headers = [
+                    (name, value) for name, value in start_message.get("headers", [])
+                    if name not in (b"content-length", b"vary")
+                ]
+                response_headers += [
+                    (b"content-encoding", encoding.encode()),
+                    (b"content-length", str(len(compressed)).encode()),
+                    (b"vary", b", ".join(vary + [b"Accept-Encoding"])),
+                ]
+                await send({**start_message, "headers": response_headers})
+                await send({"type": "http.response.body", "body": compressed})
+                return
+            await send(message)
+
+        await self.app(scope, receive, compressing_send)
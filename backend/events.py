@@ -0,0 +1,183 @@
+import asyncio
+import json
+import logging
+import threading
+from datetime import datetime
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+def format_sse(event: str, data: dict) -> bytes:
+    """Encode a single Server-Sent Events message"""
+    payload = json.dumps(data, separators=(",", ":"), default=str)
+    return f"event: {event}\ndata: {payload}\n\n".encode()
+
+
+KEEP_ALIVE = b": keep-alive\n\n"
+
+
+def _running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class EventBroadcaster:
+    """Fan out live wish events to every connected SSE client of this worker.
+
+    Each subscriber owns a small bounded queue. Messages are encoded once and
+    the same bytes object is shared by all queues, so an idle connection costs
+    little more than an empty queue. A slow client never blocks the publisher:
+    when its queue is full the oldest message is dropped.
+
+    With a channel, published events go through it and come back to the
+    broadcaster of every worker via publish_local.
+    """
+
+    def __init__(self, queue_size: int = 32, max_subscribers: int = 10000):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.channel = None
+        self._subscribers = set()
+        self._loop = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        if len(self._subscribers) >= self.max_subscribers:
+            raise OverflowError("Too many event stream subscribers")
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        """Remember the worker's event loop so other threads can publish"""
+        self._loop = loop
+
+    def publish(self, event: str, data: dict):
+        """Send an event to the subscribers of every worker, or of this one without a channel"""
+        if self.channel is not None:
+            try:
+                self.channel.publish(event, data)
+                return
+            except PyMongoError as e:
+                logger.warning("Event channel unavailable, publishing locally: %s", e)
+        self.publish_local(event, data)
+
+    def publish_local(self, event: str, data: dict):
+        """Queue an event for this worker's subscribers, from the event loop or any other thread"""
+        if not self._subscribers:
+            return
+        message = format_sse(event, data)
+        loop = self._loop
+        if loop is not None and _running_loop() is not loop:
+            # The queues belong to the loop, hand the message over to it
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(self._deliver, message)
+            return
+        self._deliver(message)
+
+    def _deliver(self, message: bytes):
+        for queue in self._subscribers:
+            if queue.full():
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(message)
+
+    async def stream(self, queue: asyncio.Queue, heartbeat: float):
+        """Yield encoded messages for one subscriber until the client goes away"""
+        try:
+            yield b"retry: 5000\n\n"
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield KEEP_ALIVE
+        finally:
+            self.unsubscribe(queue)
+
+
+class EventChannel:
+    """Relay live events between workers through a capped MongoDB collection.
+
+    publish() inserts one document; every worker tails the collection with an
+    awaitable cursor and hands each event to its local broadcaster. Tailable
+    cursors work on a standalone mongod, no replica set needed. Events
+    published while a worker is disconnected are not replayed to it.
+    """
+
+    def __init__(self, db, name: str = "live_events", size: int = 2 ** 22, max_events: int = 10000):
+        self.db = db
+        self.collection = db[name]
+        self.size = size
+        self.max_events = max_events
+        self._deliver = None
+        self._last_id = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def ensure(self):
+        """Create the capped collection; inserting first would create a plain one"""
+        try:
+            self.db.create_collection(self.collection.name, capped=True, size=self.size, max=self.max_events)
+        except CollectionInvalid:
+            pass
+
+    def publish(self, event: str, data: dict):
+        self.collection.insert_one({"event": event, "data": data, "at": datetime.utcnow()})
+
+    def start(self, deliver):
+        """Call deliver(event, data) from a background thread for every event published from now on"""
+        self._deliver = deliver
+        self.ensure()
+        latest = self.collection.find_one(sort=[("$natural", -1)], projection={"_id": 1})
+        self._last_id = latest["_id"] if latest else None
+        self._thread = threading.Thread(target=self._run, name="event-channel", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        backoff = 0.5
+        while not self._stopped.is_set():
+            try:
+                self._tail()
+                backoff = 0.5
+            except PyMongoError as e:
+                logger.warning("Event channel interrupted: %s", e)
+                backoff = min(backoff * 2, 30)
+            # An empty collection ends the cursor at once, wait before reopening
+            self._stopped.wait(backoff)
+
+    def _tail(self):
+        # _ids of different workers do not sort by insertion, so read in natural
+        # order and skip up to the last event seen
+        skipping = self._last_id is not None
+        cursor = self.collection.find(cursor_type=CursorType.TAILABLE_AWAIT).max_await_time_ms(1000)
+        with cursor:
+            while cursor.alive and not self._stopped.is_set():
+                for document in cursor:
+                    if skipping:
+                        skipping = document["_id"] != self._last_id
+                        continue
+                    self._last_id = document["_id"]
+                    try:
+                        self._deliver(document["event"], document["data"])
+                    except Exception:
+                        logger.exception("Delivering live event %s failed", document["event"])
+                # Everything present was read; the last event seen was evicted if still skipping
+                skipping = False
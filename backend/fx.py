@@ -0,0 +1,123 @@
+"""Exchange rates for reporting totals across currencies.
+
+Wishes raise money in their own currency, so totals are kept per currency
+and converted to the reporting currency only when a statistic is built.
+The rate table is stored in versions in the `fx_rates` collection; every
+worker keeps the latest one in memory and looks for a newer version every
+`refresh_interval` seconds. New versions come from FX_RATES_FILE at
+startup (when its contents changed) or from PUT /api/admin/fx-rates.
+
+A table looks like {"base": "EUR", "rates": {"USD": 1.08, ...}}: units of
+each currency per one unit of the base.
+"""
+import asyncio
+import logging
+from datetime import datetime
+
+import numpy as np
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger("wish-platform.fx")
+
+
+def normalize_table(table: dict) -> dict:
+    """Validated copy of a rate table, raises ValueError"""
+    base = str(table.get("base", "")).upper()
+    if len(base) != 3 or not base.isalpha():
+        raise ValueError("base must be a three-letter currency code")
+    rates = {}
+    for currency, rate in (table.get("rates") or {}).items():
+        currency = str(currency).upper()
+        if len(currency) != 3 or not currency.isalpha():
+            raise ValueError(f"invalid currency code {currency!r}")
+        if not isinstance(rate, (int, float)) or isinstance(rate, bool) or not rate > 0:
+            raise ValueError(f"rate for {currency} must be a positive number")
+        rates[currency] = float(rate)
+    rates[base] = 1.0
+    return {"base": base, "rates": rates}
+
+
+class FxTable:
+    def __init__(self, collection, refresh_interval: float = 60.0):
+        self.collection = collection
+        self.refresh_interval = refresh_interval
+        self.version = 0
+        self.base = None
+        self.updated_at = None
+        self._rates = {}
+
+    def publish(self, table: dict, source: str) -> int:
+        """Store `table` as a new version unless it equals the latest, returns the current version"""
+        table = normalize_table(table)
+        self.refresh()
+        while not (self.base == table["base"] and self._rates == table["rates"]):
+            try:
+                self.collection.insert_one({
+                    "version": self.version + 1,
+                    **table,
+                    "source": source,
+                    "created_at": datetime.utcnow()
+                })
+            except DuplicateKeyError:
+                pass  # another worker published first, compare against that version
+            self.refresh()
+        return self.version
+
+    def refresh(self) -> bool:
+        """Load the latest version if it is newer than ours, returns whether it was"""
+        latest = self.collection.find_one({}, {"version": 1}, sort=[("version", -1)])
+        if latest is None or latest["version"] == self.version:
+            return False
+        table = self.collection.find_one({"version": latest["version"]})
+        self.version = table["version"]
+        self.base = table["base"]
+        self._rates = dict(table["rates"])
+        self.updated_at = table["created_at"]
+        logger.info("Using FX rates version %d (%s)", self.version, table.get("source"))
+        return True
+
+    async def watch(self, on_change):
+        """Background task: pick up versions published by other workers"""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                if await asyncio.to_thread(self.refresh):
+                    on_change()
+            except Exception:
+                logger.exception("FX rate refresh failed")
+
+    def factors(self, currencies, to: str) -> np.ndarray:
+        """Multiplier into `to` for each currency, NaN where there is no rate"""
+        to = to.upper()
+        if to in self._rates:
+            # Through the base currency
+            return np.array([self._rates[to] / self._rates[currency] if currency in self._rates else np.nan
+                             for currency in currencies], dtype=float)
+        return np.array([1.0 if currency == to else np.nan for currency in currencies], dtype=float)
+
+    def convert(self, amounts: dict, to: str):
+        """Sum {currency: amount} in `to`, returns (total, {currency: amount} without a rate)"""
+        totals, unconverted = self.convert_many([amounts], to)
+        return totals[0], unconverted
+
+    def convert_many(self, rows: list, to: str):
+        """convert() for several {currency: amount} rows in one matrix product.
+        
+        Returns ([total per row], {currency: amount} summed over the rows that had no rate).
+        """
+        to = to.upper()
+        currencies = sorted({currency.upper() for row in rows for currency in row})
+        column = {currency: index for index, currency in enumerate(currencies)}
+        amounts = np.zeros((len(rows), len(currencies)))
+        for index, row in enumerate(rows):
+            for currency, amount in row.items():
+                amounts[index, column[currency.upper()]] += amount
+        factors = self.factors(currencies, to)
+        known = ~np.isnan(factors)
+        totals = np.round(amounts[:, known] @ factors[known], 2)
+        unconverted = {currency: round(float(amount), 2)
+                       for currency, amount, ok in zip(currencies, amounts.sum(axis=0), known) if not ok and amount}
+        return totals.tolist(), unconverted
+
+    def snapshot(self) -> dict:
+        return {"version": self.version, "base": self.base, "rates": self._rates, "updated_at": self.updated_at}
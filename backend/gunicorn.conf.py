@@ -0,0 +1,33 @@
+# Gunicorn settings for running the API with several uvicorn workers.
+#
+# The app module is imported once in the master (preload_app) and then
+# forked. server.py opens MongoDB clients and starts background tasks inside
+# its lifespan, so every worker gets its own after the fork. Live events reach
+# the SSE clients of all workers through a capped collection (SSE_SHARED);
+# with it turned off, run a single worker.
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8001')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+# Each worker's own buckets would multiply the rate limits by the worker count
+os.environ.setdefault("RATE_LIMIT_SHARED", "true" if workers > 1 else "false")
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.environ.get("PRELOAD_APP", "true").lower() == "true"
+keepalive = int(os.environ.get("KEEPALIVE_SECONDS", "5"))
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", "30"))
+# Long-lived SSE connections are fine: uvicorn workers are async
+timeout = int(os.environ.get("WORKER_TIMEOUT", "60"))
+accesslog = os.environ.get("ACCESS_LOG")
+
+# Workers share their metrics through this directory, see metrics.py. It is
+# set before the app is imported so every worker picks it up.
+metrics_dir = os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), "wish-platform-metrics"))
+
+
+def on_starting(server):
+    # Counters of a previous run's workers would otherwise stay in the totals
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
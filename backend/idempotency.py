@@ -0,0 +1,134 @@
+"""Idempotency-Key handling for POST endpoints.
+
+The first request with a given key claims it by inserting an in_progress
+record; its response is then stored on the record and replayed to every
+retry carrying the same key. A duplicate arriving while the first request
+is still running waits for it instead of running the handler again. Keys
+are scoped per endpoint, bound to a fingerprint of the request body, and
+expire through a TTL index on `created_at`.
+
+Server errors (5xx) release the key so the client can retry for real;
+client errors (4xx) are stored and replayed like successes.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pymongo.errors import DuplicateKeyError
+
+MAX_KEY_LENGTH = 255
+
+
+def fingerprint(body) -> str:
+    encoded = json.dumps(jsonable_encoder(body), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(self, collection, wait_timeout: float = 30.0, lock_timeout: float = 60.0,
+                 poll_interval: float = 0.05):
+        self.collection = collection
+        self.wait_timeout = wait_timeout
+        # An in_progress record older than this was left by a crashed worker
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+
+    async def run(self, key: str, scope: str, body, handler):
+        """Run `handler()` once per (scope, key); retries get the stored response"""
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+        record_id = f"{scope}:{key}"
+        request_fingerprint = fingerprint(body)
+        deadline = time.monotonic() + self.wait_timeout
+
+        while True:
+            owned, record = self._claim(record_id, request_fingerprint)
+            if owned:
+                break
+            remaining = deadline - time.monotonic()
+            if record is None:
+                # Released or expired between our insert and read, try again
+                if remaining <= 0:
+                    raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+                await asyncio.sleep(min(self.poll_interval, remaining))
+                continue
+            if record["fingerprint"] != request_fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+            if record["state"] == "done":
+                return JSONResponse(
+                    content=record["response"],
+                    status_code=record["status_code"],
+                    headers={"Idempotent-Replayed": "true"}
+                )
+            if remaining <= 0:
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+            # The first request is running on another worker
+            await asyncio.sleep(min(self.poll_interval, remaining))
+
+        try:
+            result = handler()
+        except HTTPException as e:
+            # Server errors and throttling are worth retrying with the same key
+            if e.status_code >= 500 or e.status_code == 429:
+                self._release(record_id)
+            else:
+                self._complete(record_id, e.status_code, {"detail": e.detail})
+            raise
+        except BaseException:
+            self._release(record_id)
+            raise
+        self._complete(record_id, 200, jsonable_encoder(result))
+        return result
+
+    def completed(self, key: str, scope: str) -> bool:
+        """Whether (scope, key) has a stored response, so a request with it
+        is replayed and never runs the handler"""
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return False
+        return self.collection.find_one({"_id": f"{scope}:{key}", "state": "done"}, {"_id": 1}) is not None
+
+    def _claim(self, record_id: str, request_fingerprint: str):
+        """(True, None) if this request now owns the key, else (False, record)"""
+        now = datetime.utcnow()
+        try:
+            self.collection.insert_one({
+                "_id": record_id,
+                "state": "in_progress",
+                "fingerprint": request_fingerprint,
+                "created_at": now,
+                "locked_at": now
+            })
+            return True, None
+        except DuplicateKeyError:
+            pass
+        taken_over = self.collection.find_one_and_update(
+            {
+                "_id": record_id,
+                "state": "in_progress",
+                "fingerprint": request_fingerprint,
+                "locked_at": {"$lt": now - timedelta(seconds=self.lock_timeout)}
+            },
+            {"$set": {"locked_at": now}}
+        )
+        if taken_over is not None:
+            return True, None
+        return False, self.collection.find_one({"_id": record_id})
+
+    def _complete(self, record_id: str, status_code: int, response):
+        self.collection.update_one(
+            {"_id": record_id},
+            {"$set": {
+                "state": "done",
+                "status_code": status_code,
+                "response": response,
+                "completed_at": datetime.utcnow()
+            }}
+        )
+
+    def _release(self, record_id: str):
+        self.collection.delete_one({"_id": record_id, "state": "in_progress"})
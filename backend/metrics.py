@@ -0,0 +1,351 @@
+"""Low-overhead in-process metrics with Prometheus text exposition.
+
+Collectors are plain dictionaries keyed by label values, so recording a
+sample is a lock, a dict lookup and a bisect. Each worker process keeps its
+own registry. With a metrics directory (METRICS_DIR, set up by
+gunicorn.conf.py) every worker also writes a snapshot of it there every few
+seconds, and /metrics on any worker adds up the snapshots of all workers:
+counters and histograms are summed, including those of workers that have
+exited, gauges get a `pid` label and are dropped once their worker is gone.
+"""
+import asyncio
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def dump(self) -> list:
+        with self._lock:
+            return [[list(label_values), value] for label_values, value in self._values.items()]
+
+    def merge(self, dumps: list) -> dict:
+        """Values summed over the dumps of several processes, [(pid, dump, alive)]"""
+        values = {}
+        for _, dump, _ in dumps:
+            for label_values, value in dump:
+                values[tuple(label_values)] = values.get(tuple(label_values), 0.0) + value
+        return values
+
+    def samples(self, values=None, labels=None):
+        values = self._values if values is None else values
+        for label_values, value in list(values.items()):
+            yield f"{self.name}{_format_labels(labels or self.labels, label_values)} {value}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+    def merge(self, dumps: list) -> dict:
+        """One series per live process, told apart by a pid label"""
+        return {
+            (*label_values, str(pid)): value
+            for pid, dump, alive in dumps if alive
+            for label_values, value in dump
+        }
+
+    def samples(self, values=None, labels=None):
+        labels = labels or (self.labels if values is None else self.labels + ("pid",))
+        return super().samples(values, labels)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # per-bucket counts (+Inf last), sum, count
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def dump(self) -> list:
+        with self._lock:
+            return [[list(label_values), list(counts), total, count]
+                    for label_values, (counts, total, count) in self._series.items()]
+
+    def merge(self, dumps: list) -> dict:
+        series = {}
+        for _, dump, _ in dumps:
+            for label_values, counts, total, count in dump:
+                merged = series.setdefault(tuple(label_values), [[0] * len(counts), 0.0, 0])
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+                merged[2] += count
+        return series
+
+    def samples(self, series=None):
+        series = self._series if series is None else series
+        for label_values, (counts, total, count) in list(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, label_values, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, label_values)} {total}"
+            yield f"{self.name}_count{_format_labels(self.labels, label_values)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def dump(self) -> dict:
+        return {metric.name: metric.dump() for metric in self._metrics}
+
+    def render(self, dumps: list = None) -> str:
+        """This process's metrics, or the sum of several processes' dumps [(pid, registry dump, alive)]"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if dumps is None:
+                lines.extend(metric.samples())
+            else:
+                lines.extend(metric.samples(metric.merge(
+                    [(pid, dump.get(metric.name, []), alive) for pid, dump, alive in dumps]
+                )))
+        return "\n".join(lines) + "\n"
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class ApiMetrics:
+    """All collectors exposed at /metrics"""
+
+    def __init__(self, directory: str = None):
+        self.directory = directory  # shared by all workers, None for this process only
+        self.registry = Registry()
+        register = self.registry.register
+        self.http_duration = register(Histogram(
+            "http_request_duration_seconds", "HTTP request latency by route", ("method", "route")))
+        self.http_requests = register(Counter(
+            "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")))
+        self.mongo_duration = register(Histogram(
+            "mongo_command_duration_seconds", "MongoDB command latency", ("command",)))
+        self.mongo_failures = register(Counter(
+            "mongo_command_failures_total", "Failed MongoDB commands", ("command",)))
+        self.pool_wait = register(Histogram(
+            "mongo_pool_checkout_wait_seconds", "Time spent waiting for a pooled MongoDB connection"))
+        self.pool_checkout_failures = register(Counter(
+            "mongo_pool_checkout_failures_total", "Failed MongoDB connection checkouts", ("reason",)))
+        self.pool_in_use = register(Gauge(
+            "mongo_pool_connections_in_use", "MongoDB connections currently checked out"))
+        self.paypal_duration = register(Histogram(
+            "paypal_request_duration_seconds", "PayPal API call latency", ("operation",)))
+        self.paypal_requests = register(Counter(
+            "paypal_requests_total", "PayPal API calls by outcome", ("operation", "outcome")))
+        self.loop_lag = register(Histogram(
+            "event_loop_lag_seconds", "Event loop scheduling delay",
+            buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)))
+        self.loop_lag_last = register(Gauge(
+            "event_loop_lag_last_seconds", "Most recent event loop scheduling delay"))
+
+    def render(self) -> str:
+        if not self.directory:
+            return self.registry.render()
+        self.write_snapshot()
+        dumps = []
+        for name in os.listdir(self.directory):
+            pid, extension = os.path.splitext(name)
+            if extension != ".json" or not pid.isdigit():
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    dump = json.load(f)
+            except (OSError, ValueError):
+                continue  # removed or replaced meanwhile
+            dumps.append((int(pid), dump, int(pid) == os.getpid() or _alive(int(pid))))
+        return self.registry.render(dumps)
+
+    def write_snapshot(self):
+        """Write this worker's metrics to the shared directory (replaced atomically)"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(self.registry.dump(), f)
+        os.replace(f"{path}.tmp", path)
+
+    async def export(self, interval: float = 5.0):
+        """Background task writing snapshots for the other workers' /metrics"""
+        if not self.directory:
+            return
+        while True:
+            await asyncio.to_thread(self.write_snapshot)
+            await asyncio.sleep(interval)
+
+    @contextmanager
+    def paypal_call(self, operation: str):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            yield
+            outcome = "success"
+        finally:
+            self.paypal_duration.observe(time.perf_counter() - started, operation)
+            self.paypal_requests.inc(operation, outcome)
+
+    async def watch_event_loop(self, interval: float = 0.5):
+        """Background task sampling how late the event loop wakes up"""
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + interval
+            await asyncio.sleep(interval)
+            lag = max(0.0, loop.time() - scheduled)
+            self.loop_lag.observe(lag)
+            self.loop_lag_last.set(lag)
+
+
+class MetricsMiddleware:
+    """Record latency and status for every request, keyed by route template"""
+
+    def __init__(self, app, metrics: ApiMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            self.metrics.http_duration.observe(time.perf_counter() - started, method, path)
+            self.metrics.http_requests.inc(method, path, str(status))
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def __init__(self, metrics: ApiMetrics):
+        self.metrics = metrics
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.metrics.mongo_duration.observe(event.duration_micros / 1e6, event.command_name)
+
+    def failed(self, event):
+        self.metrics.mongo_duration.observe(event.duration_micros / 1e6, event.command_name)
+        self.metrics.mongo_failures.inc(event.command_name)
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection checkout waits (checkout events fire on the waiting thread)"""
+
+    def __init__(self, metrics: ApiMetrics):
+        self.metrics = metrics
+        self._local = threading.local()
+        self._in_use = 0
+        self._lock = threading.Lock()
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, "started", None)
+        if started is not None:
+            self.metrics.pool_wait.observe(time.perf_counter() - started)
+        with self._lock:
+            self._in_use += 1
+            self.metrics.pool_in_use.set(self._in_use)
+
+    def connection_check_out_failed(self, event):
+        self.metrics.pool_checkout_failures.inc(str(event.reason))
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._in_use -= 1
+            self.metrics.pool_in_use.set(self._in_use)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
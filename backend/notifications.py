@@ -0,0 +1,250 @@
+"""Email digests telling creators about donations to their wishes.
+
+Settling a payment queues one notification per wish it touched (and one
+when a wish becomes fulfilled). Nothing is sent right away: once a
+creator's oldest queued notification is `window` seconds old, everything
+queued for that creator goes out as one digest. Digests are sent from a
+background task over a small pool of SMTP connections that stay open
+between messages.
+
+Notification ids are derived from the payment, so queueing the same
+settlement twice (an outbox retry) queues nothing new. Try it against
+scripts/smtp_sink.py.
+"""
+import asyncio
+import logging
+import queue
+import smtplib
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger("wish-platform.notifications")
+
+
+class SMTPPool:
+    """Up to `size` SMTP connections, reused while they stay idle less than `max_idle` seconds"""
+
+    def __init__(self, host: str, port: int = 25, username: str = None, password: str = None,
+                 starttls: bool = False, size: int = 2, timeout: float = 10.0, max_idle: float = 60.0):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()
+
+    def send(self, message: EmailMessage):
+        with self._slots:
+            smtp = self._checkout()
+            try:
+                try:
+                    smtp.send_message(message)
+                except smtplib.SMTPServerDisconnected:
+                    # The server dropped an idle connection, retry once on a new one
+                    smtp.close()
+                    smtp = self._connect()
+                    smtp.send_message(message)
+            except Exception:
+                self._close(smtp)
+                raise
+            self._idle.put((time.monotonic(), smtp))
+
+    def _checkout(self) -> smtplib.SMTP:
+        while True:
+            try:
+                last_used, smtp = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - last_used < self.max_idle:
+                return smtp
+            self._close(smtp)
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            smtp.starttls()
+        if self.username:
+            smtp.login(self.username, self.password or "")
+        return smtp
+
+    @staticmethod
+    def _close(smtp):
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+    def close(self):
+        while True:
+            try:
+                _, smtp = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(smtp)
+
+
+class DigestNotifier:
+    def __init__(self, collection, mailer, sender: str, window: float = 900.0, interval: float = 30.0,
+                 batch_size: int = 100, concurrency: int = 2, max_attempts: int = 5, lease_seconds: float = 300.0):
+        self.collection = collection
+        self.mailer = mailer  # anything with send(EmailMessage), usually an SMTPPool
+        self.sender = sender
+        self.window = window
+        self.interval = interval
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+
+    # Queue
+    def queue_donations(self, payment_id: str, settled: list, amounts: dict):
+        """Queue notifications for the [(wish, newly fulfilled)] a payment settled"""
+        now = datetime.utcnow()
+        notifications = []
+        for wish, newly_fulfilled in settled:
+            if not wish.get("creator_email"):
+                continue
+            base = {
+                "creator_email": wish["creator_email"],
+                "creator_name": wish.get("creator_name", ""),
+                "wish_id": wish["id"],
+                "wish_title": wish.get("title", ""),
+                "currency": wish.get("currency", "EUR"),
+                "state": "queued",
+                "attempts": 0,
+                "created_at": now
+            }
+            notifications.append({**base, "_id": f"donation:{payment_id}:{wish['id']}",
+                                  "kind": "donation", "amount": amounts[wish["id"]]})
+            if newly_fulfilled:
+                notifications.append({**base, "_id": f"fulfilled:{wish['id']}", "kind": "fulfilled"})
+        if not notifications:
+            return
+        try:
+            self.collection.insert_many(notifications, ordered=False)
+        except BulkWriteError as e:
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+
+    # Send
+    async def run(self):
+        """Background task: one tick every `interval` seconds"""
+        while True:
+            try:
+                await self.tick()
+            except Exception:
+                logger.exception("Notification tick failed")
+            await asyncio.sleep(self.interval)
+
+    async def tick(self) -> int:
+        """Send the digests that are due, returns how many went out"""
+        creators = await asyncio.to_thread(self.due_creators)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def send(creator_email):
+            async with semaphore:
+                return await asyncio.to_thread(self.send_digest, creator_email)
+
+        return sum(await asyncio.gather(*(send(creator_email) for creator_email in creators)))
+
+    def _due(self, now: datetime) -> dict:
+        return {"$or": [
+            {"state": "queued", "created_at": {"$lte": now - timedelta(seconds=self.window)}},
+            {"state": "sending", "claimed_at": {"$lt": now - timedelta(seconds=self.lease_seconds)}}
+        ]}
+
+    def due_creators(self) -> list:
+        """Creators with something due, the longest waiting first"""
+        return [row["_id"] for row in self.collection.aggregate([
+            {"$match": self._due(datetime.utcnow())},
+            {"$group": {"_id": "$creator_email", "oldest": {"$min": "$created_at"}}},
+            {"$sort": {"oldest": 1}},
+            {"$limit": self.batch_size}
+        ])]
+
+    def send_digest(self, creator_email: str) -> int:
+        """Claim everything queued for one creator and send it as one email"""
+        digest_id = uuid.uuid4().hex
+        now = datetime.utcnow()
+        # Only the window's first notification has to be due, the rest ride along
+        self.collection.update_many(
+            {"creator_email": creator_email, "$or": [
+                {"state": "queued"},
+                {"state": "sending", "claimed_at": {"$lt": now - timedelta(seconds=self.lease_seconds)}}
+            ]},
+            {"$set": {"state": "sending", "digest_id": digest_id, "claimed_at": now}}
+        )
+        notifications = list(self.collection.find({"digest_id": digest_id}).sort("created_at", 1))
+        if not notifications:
+            return 0
+        try:
+            self.mailer.send(self.build_digest(creator_email, notifications))
+        except Exception as e:
+            logger.warning("Digest to %s failed: %s", creator_email, e)
+            self.collection.update_many(
+                {"digest_id": digest_id},
+                {"$set": {"state": "queued", "error": str(e)}, "$unset": {"digest_id": ""}, "$inc": {"attempts": 1}}
+            )
+            self.collection.update_many(
+                {"creator_email": creator_email, "state": "queued", "attempts": {"$gte": self.max_attempts}},
+                {"$set": {"state": "failed"}}
+            )
+            return 0
+        self.collection.update_many({"digest_id": digest_id}, {"$set": {"state": "sent", "sent_at": datetime.utcnow()}})
+        return 1
+
+    def build_digest(self, creator_email: str, notifications: list) -> EmailMessage:
+        wishes = {}
+        for notification in notifications:
+            wish = wishes.setdefault(notification["wish_id"], {
+                # Titles are user input: a line break in the Subject header makes it invalid
+                "title": " ".join(notification["wish_title"].split()),
+                "currency": notification["currency"],
+                "donations": 0,
+                "amount": 0.0,
+                "fulfilled": False
+            })
+            if notification["kind"] == "donation":
+                wish["donations"] += 1
+                wish["amount"] += notification["amount"]
+            else:
+                wish["fulfilled"] = True
+
+        donations = sum(wish["donations"] for wish in wishes.values())
+        fulfilled = [wish for wish in wishes.values() if wish["fulfilled"]]
+        if fulfilled:
+            subject = f"Your wish \"{fulfilled[0]['title']}\" has been fulfilled"
+            if len(fulfilled) > 1:
+                subject = f"{len(fulfilled)} of your wishes have been fulfilled"
+        else:
+            subject = f"{donations} new donation{'s' if donations != 1 else ''} to your wishes"
+
+        name = notifications[0].get("creator_name") or "there"
+        lines = [f"Hi {name},", ""]
+        for wish in wishes.values():
+            if wish["donations"]:
+                lines.append(f"- \"{wish['title']}\": {wish['donations']} donation{'s' if wish['donations'] != 1 else ''}, "
+                             f"{wish['amount']:.2f} {wish['currency']}")
+            if wish["fulfilled"]:
+                lines.append(f"- \"{wish['title']}\" is fully funded, the donations are on their way to you.")
+        lines += ["", "Thank you for sharing your wish,", "The WishFulfill team"]
+
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = creator_email
+        message["Subject"] = subject
+        message.set_content("\n".join(lines))
+        return message
+
+    def summary(self) -> dict:
+        counts = {row["_id"]: row["count"] for row in
+                  self.collection.aggregate([{"$group": {"_id": "$state", "count": {"$sum": 1}}}])}
+        return {"notifications": counts}
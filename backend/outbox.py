@@ -0,0 +1,151 @@
+"""Transactional outbox for the work that follows a confirmed payment.
+
+The request that confirms a payment only records what has to happen next
+(`add`) and returns; the dispatcher running in every worker then applies
+those side effects - wish and ledger updates, cache invalidation, live
+events - in batches, retrying failed events with exponential backoff.
+
+Events are claimed with a lease, so dispatchers in several workers share
+the collection without running an event twice at the same time; a worker
+that dies mid-batch leaves leases that expire and are claimed again.
+Handlers must therefore be idempotent. They run in a worker thread, off
+the event loop. Processed events expire through a TTL index on
+`processed_at`.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger("wish-platform.outbox")
+
+MAX_BACKOFF_SECONDS = 300
+
+
+class OutboxDispatcher:
+    def __init__(self, collection, handlers: dict, batch_size: int = 50, interval: float = 1.0,
+                 max_attempts: int = 8, lease_seconds: float = 60.0):
+        self.collection = collection
+        self.handlers = handlers  # event type -> handler(payload)
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self._wakeup = asyncio.Event()
+
+    def add(self, event_type: str, payload: dict, key: str):
+        """Record an event; `key` makes recording the same event twice a no-op"""
+        now = datetime.utcnow()
+        try:
+            self.collection.insert_one({
+                "_id": key,
+                "type": event_type,
+                "payload": payload,
+                "state": "pending",
+                "attempts": 0,
+                "available_at": now,
+                "created_at": now
+            })
+        except DuplicateKeyError:
+            pass
+
+    def notify(self):
+        """Wake this worker's dispatcher instead of waiting for the next poll"""
+        self._wakeup.set()
+
+    async def run(self):
+        """Background task: drain the outbox, then sleep until notified or `interval` passes"""
+        while True:
+            try:
+                processed = await self.dispatch_batch()
+            except Exception:
+                logger.exception("Outbox dispatch failed")
+                processed = 0
+            if processed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def drain(self):
+        """Dispatch until nothing is due (tests and scripts)"""
+        while await self.dispatch_batch():
+            pass
+
+    async def dispatch_batch(self) -> int:
+        events = await asyncio.to_thread(self.claim_batch)
+        if not events:
+            return 0
+        # Handlers make blocking database calls, keep them off the event loop
+        updates = await asyncio.to_thread(self._handle, events)
+        await asyncio.to_thread(self.collection.bulk_write, updates, ordered=False)
+        return len(events)
+
+    def _handle(self, events: list) -> list:
+        """Run the handler of each event, returns the state updates"""
+        updates = []
+        for event in events:
+            handler = self.handlers.get(event["type"])
+            try:
+                if handler is None:
+                    raise LookupError(f"no handler for outbox event type {event['type']!r}")
+                handler(event["payload"])
+            except Exception as e:
+                logger.warning("Outbox event %s (%s) failed: %s", event["_id"], event["type"], e)
+                updates.append(self._failed(event, str(e)))
+            else:
+                updates.append(UpdateOne({"_id": event["_id"]}, {
+                    "$set": {"state": "done", "processed_at": datetime.utcnow()},
+                    "$unset": {"claimed_by": "", "lease_until": ""}
+                }))
+        return updates
+
+    def claim_batch(self) -> list:
+        now = datetime.utcnow()
+        claim_id = uuid.uuid4().hex
+        candidates = [event["_id"] for event in self.collection.find(
+            {"$or": [
+                {"state": "pending", "available_at": {"$lte": now}},
+                {"state": "processing", "lease_until": {"$lt": now}}
+            ]},
+            {"_id": 1}
+        ).sort("created_at", 1).limit(self.batch_size)]
+        if not candidates:
+            return []
+        # Re-check the state so a concurrent dispatcher's claim is not stolen
+        self.collection.update_many(
+            {"_id": {"$in": candidates}, "$or": [
+                {"state": "pending", "available_at": {"$lte": now}},
+                {"state": "processing", "lease_until": {"$lt": now}}
+            ]},
+            {"$set": {
+                "state": "processing",
+                "claimed_by": claim_id,
+                "lease_until": now + timedelta(seconds=self.lease_seconds)
+            }}
+        )
+        return list(self.collection.find({"claimed_by": claim_id}).sort("created_at", 1))
+
+    def _failed(self, event: dict, error: str) -> UpdateOne:
+        attempts = event["attempts"] + 1
+        if attempts >= self.max_attempts:
+            logger.error("Outbox event %s gave up after %d attempts", event["_id"], attempts)
+            fields = {"state": "failed", "failed_at": datetime.utcnow()}
+        else:
+            delay = min(2 ** attempts, MAX_BACKOFF_SECONDS)
+            fields = {"state": "pending", "available_at": datetime.utcnow() + timedelta(seconds=delay)}
+        return UpdateOne({"_id": event["_id"]}, {
+            "$set": {**fields, "attempts": attempts, "error": error},
+            "$unset": {"claimed_by": "", "lease_until": ""}
+        })
+
+    def summary(self) -> dict:
+        """Event counts by state plus the events that gave up"""
+        counts = {row["_id"]: row["count"] for row in
+                  self.collection.aggregate([{"$group": {"_id": "$state", "count": {"$sum": 1}}}])}
+        failed = list(self.collection.find({"state": "failed"}).sort("created_at", -1).limit(20))
+        return {"events": counts, "failed": failed}
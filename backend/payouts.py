@@ -0,0 +1,322 @@
+"""Batched PayPal Payouts to the creators of fulfilled wishes.
+
+Every tick the scheduler
+
+1. queues a payout for every fulfilled wish that has none yet, or that got
+   donations after its last payout (payout_due): the funds raised minus what
+   earlier payouts sent, to creator_paypal, falling back to creator_email.
+   Wishes without either stay unqueued and are listed by summary(),
+2. claims up to `batch_size` queued payouts at a time and submits each group
+   as one Payouts batch,
+3. polls the batches that are due, at most `poll_concurrency` at once, and
+   copies batch and item statuses back until the batch is final.
+
+Claims are conditional updates, so schedulers in several workers can run
+side by side without paying anyone twice; the claim id doubles as PayPal's
+sender_batch_id, which PayPal refuses to accept twice. A batch goes back to
+the queue only when PayPal refuses it (a 4xx answer). When the outcome is
+unknown (timeout, reset connection, 5xx, a crash mid-submit) the batch
+stays SUBMITTING and is resent under the same sender_batch_id, so at most
+one of the attempts can pay. Batches that stay unknown after max_attempts,
+or that PayPal reports as already accepted, become UNCONFIRMED for review.
+
+Exercise it end to end with scripts/payout_e2e.py.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger("wish-platform.payouts")
+
+# Batch statuses that still change; anything else is final
+PENDING_BATCH_STATUSES = ["PENDING", "PROCESSING", "NEW"]
+
+
+class PayoutScheduler:
+    def __init__(self, db, paypal, metrics, batch_size: int = 100, interval: float = 300.0,
+                 poll_concurrency: int = 4, poll_interval: float = 60.0, max_attempts: int = 5,
+                 claim_timeout: float = 600.0):
+        self.wishes = db.wishes
+        self.payouts = db.payouts
+        self.batches = db.payout_batches
+        self.paypal = paypal  # returns the configured paypalrestsdk module
+        self.metrics = metrics
+        self.batch_size = batch_size
+        self.interval = interval
+        self.poll_concurrency = poll_concurrency
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.claim_timeout = claim_timeout
+
+    async def run(self):
+        """Background task: one tick every `interval` seconds"""
+        while True:
+            try:
+                await self.tick()
+            except Exception:
+                logger.exception("Payout tick failed")
+            await asyncio.sleep(self.interval)
+
+    async def tick(self):
+        await asyncio.to_thread(self.queue_fulfilled)
+        await asyncio.to_thread(self.release_stale_claims)
+        await asyncio.to_thread(self.resend_submitting)
+        while await asyncio.to_thread(self.submit_batch) == self.batch_size:
+            pass
+        await self.poll_due_batches()
+
+    # Accumulate
+    def queue_fulfilled(self) -> int:
+        queued = 0
+        now = datetime.utcnow()
+        for wish in self.wishes.find({"status": "fulfilled", "$or": [
+            {"payout_queued_at": {"$exists": False}}, {"payout_due": True}
+        ]}):
+            receiver = wish.get("creator_paypal") or wish.get("creator_email")
+            if not receiver:
+                continue  # left for an operator, see summary()
+            raised = wish.get("donations_received", 0)
+            earlier = list(self.payouts.find({"wish_id": wish["id"]}, {"amount": 1}))
+            amount = round(raised - sum(payout["amount"] for payout in earlier), 2)
+            if amount > 0:
+                try:
+                    # (wish_id, sequence) is unique: workers that read the same
+                    # payouts race for one insert, and only one of them wins
+                    self.payouts.insert_one({
+                        "id": str(uuid.uuid4()),
+                        "wish_id": wish["id"],
+                        "sequence": len(earlier),
+                        "wish_title": wish.get("title", ""),
+                        "receiver": receiver,
+                        "amount": amount,
+                        "currency": wish.get("currency", "EUR").upper(),
+                        "status": "queued",
+                        "attempts": 0,
+                        "created_at": now,
+                        "updated_at": now
+                    })
+                    queued += 1
+                except DuplicateKeyError:
+                    pass  # queued by another worker
+            self.wishes.update_one({"id": wish["id"]}, {"$set": {"payout_queued_at": now}})
+            # A donation that lands after our read keeps payout_due for the next tick
+            self.wishes.update_one({"id": wish["id"], "donations_received": raised}, {"$unset": {"payout_due": ""}})
+        return queued
+
+    # Submit
+    def submit_batch(self) -> int:
+        """Claim and submit one batch, returns how many payouts it held"""
+        batch_id = uuid.uuid4().hex
+        now = datetime.utcnow()
+        candidates = [payout["id"] for payout in
+                      self.payouts.find({"status": "queued"}, {"id": 1}).sort("created_at", 1).limit(self.batch_size)]
+        if not candidates:
+            return 0
+        self.payouts.update_many(
+            {"id": {"$in": candidates}, "status": "queued"},
+            {"$set": {"status": "claimed", "batch_id": batch_id, "updated_at": now}}
+        )
+        items = list(self.payouts.find({"batch_id": batch_id}))
+        if not items:
+            return 0
+
+        # Recorded before PayPal sees it: from here on the batch is only ever
+        # resent under this id, never requeued, unless PayPal refuses it
+        self.batches.insert_one({
+            "id": batch_id,
+            "status": "SUBMITTING",
+            "items": len(items),
+            "total": round(sum(item["amount"] for item in items), 2),
+            "attempts": 1,
+            "retry_at": now + timedelta(seconds=self.claim_timeout),
+            "created_at": now,
+            "updated_at": now
+        })
+        self._send(batch_id, items, attempts=1)
+        return len(items)
+
+    def _send(self, batch_id: str, items: list, attempts: int):
+        payout = self.paypal().Payout({
+            "sender_batch_header": {
+                "sender_batch_id": batch_id,
+                "email_subject": "Your wish has been fulfilled",
+                "email_message": "The donations for your wish have been sent to you."
+            },
+            "items": [{
+                "recipient_type": "EMAIL",
+                "amount": {"value": f"{item['amount']:.2f}", "currency": item["currency"]},
+                "receiver": item["receiver"],
+                "note": f"Donations for your wish \"{item['wish_title'][:100]}\"",
+                "sender_item_id": item["id"]
+            } for item in items]
+        })
+        client_error = self.paypal().exceptions.ClientError
+        try:
+            with self.metrics.paypal_call("create_payout"):
+                accepted = payout.create(sync_mode=False)
+        except client_error as e:
+            accepted = False
+            payout.error = e.content or str(e)
+        except Exception as e:
+            # Timeouts, resets, 5xx: PayPal may have taken the batch
+            logger.warning("Payout batch %s outcome unknown, will resend it: %s", batch_id, e)
+            self._retry_later(batch_id, attempts, str(e))
+            return
+        if not accepted:
+            error = str(payout.error)
+            if "already exists" in error or "DUPLICATE" in error:
+                # An earlier attempt went through after all; it cannot be looked up by our id
+                logger.error("Payout batch %s was already accepted by PayPal, needs review", batch_id)
+                self._unconfirmed(batch_id, error)
+            else:
+                logger.warning("Payout batch %s rejected: %s", batch_id, error)
+                self._requeue(batch_id, error)
+            return
+
+        header = payout.batch_header
+        self.batches.update_one({"id": batch_id}, {"$set": {
+            "payout_batch_id": header.payout_batch_id,
+            "status": header.batch_status,
+            "next_poll_at": datetime.utcnow() + timedelta(seconds=self.poll_interval),
+            "updated_at": datetime.utcnow()
+        }, "$unset": {"retry_at": ""}})
+        self.payouts.update_many({"batch_id": batch_id}, {"$set": {
+            "status": "submitted",
+            "payout_batch_id": header.payout_batch_id,
+            "updated_at": datetime.utcnow()
+        }})
+        logger.info("Submitted payout batch %s with %d items", header.payout_batch_id, len(items))
+
+    def _retry_later(self, batch_id: str, attempts: int, error: str):
+        now = datetime.utcnow()
+        if attempts >= self.max_attempts:
+            logger.error("Payout batch %s still unconfirmed after %d attempts, needs review", batch_id, attempts)
+            self._unconfirmed(batch_id, error)
+            return
+        self.batches.update_one({"id": batch_id}, {"$set": {
+            "error": error,
+            "retry_at": now + timedelta(seconds=min(self.poll_interval * 2 ** (attempts - 1), 3600)),
+            "updated_at": now
+        }})
+
+    def _unconfirmed(self, batch_id: str, error: str):
+        # Neither requeued (that could pay twice) nor tracked: an operator checks PayPal
+        now = datetime.utcnow()
+        self.batches.update_one({"id": batch_id}, {"$set": {"status": "UNCONFIRMED", "error": error, "updated_at": now},
+                                                  "$unset": {"retry_at": ""}})
+        self.payouts.update_many({"batch_id": batch_id}, {"$set": {"status": "unconfirmed", "updated_at": now}})
+
+    def _requeue(self, batch_id: str, error: str):
+        # PayPal refused the batch, nothing was paid: the items go back to the queue until max_attempts
+        now = datetime.utcnow()
+        self.batches.update_one({"id": batch_id}, {"$set": {"status": "REJECTED", "error": error, "updated_at": now},
+                                                  "$unset": {"retry_at": ""}})
+        self.payouts.update_many(
+            {"batch_id": batch_id},
+            {"$set": {"status": "queued", "updated_at": now}, "$unset": {"batch_id": ""}, "$inc": {"attempts": 1}}
+        )
+        self.payouts.update_many(
+            {"status": "queued", "attempts": {"$gte": self.max_attempts}},
+            {"$set": {"status": "failed", "error": error}}
+        )
+
+    def resend_submitting(self) -> int:
+        """Resend batches whose outcome is unknown (failed call or crash), under the same id"""
+        resent = 0
+        now = datetime.utcnow()
+        for batch in list(self.batches.find({"status": "SUBMITTING", "retry_at": {"$lte": now}})):
+            # Move retry_at first so other workers skip this batch
+            claimed = self.batches.find_one_and_update(
+                {"id": batch["id"], "status": "SUBMITTING", "retry_at": batch["retry_at"]},
+                {"$set": {"retry_at": now + timedelta(seconds=self.claim_timeout)}, "$inc": {"attempts": 1}},
+                return_document=ReturnDocument.AFTER
+            )
+            if claimed is None:
+                continue
+            items = list(self.payouts.find({"batch_id": batch["id"]}))
+            self._send(batch["id"], items, attempts=claimed["attempts"])
+            resent += 1
+        return resent
+
+    def release_stale_claims(self) -> int:
+        """Requeue payouts claimed by a worker that died before recording their batch"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.claim_timeout)
+        stale = list(self.payouts.find({"status": "claimed", "updated_at": {"$lt": cutoff}}, {"id": 1, "batch_id": 1}))
+        batch_ids = {payout["batch_id"] for payout in stale}
+        recorded = {batch["id"] for batch in self.batches.find({"id": {"$in": list(batch_ids)}}, {"id": 1})}
+        # With a batch record the batch may have reached PayPal, resend_submitting handles it
+        orphans = [payout["id"] for payout in stale if payout["batch_id"] not in recorded]
+        if orphans:
+            self.payouts.update_many(
+                {"id": {"$in": orphans}, "status": "claimed"},
+                {"$set": {"status": "queued", "updated_at": datetime.utcnow()}, "$unset": {"batch_id": ""}}
+            )
+            logger.warning("Released %d payouts left claimed without a batch", len(orphans))
+        return len(orphans)
+
+    # Track
+    async def poll_due_batches(self):
+        due = await asyncio.to_thread(lambda: list(self.batches.find({
+            "status": {"$in": PENDING_BATCH_STATUSES},
+            "next_poll_at": {"$lte": datetime.utcnow()}
+        }).limit(100)))
+        semaphore = asyncio.Semaphore(self.poll_concurrency)
+
+        async def poll(batch):
+            async with semaphore:
+                await asyncio.to_thread(self.poll_batch, batch)
+
+        await asyncio.gather(*(poll(batch) for batch in due))
+
+    def poll_batch(self, batch: dict):
+        # Push next_poll_at forward first so other workers skip this batch
+        claimed = self.batches.find_one_and_update(
+            {"id": batch["id"], "next_poll_at": batch["next_poll_at"]},
+            {"$set": {"next_poll_at": datetime.utcnow() + timedelta(seconds=self.poll_interval)}},
+            return_document=ReturnDocument.AFTER
+        )
+        if claimed is None:
+            return
+        try:
+            sdk = self.paypal()
+            with self.metrics.paypal_call("get_payout"):
+                # Payout.find doubles the id into the URL (its path ends in a
+                # slash and join_url mishandles that), so fetch it directly
+                result = sdk.Payout(sdk.api.default().get(f"v1/payments/payouts/{batch['payout_batch_id']}"))
+        except Exception as e:
+            logger.warning("Polling payout batch %s failed: %s", batch["payout_batch_id"], e)
+            return
+
+        now = datetime.utcnow()
+        updates = [
+            UpdateOne({"id": item.payout_item.sender_item_id}, {"$set": {
+                "status": item.transaction_status,
+                "payout_item_id": item.payout_item_id,
+                "updated_at": now
+            }})
+            for item in (result.items or [])
+        ]
+        if updates:
+            self.payouts.bulk_write(updates, ordered=False)
+        self.batches.update_one({"id": batch["id"]}, {"$set": {
+            "status": result.batch_header.batch_status,
+            "updated_at": now
+        }})
+
+    def summary(self, limit: int = 20) -> dict:
+        """Payout counts by status, the most recent batches and the fulfilled
+        wishes that cannot be paid out for lack of a receiver"""
+        counts = {row["_id"]: row["count"] for row in
+                  self.payouts.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}])}
+        batches = list(self.batches.find({}, {"_id": 0}).sort("created_at", -1).limit(limit))
+        no_receiver = [wish["id"] for wish in self.wishes.find({
+            "status": "fulfilled",
+            "$or": [{"payout_queued_at": {"$exists": False}}, {"payout_due": True}],
+            "creator_paypal": {"$in": [None, ""]},
+            "creator_email": {"$in": [None, ""]}
+        }, {"id": 1}).limit(limit)]
+        return {"payouts": counts, "batches": batches, "no_receiver": no_receiver}
@@ -0,0 +1,218 @@
+"""On-demand sampling profiler for API requests.
+
+A single background thread samples the event loop thread's Python stack
+while at least one profiled request is in flight. Profiles are kept as
+collapsed stacks ("frame;frame;frame count" per line), the input format of
+flamegraph.pl and speedscope.
+
+Two ways to profile:
+
+* per request: an admin sends `X-Profile: 1` (or `?profile=1`) together with
+  `X-Admin-Token`; the profile is stored and its id returned in the
+  `X-Profile-Id` response header.
+* globally: with `sample_every=N`, every Nth request of each route is
+  profiled and folded into per-route hot-function tables.
+
+Handlers share the event loop thread, so a sample taken while two profiled
+requests overlap is attributed to both. To keep long-lived responses (the
+/api/events stream) from soaking up everyone else's stacks, global sampling
+skips the `exclude` routes and every profile stops collecting after
+`max_duration` seconds.
+"""
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from urllib.parse import parse_qs
+
+from starlette.routing import Match
+
+# Frames of an idle event loop (waiting in the selector) are not interesting
+IDLE_FUNCTIONS = {("selectors.py", "select"), ("selectors.py", "poll")}
+
+
+def _frame_label(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def collapse(frame) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """Samples one thread's stack into every active collector"""
+
+    def __init__(self, interval: float = 0.002):
+        self.interval = interval
+        self._collectors = {}
+        self._target = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self, collector: Counter, target_thread_id: int, max_duration: float = None):
+        with self._lock:
+            self._target = target_thread_id
+            deadline = time.monotonic() + max_duration if max_duration else None
+            self._collectors[id(collector)] = (collector, deadline)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+
+    def stop(self, collector: Counter):
+        with self._lock:
+            self._collectors.pop(id(collector), None)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                for key, (_, deadline) in list(self._collectors.items()):
+                    if deadline is not None and now > deadline:
+                        del self._collectors[key]
+                if not self._collectors:
+                    self._thread = None
+                    return
+                collectors = [collector for collector, _ in self._collectors.values()]
+                target = self._target
+            frame = sys._current_frames().get(target)
+            if frame is not None:
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) not in IDLE_FUNCTIONS:
+                    stack = collapse(frame)
+                    for collector in collectors:
+                        collector[stack] += 1
+            time.sleep(self.interval)
+
+
+class RequestProfiler:
+    def __init__(self, admin_token=None, sample_every: int = 0, interval: float = 0.002, max_stored: int = 50,
+                 max_duration: float = 10.0, exclude=()):
+        self.admin_token = admin_token
+        self.sample_every = sample_every
+        self.interval = interval
+        self.max_stored = max_stored
+        self.max_duration = max_duration
+        self.exclude = set(exclude)
+        self.sampler = StackSampler(interval)
+        self.profiles = OrderedDict()
+        self.route_seen = Counter()
+        self.route_profiled = Counter()
+        self.route_samples = Counter()
+        self.route_hot = {}
+
+    def should_sample(self, route: str) -> bool:
+        if route in self.exclude:
+            return False
+        self.route_seen[route] += 1
+        return self.route_seen[route] % self.sample_every == 0
+
+    def store(self, profile_id: str, route: str, stacks: Counter, duration: float):
+        self.profiles[profile_id] = {
+            "id": profile_id,
+            "route": route,
+            "duration_ms": round(duration * 1000, 2),
+            "samples": sum(stacks.values()),
+            "interval_ms": self.interval * 1000,
+            "stacks": stacks,
+        }
+        while len(self.profiles) > self.max_stored:
+            self.profiles.popitem(last=False)
+
+    def aggregate(self, route: str, stacks: Counter):
+        """Fold a sampled request into the route's self-time table"""
+        hot = self.route_hot.setdefault(route, Counter())
+        for stack, count in stacks.items():
+            hot[stack.rsplit(";", 1)[-1]] += count
+        self.route_profiled[route] += 1
+        self.route_samples[route] += sum(stacks.values())
+
+    def hot_functions(self, route=None, limit: int = 20):
+        routes = [route] if route else list(self.route_hot)
+        return {
+            name: {
+                "requests_seen": self.route_seen[name],
+                "requests_profiled": self.route_profiled[name],
+                "samples": self.route_samples[name],
+                "functions": [
+                    {"function": function, "samples": count,
+                     "percent": round(100 * count / max(self.route_samples[name], 1), 1)}
+                    for function, count in self.route_hot[name].most_common(limit)
+                ],
+            }
+            for name in routes if name in self.route_hot
+        }
+
+    @staticmethod
+    def collapsed(profile: dict) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in profile["stacks"].most_common()) + "\n"
+
+
+def _route_path(scope) -> str:
+    """Route template for a request, resolved before the router runs"""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    app = scope.get("app")
+    for candidate in getattr(getattr(app, "router", None), "routes", []):
+        match, _ = candidate.matches(scope)
+        if match == Match.FULL:
+            return candidate.path
+    # One key for all unknown paths, the per-route counters stay bounded
+    return "unmatched"
+
+
+class ProfilingMiddleware:
+    def __init__(self, app, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    def _requested(self, scope) -> bool:
+        if not self.profiler.admin_token:
+            return False
+        headers = dict(scope.get("headers", []))
+        wants_profile = headers.get(b"x-profile") in (b"1", b"true")
+        if not wants_profile and b"profile=" in scope.get("query_string", b""):
+            wants_profile = parse_qs(scope["query_string"].decode()).get("profile", [""])[0] in ("1", "true")
+        return wants_profile and headers.get(b"x-admin-token", b"").decode() == self.profiler.admin_token
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profiler = self.profiler
+        on_demand = self._requested(scope)
+        route = None
+        sampled = False
+        if not on_demand and profiler.sample_every > 0:
+            route = _route_path(scope)
+            sampled = profiler.should_sample(route)
+        if not on_demand and not sampled:
+            await self.app(scope, receive, send)
+            return
+
+        stacks = Counter()
+        profile_id = uuid.uuid4().hex[:12]
+        started = time.perf_counter()
+
+        async def send_with_profile_id(message):
+            if on_demand and message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        profiler.sampler.start(stacks, threading.get_ident(), profiler.max_duration)
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiler.sampler.stop(stacks)
+            route = route or _route_path(scope)
+            if sampled:
+                profiler.aggregate(route, stacks)
+            else:
+                profiler.store(profile_id, route, stacks, time.perf_counter() - started)
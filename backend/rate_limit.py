@@ -0,0 +1,122 @@
+"""Token-bucket rate limits per client and route.
+
+Every (route, client) pair has a bucket of `burst` tokens refilled at
+`rate` tokens per second; a request takes one token or is refused with the
+time until the next one. Buckets live in each worker's memory in two flat
+arrays with a bounded LRU of keys, so a check is O(1) and the memory use
+is fixed.
+
+With a collection, buckets are shared by all workers instead: each check
+is one atomic upsert computing the refill on the server. When MongoDB
+cannot be reached the worker falls back to its local buckets.
+"""
+import logging
+import math
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger("wish-platform.rate_limit")
+
+
+class TokenBuckets:
+    """Local buckets for up to `capacity` keys, least recently used evicted"""
+
+    def __init__(self, rate: float, burst: float, capacity: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.capacity = capacity
+        self.tokens = array("d", bytes(8 * capacity))
+        self.updated = array("d", bytes(8 * capacity))
+        self.slots = OrderedDict()  # key -> index into the arrays
+        self._lock = threading.Lock()
+
+    def take(self, key, now: float = None) -> float:
+        """Take a token for `key`, returns 0 or the seconds until one is available"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            slot = self.slots.get(key)
+            if slot is None:
+                if len(self.slots) < self.capacity:
+                    slot = len(self.slots)
+                else:
+                    # An evicted client starts over with a full bucket
+                    _, slot = self.slots.popitem(last=False)
+                self.slots[key] = slot
+                tokens = self.burst
+            else:
+                self.slots.move_to_end(key)
+                tokens = min(self.burst, self.tokens[slot] + (now - self.updated[slot]) * self.rate)
+            self.updated[slot] = now
+            if tokens >= 1:
+                self.tokens[slot] = tokens - 1
+                return 0.0
+            self.tokens[slot] = tokens
+            return (1 - tokens) / self.rate
+
+
+class SharedTokenBuckets:
+    """Buckets in a MongoDB collection, shared by every worker"""
+
+    def __init__(self, collection, rate: float, burst: float):
+        self.collection = collection
+        self.rate = rate
+        self.burst = burst
+
+    def take(self, key) -> float:
+        now = datetime.utcnow()
+        # Refill by the elapsed time (dates subtract to milliseconds), then take a token if there is one
+        refilled = {"$min": [self.burst, {"$add": [
+            {"$ifNull": ["$tokens", self.burst]},
+            {"$multiply": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, self.rate / 1000]}
+        ]}]}
+        bucket = self.collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "updated_at": now}},
+                {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+                {"$set": {
+                    "tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                    # Full again by then, the TTL index removes it
+                    "expires_at": now + timedelta(seconds=self.burst / self.rate)
+                }},
+            ],
+            projection={"tokens": 1, "allowed": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return 0.0 if bucket["allowed"] else (1 - bucket["tokens"]) / self.rate
+
+
+class RateLimiter:
+    def __init__(self, limits: dict, capacity: int = 100000, collection=None):
+        """limits is {route: (requests per second, burst)}"""
+        self.local = {route: TokenBuckets(rate, burst, capacity) for route, (rate, burst) in limits.items()}
+        self.shared = {
+            route: SharedTokenBuckets(collection, rate, burst) for route, (rate, burst) in limits.items()
+        } if collection is not None else None
+
+    def check(self, route: str, client: str) -> int:
+        """0 if the request may go ahead, else the whole seconds to wait"""
+        wait = None
+        if self.shared:
+            try:
+                wait = self.shared[route].take(f"{route}:{client}")
+            except Exception as e:
+                logger.warning("Shared rate limit unavailable, using local buckets: %s", e)
+        if wait is None:
+            wait = self.local[route].take(client)
+        return math.ceil(wait)
+
+    def stats(self) -> dict:
+        return {
+            "shared": self.shared is not None,
+            "routes": {
+                route: {"per_minute": buckets.rate * 60, "burst": buckets.burst, "clients": len(buckets.slots)}
+                for route, buckets in self.local.items()
+            }
+        }
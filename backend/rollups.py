@@ -0,0 +1,177 @@
+"""Hourly and daily statistics buckets behind /api/statistics/timeseries.
+
+Each bucket holds the donations counted in it, their sum per currency, the
+wishes created and the wishes that became fulfilled. Buckets are kept up
+to date with upserted $inc writes as payments settle and wishes are
+created, so reading a range costs one indexed query over its buckets.
+
+The backfill rebuilds buckets from the source collections (completed
+payment transactions and wishes), for data from before the rollups
+existed or to repair them; it overwrites the buckets in its range. The
+range ends with yesterday (UTC): today's buckets are still taking live
+$inc writes, which a rebuild would race with.
+
+    python rollups.py                           # everything
+    python rollups.py --since 2025-01-01        # from a date (UTC) on
+"""
+import argparse
+import os
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+
+GRANULARITIES = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+
+def bucket_start(at: datetime, granularity: str) -> datetime:
+    if granularity == "day":
+        return at.replace(hour=0, minute=0, second=0, microsecond=0)
+    return at.replace(minute=0, second=0, microsecond=0)
+
+
+def currency_key(currency: str) -> str:
+    # Currencies become field names, keep them to ISO-style codes
+    currency = (currency or "").upper()
+    return currency if currency.isalpha() else "OTHER"
+
+
+def _empty_bucket(granularity: str, start: datetime) -> dict:
+    return {"granularity": granularity, "start": start, "donations": 0, "amounts": {}, "new_wishes": 0, "fulfilled": 0}
+
+
+def _donations(transaction: dict) -> list:
+    """(wish_id, amount) for every wish a completed donation or cart paid into"""
+    if transaction["purpose"] == "cart":
+        return [(item["wish_id"], item["amount"]) for item in transaction.get("items") or []]
+    return [(transaction["wish_id"], transaction["amount"])] if transaction.get("wish_id") else []
+
+
+class RollupStore:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def record(self, at: datetime, donations: int = 0, amounts: dict = None, new_wishes: int = 0, fulfilled: int = 0):
+        """Add to the hour and day buckets containing `at`; amounts is {currency: sum}"""
+        increments = {"donations": donations, "new_wishes": new_wishes, "fulfilled": fulfilled}
+        for currency, amount in (amounts or {}).items():
+            increments[f"amounts.{currency_key(currency)}"] = round(amount, 2)
+        increments = {field: value for field, value in increments.items() if value}
+        if not increments:
+            return
+        self.collection.bulk_write([
+            UpdateOne(
+                {"_id": f"{granularity}:{bucket_start(at, granularity).isoformat()}"},
+                {"$inc": increments,
+                 "$setOnInsert": {"granularity": granularity, "start": bucket_start(at, granularity)}},
+                upsert=True
+            )
+            for granularity in GRANULARITIES
+        ], ordered=False)
+
+    def series(self, granularity: str, start: datetime, end: datetime) -> list:
+        """Buckets from start to end (exclusive), with empty ones filled in"""
+        start = bucket_start(start, granularity)
+        stored = {
+            bucket["start"]: bucket for bucket in self.collection.find(
+                {"granularity": granularity, "start": {"$gte": start, "$lt": end}},
+                {"_id": 0}
+            ).sort("start", 1)
+        }
+        series = []
+        step = GRANULARITIES[granularity]
+        current = start
+        while current < end:
+            bucket = stored.get(current) or _empty_bucket(granularity, current)
+            series.append({
+                "start": current,
+                "donations": bucket.get("donations", 0),
+                "amounts": bucket.get("amounts", {}),
+                "new_wishes": bucket.get("new_wishes", 0),
+                "fulfilled": bucket.get("fulfilled", 0)
+            })
+            current += step
+        return series
+
+    def backfill(self, db, since: datetime = None, chunk_size: int = 1000) -> int:
+        """Rebuild every bucket from `since` to the start of today from the source data,
+        returns how many were written"""
+        since = bucket_start(since, "day") if since else None
+        until = bucket_start(datetime.utcnow(), "day")
+        rebuilt_at = datetime.utcnow()
+        buckets = {}
+
+        def add(at: datetime, field: str, value, currency: str = None):
+            for granularity in GRANULARITIES:
+                start = bucket_start(at, granularity)
+                bucket = buckets.setdefault((granularity, start), _empty_bucket(granularity, start))
+                if currency:
+                    key = currency_key(currency)
+                    bucket["amounts"][key] = round(bucket["amounts"].get(key, 0) + value, 2)
+                else:
+                    bucket[field] += value
+
+        def add_transactions(transactions: list):
+            # Settling skips donations to wishes that do not exist, so does the backfill
+            referenced = list({wish_id for transaction in transactions for wish_id, _ in _donations(transaction)})
+            existing = {wish["id"] for wish in db.wishes.find({"id": {"$in": referenced}}, {"_id": 0, "id": 1})}
+            for transaction in transactions:
+                settled = [amount for wish_id, amount in _donations(transaction) if wish_id in existing]
+                if not settled:
+                    continue
+                at = transaction.get("completed_at") or transaction["updated_at"]
+                add(at, "donations", len(settled))
+                add(at, "amounts", sum(settled), transaction["currency"])
+
+        time_range = {"$gte": since, "$lt": until} if since else {"$lt": until}
+        # Bucketed by completion like the live path; transactions from before
+        # completed_at was stored fall back to their last update. Read in
+        # chunks: only the buckets are held in memory, not the transactions
+        chunk = []
+        for transaction in db.payment_transactions.find(
+            {"status": "completed", "purpose": {"$in": ["donation", "cart"]}, "$or": [
+                {"completed_at": time_range},
+                {"completed_at": {"$exists": False}, "updated_at": time_range}
+            ]},
+            {"purpose": 1, "amount": 1, "currency": 1, "wish_id": 1, "items": 1, "completed_at": 1, "updated_at": 1}
+        ).batch_size(chunk_size):
+            chunk.append(transaction)
+            if len(chunk) == chunk_size:
+                add_transactions(chunk)
+                chunk = []
+        add_transactions(chunk)
+        for wish in db.wishes.find({"created_at": time_range}, {"created_at": 1}):
+            add(wish["created_at"], "new_wishes", 1)
+        for wish in db.wishes.find({"fulfilled_at": time_range}, {"fulfilled_at": 1}):
+            add(wish["fulfilled_at"], "fulfilled", 1)
+
+        # Each bucket is overwritten in one write, then the buckets of the
+        # range that no longer have data (not stamped by this run) are removed
+        requests = [
+            UpdateOne({"_id": f"{granularity}:{start.isoformat()}"}, {"$set": {**bucket, "rebuilt_at": rebuilt_at}},
+                      upsert=True)
+            for (granularity, start), bucket in buckets.items()
+        ]
+        for offset in range(0, len(requests), chunk_size):
+            self.collection.bulk_write(requests[offset:offset + chunk_size], ordered=False)
+        self.collection.delete_many({"start": time_range, "rebuilt_at": {"$ne": rebuilt_at}})
+        return len(requests)
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Rebuild the statistics rollups")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="first day (UTC) to rebuild, default everything up to yesterday")
+    args = parser.parse_args()
+
+    client = MongoClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017'))
+    db = client[os.environ.get('MONGO_DB_NAME', 'wishplatform')]
+    written = RollupStore(db.stats_rollups).backfill(db, since=args.since)
+    print(f"Rebuilt {written} rollup buckets")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,295 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pymongo import MongoClient
-from pydantic import BaseModel
+from pymongo.errors import OperationFailure
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List, Dict
+from contextlib import asynccontextmanager
 import os
-from datetime import datetime, timedelta
+import json
+from datetime import datetime, timezone
 import uuid
-import paypalrestsdk
-import requests
+import asyncio
+import logging
+import time
 from dotenv import load_dotenv
+from anomaly import RiskScorer
+from events import EventBroadcaster, EventChannel
+from fx import FxTable
+from idempotency import IdempotencyStore
+from cache import LocalCache
+from compression import CachedBody, CompressionMiddleware
+from change_watcher import ChangeStreamWatcher
+from metrics import ApiMetrics, MetricsMiddleware, MongoCommandMetrics, MongoPoolMetrics
+from notifications import DigestNotifier, SMTPPool
+from outbox import OutboxDispatcher
+from payouts import PayoutScheduler
+from profiling import ProfilingMiddleware, RequestProfiler
+from rate_limit import RateLimiter
+from rollups import GRANULARITIES, RollupStore, bucket_start
+from seed import seed_success_stories
+from similarity import WishIndex, build_from_db
+from slow_ops import RequestScopeMiddleware, SlowOperationLog
+from storage import MemoryClient, Storage, empty_category_stats
+from traffic_capture import TrafficCapture, TrafficCaptureMiddleware
+from timing import MongoCommandTimings, ServerTimingMiddleware, TimedJSONResponse, timed
 
 # Load environment variables
 load_dotenv()
 
-# Database connection
+# Database connection (pymongo clients are not fork-safe, so each worker
+# opens its own inside the lifespan below). STORAGE_BACKEND=memory keeps
+# everything in process, for tests and local development.
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'mongo').lower()
 MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = MongoClient(MONGO_URL)
-db = client.wishplatform
-wishes_collection = db.wishes
-success_stories_collection = db.success_stories
-payment_transactions_collection = db.payment_transactions
+MONGO_DB_NAME = os.environ.get('MONGO_DB_NAME', 'wishplatform')
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))
+client = None
+db = None
+storage = None
+idempotency = None
+rollups = None
+fx_rates = None
+
+# Idempotency-Key records for POST /api/wishes and /api/payments/create
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', str(24 * 3600)))
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', '30'))
+
+# In-process metrics, exposed at /metrics; with a directory shared by the
+# workers (gunicorn.conf.py sets one) every worker's /metrics covers them all
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_EXPORT_SECONDS = float(os.environ.get('METRICS_EXPORT_SECONDS', '5'))
+metrics = ApiMetrics(directory=METRICS_DIR)
+EVENT_LOOP_LAG_INTERVAL = float(os.environ.get('EVENT_LOOP_LAG_INTERVAL', '0.5'))
+
+# Server-Timing breakdown (fraction of requests sampled; requests with the
+# admin token always get it). Off for everyone else by default, the header
+# tells any client how long each database call took
+SERVER_TIMING_SAMPLE_RATE = float(os.environ.get('SERVER_TIMING_SAMPLE_RATE', '0'))
+SERVER_TIMING_LOG = os.environ.get('SERVER_TIMING_LOG', 'false').lower() == 'true'
+
+# Slow MongoDB operation log (admin endpoint /api/admin/slow-ops)
+SLOW_OP_THRESHOLD_MS = float(os.environ.get('SLOW_OP_THRESHOLD_MS', '100'))
+SLOW_OP_BUFFER_SIZE = int(os.environ.get('SLOW_OP_BUFFER_SIZE', '500'))
+SLOW_OP_EXPLAIN_SAMPLE_RATE = float(os.environ.get('SLOW_OP_EXPLAIN_SAMPLE_RATE', '0.1'))
+slow_ops = SlowOperationLog(
+    threshold_ms=SLOW_OP_THRESHOLD_MS,
+    buffer_size=SLOW_OP_BUFFER_SIZE,
+    explain_sample_rate=SLOW_OP_EXPLAIN_SAMPLE_RATE
+)
+
+# Response compression (gzip, brotli when installed) above this many bytes
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+
+# Admin endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# Request profiling (on demand for admins, or 1 in N requests per route)
+PROFILE_SAMPLE_EVERY = int(os.environ.get('PROFILE_SAMPLE_EVERY', '0'))
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', '2'))
+PROFILE_MAX_SECONDS = float(os.environ.get('PROFILE_MAX_SECONDS', '10'))
+# Traffic capture for replay (scripts/replay_traffic.py), off unless sampled
+TRAFFIC_CAPTURE_SAMPLE_RATE = float(os.environ.get('TRAFFIC_CAPTURE_SAMPLE_RATE', '0'))
+TRAFFIC_CAPTURE_PATH = os.environ.get('TRAFFIC_CAPTURE_PATH', 'traffic-{pid}.jsonl')
+TRAFFIC_CAPTURE_MAX_MB = int(os.environ.get('TRAFFIC_CAPTURE_MAX_MB', '50'))
+TRAFFIC_CAPTURE_BACKUPS = int(os.environ.get('TRAFFIC_CAPTURE_BACKUPS', '5'))
+traffic_capture = TrafficCapture(
+    TRAFFIC_CAPTURE_PATH,
+    sample_rate=TRAFFIC_CAPTURE_SAMPLE_RATE,
+    max_bytes=TRAFFIC_CAPTURE_MAX_MB * 1024 * 1024,
+    backups=TRAFFIC_CAPTURE_BACKUPS
+) if TRAFFIC_CAPTURE_SAMPLE_RATE > 0 else None
+
+profiler = RequestProfiler(
+    admin_token=ADMIN_TOKEN,
+    sample_every=PROFILE_SAMPLE_EVERY,
+    interval=PROFILE_INTERVAL_MS / 1000,
+    max_duration=PROFILE_MAX_SECONDS,
+    # Streams stay open for minutes, sampling one would profile everything else
+    exclude={"/api/events"}
+)
+
+# Payouts to creators of fulfilled wishes (off unless enabled)
+PAYOUTS_ENABLED = os.environ.get('PAYOUTS_ENABLED', 'false').lower() == 'true'
+PAYOUT_BATCH_SIZE = int(os.environ.get('PAYOUT_BATCH_SIZE', '100'))
+PAYOUT_INTERVAL_SECONDS = float(os.environ.get('PAYOUT_INTERVAL_SECONDS', '300'))
+PAYOUT_POLL_CONCURRENCY = int(os.environ.get('PAYOUT_POLL_CONCURRENCY', '4'))
+PAYOUT_POLL_INTERVAL_SECONDS = float(os.environ.get('PAYOUT_POLL_INTERVAL_SECONDS', '60'))
+payout_scheduler = None
+
+# Post-payment side effects, applied by the outbox dispatcher in each worker
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', '50'))
+OUTBOX_INTERVAL_SECONDS = float(os.environ.get('OUTBOX_INTERVAL_SECONDS', '1'))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '8'))
+OUTBOX_RETENTION_SECONDS = int(os.environ.get('OUTBOX_RETENTION_SECONDS', str(7 * 24 * 3600)))
+outbox = None
+
+# Creator notification digests (disabled unless SMTP_HOST is set; try
+# scripts/smtp_sink.py locally)
+SMTP_HOST = os.environ.get('SMTP_HOST')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', '25'))
+SMTP_USERNAME = os.environ.get('SMTP_USERNAME')
+SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD')
+SMTP_STARTTLS = os.environ.get('SMTP_STARTTLS', 'false').lower() == 'true'
+SMTP_POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE', '2'))
+NOTIFICATION_SENDER = os.environ.get('NOTIFICATION_SENDER', 'WishFulfill <no-reply@wishfulfill.org>')
+NOTIFICATION_WINDOW_SECONDS = float(os.environ.get('NOTIFICATION_WINDOW_SECONDS', '900'))
+NOTIFICATION_INTERVAL_SECONDS = float(os.environ.get('NOTIFICATION_INTERVAL_SECONDS', '30'))
+NOTIFICATION_RETENTION_SECONDS = int(os.environ.get('NOTIFICATION_RETENTION_SECONDS', str(30 * 24 * 3600)))
+smtp_pool = SMTPPool(
+    SMTP_HOST,
+    SMTP_PORT,
+    username=SMTP_USERNAME,
+    password=SMTP_PASSWORD,
+    starttls=SMTP_STARTTLS,
+    size=SMTP_POOL_SIZE
+) if SMTP_HOST else None
+notifier = None
 
 # PayPal Configuration
 PAYPAL_CLIENT_ID = os.environ.get('PAYPAL_CLIENT_ID')
 PAYPAL_CLIENT_SECRET = os.environ.get('PAYPAL_CLIENT_SECRET')
 PAYPAL_ENVIRONMENT = os.environ.get('PAYPAL_ENVIRONMENT', 'sandbox')
+# Override to talk to a local stand-in (scripts/paypal_standin.py)
+PAYPAL_API_BASE = os.environ.get('PAYPAL_API_BASE')
 
-# Configure PayPal SDK
-paypalrestsdk.configure({
-    "mode": PAYPAL_ENVIRONMENT,
-    "client_id": PAYPAL_CLIENT_ID,
-    "client_secret": PAYPAL_CLIENT_SECRET
-})
+def connect_database():
+    global client, db, storage, idempotency, rollups, fx_rates, payout_scheduler, outbox, notifier, rate_limiter
+    global event_channel
+    if STORAGE_BACKEND == "memory":
+        client = MemoryClient()
+        db = client[MONGO_DB_NAME]
+        # Nothing persists between runs, so start from the demo content
+        seed_success_stories(db)
+    else:
+        client = MongoClient(
+            MONGO_URL,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            event_listeners=[
+                MongoCommandMetrics(metrics),
+                MongoPoolMetrics(metrics),
+                MongoCommandTimings(),
+                slow_ops
+            ]
+        )
+        slow_ops.attach(client)
+        db = client[MONGO_DB_NAME]
+    storage = Storage(db)
+    rollups = RollupStore(db.stats_rollups)
+    fx_rates = FxTable(db.fx_rates, refresh_interval=FX_REFRESH_SECONDS)
+    idempotency = IdempotencyStore(db.idempotency_keys, wait_timeout=IDEMPOTENCY_WAIT_SECONDS)
+    rate_limiter = RateLimiter(
+        {route: (per_minute / 60, burst) for route, (per_minute, burst) in RATE_LIMITS.items()},
+        capacity=RATE_LIMIT_TRACKED_CLIENTS,
+        # The memory backend has no pipeline updates, its single process needs no sharing anyway
+        collection=db.rate_limits if RATE_LIMIT_SHARED and STORAGE_BACKEND != "memory" else None
+    )
+    payout_scheduler = PayoutScheduler(
+        db, paypal_sdk, metrics,
+        batch_size=PAYOUT_BATCH_SIZE,
+        interval=PAYOUT_INTERVAL_SECONDS,
+        poll_concurrency=PAYOUT_POLL_CONCURRENCY,
+        poll_interval=PAYOUT_POLL_INTERVAL_SECONDS
+    )
+    outbox = OutboxDispatcher(
+        db.outbox,
+        {"payment_completed": settle_payment},
+        batch_size=OUTBOX_BATCH_SIZE,
+        interval=OUTBOX_INTERVAL_SECONDS,
+        max_attempts=OUTBOX_MAX_ATTEMPTS
+    )
+    # The memory backend runs in a single process, its broadcaster reaches everyone
+    if SSE_SHARED and STORAGE_BACKEND != "memory":
+        event_channel = EventChannel(db)
+        broadcaster.channel = event_channel
+    if smtp_pool:
+        notifier = DigestNotifier(
+            db.notifications, smtp_pool, NOTIFICATION_SENDER,
+            window=NOTIFICATION_WINDOW_SECONDS,
+            interval=NOTIFICATION_INTERVAL_SECONDS,
+            concurrency=SMTP_POOL_SIZE
+        )
+
+_paypal_sdk = None
+
+def paypal_sdk():
+    """Import and configure the PayPal SDK on first use (keeps startup fast)"""
+    global _paypal_sdk
+    if _paypal_sdk is None:
+        import paypalrestsdk
+        options = {
+            "mode": PAYPAL_ENVIRONMENT,
+            "client_id": PAYPAL_CLIENT_ID,
+            "client_secret": PAYPAL_CLIENT_SECRET
+        }
+        if PAYPAL_API_BASE:
+            options["endpoint"] = PAYPAL_API_BASE
+        paypalrestsdk.configure(options)
+        _paypal_sdk = paypalrestsdk
+    return _paypal_sdk
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create clients and background tasks per worker, after any fork"""
+    global change_watcher
+    connect_database()
+    broadcaster.attach(asyncio.get_running_loop())
+    if event_channel:
+        event_channel.start(broadcaster.publish_local)
+    if traffic_capture:
+        traffic_capture.start()
+    warm_up_task = asyncio.create_task(warm_up())
+    loop_lag_task = asyncio.create_task(metrics.watch_event_loop(EVENT_LOOP_LAG_INTERVAL))
+    metrics_task = asyncio.create_task(metrics.export(METRICS_EXPORT_SECONDS))
+    outbox_task = asyncio.create_task(outbox.run())
+    fx_task = asyncio.create_task(fx_rates.watch(invalidate_currency_totals))
+    payout_task = asyncio.create_task(payout_scheduler.run()) if PAYOUTS_ENABLED else None
+    notification_task = asyncio.create_task(notifier.run()) if notifier else None
+    similarity_task = asyncio.create_task(maintain_similar_index())
+    if CHANGE_STREAMS_ENABLED and STORAGE_BACKEND != "memory":
+        change_watcher = ChangeStreamWatcher(db, cache, CACHE_NAMESPACES)
+        change_watcher.start()
+    print(f"Worker {os.getpid()} starting, PayPal {PAYPAL_ENVIRONMENT} environment")
+    
+    yield
+    
+    warm_up_task.cancel()
+    loop_lag_task.cancel()
+    metrics_task.cancel()
+    if METRICS_DIR:
+        # The counts so far stay in the totals after this worker exits
+        metrics.write_snapshot()
+    outbox_task.cancel()
+    fx_task.cancel()
+    similarity_task.cancel()
+    if payout_task:
+        payout_task.cancel()
+    if notification_task:
+        notification_task.cancel()
+        smtp_pool.close()
+    if change_watcher:
+        change_watcher.stop()
+        change_watcher = None
+    if event_channel:
+        event_channel.stop()
+    slow_ops.close()
+    if traffic_capture:
+        traffic_capture.stop()
+    client.close()
+
+app = FastAPI(lifespan=lifespan, default_response_class=TimedJSONResponse)
+
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+app.add_middleware(
+    ServerTimingMiddleware,
+    sample_rate=SERVER_TIMING_SAMPLE_RATE, log_timings=SERVER_TIMING_LOG, admin_token=ADMIN_TOKEN
+)
+app.add_middleware(RequestScopeMiddleware)
+app.add_middleware(ProfilingMiddleware, profiler=profiler)
+if traffic_capture:
+    app.add_middleware(TrafficCaptureMiddleware, capture=traffic_capture)
 
 # CORS middleware
 app.add_middleware(
@@ -51,15 +307,161 @@ WISH_CATEGORIES = [
 ]
 
 POSTING_FEE = 2.0  # Fixed 2€ posting fee
+CART_MAX_ITEMS = int(os.environ.get('CART_MAX_ITEMS', '20'))
+
+# Risk scores of payment attempts (see anomaly.py): from RISK_FLAG_SCORE on
+# transactions are flagged for review, from RISK_THROTTLE_SCORE on refused
+RISK_FLAG_SCORE = float(os.environ.get('RISK_FLAG_SCORE', '0.5'))
+RISK_THROTTLE_SCORE = float(os.environ.get('RISK_THROTTLE_SCORE', '0.9'))
+RISK_WINDOW_SECONDS = float(os.environ.get('RISK_WINDOW_SECONDS', '600'))
+RISK_MAX_EVENTS = int(os.environ.get('RISK_MAX_EVENTS', '10'))
+RISK_TINY_AMOUNT = float(os.environ.get('RISK_TINY_AMOUNT', '1.0'))  # in REPORTING_CURRENCY
+
+risk_scorer = RiskScorer(window=RISK_WINDOW_SECONDS, max_events=RISK_MAX_EVENTS, tiny_amount=RISK_TINY_AMOUNT)
+
+# Token buckets per client IP and route (see rate_limit.py), in each worker
+# or shared by all of them through MongoDB with RATE_LIMIT_SHARED. Per-worker
+# buckets let a client through up to N times the limits below with N workers;
+# gunicorn.conf.py turns sharing on whenever it runs more than one.
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+RATE_LIMIT_SHARED = os.environ.get('RATE_LIMIT_SHARED', 'false').lower() == 'true'
+RATE_LIMIT_TRACKED_CLIENTS = int(os.environ.get('RATE_LIMIT_TRACKED_CLIENTS', '100000'))
+RATE_LIMITS = {
+    # route: (requests per minute, burst)
+    "payments": (float(os.environ.get('RATE_LIMIT_PAYMENTS_PER_MINUTE', '10')),
+                 float(os.environ.get('RATE_LIMIT_PAYMENTS_BURST', '5'))),
+    "wishes": (float(os.environ.get('RATE_LIMIT_WISHES_PER_MINUTE', '5')),
+               float(os.environ.get('RATE_LIMIT_WISHES_BURST', '3'))),
+}
+rate_limiter = None
+
+# Totals across currencies are reported in REPORTING_CURRENCY, converted
+# with the latest FX rate table (seeded from FX_RATES_FILE, see fx.py)
+REPORTING_CURRENCY = os.environ.get('REPORTING_CURRENCY', 'EUR').upper()
+FX_RATES_FILE = os.environ.get('FX_RATES_FILE')
+FX_REFRESH_SECONDS = float(os.environ.get('FX_REFRESH_SECONDS', '60'))
+
+# Parquet export read by /api/admin/analytics (written by analytics.py)
+ANALYTICS_DIR = os.environ.get('ANALYTICS_DIR', 'analytics')
+
+# Similar wishes index (see similarity.py). With SIMILARITY_INDEX_PATH the
+# file built offline is loaded and reloaded when it changes, otherwise every
+# worker builds its own index every SIMILARITY_REBUILD_SECONDS
+SIMILARITY_INDEX_PATH = os.environ.get('SIMILARITY_INDEX_PATH')
+SIMILARITY_REBUILD_SECONDS = float(os.environ.get('SIMILARITY_REBUILD_SECONDS', '3600'))
+SIMILARITY_RELOAD_CHECK_SECONDS = float(os.environ.get('SIMILARITY_RELOAD_CHECK_SECONDS', '60'))
+SIMILAR_WISHES_MAX = int(os.environ.get('SIMILAR_WISHES_MAX', '20'))
+similar_index = None
+
+# /api/statistics/timeseries ranges
+TIMESERIES_DEFAULT_BUCKETS = {"hour": 48, "day": 30}
+TIMESERIES_MAX_BUCKETS = int(os.environ.get('TIMESERIES_MAX_BUCKETS', '2000'))
+
+# Live updates (Server-Sent Events)
+SSE_QUEUE_SIZE = int(os.environ.get('SSE_QUEUE_SIZE', '32'))
+SSE_MAX_SUBSCRIBERS = int(os.environ.get('SSE_MAX_SUBSCRIBERS', '10000'))
+SSE_HEARTBEAT_SECONDS = float(os.environ.get('SSE_HEARTBEAT_SECONDS', '15'))
+# Relay events between workers, so every SSE client sees payments settled by any of them
+SSE_SHARED = os.environ.get('SSE_SHARED', 'true').lower() == 'true'
+
+broadcaster = EventBroadcaster(queue_size=SSE_QUEUE_SIZE, max_subscribers=SSE_MAX_SUBSCRIBERS)
+event_channel = None
+
+# Response caches (invalidated across workers through change streams)
+CACHE_TTL_SECONDS = float(os.environ.get('CACHE_TTL_SECONDS', '30'))
+CHANGE_STREAMS_ENABLED = os.environ.get('CHANGE_STREAMS_ENABLED', 'true').lower() == 'true'
+
+# Cache namespaces affected by writes to each collection
+CACHE_NAMESPACES = {
+    "wishes": ("wishes", "wish", "similar_wishes", "statistics", "category_statistics"),
+    "payment_transactions": ("statistics",),
+    "success_stories": ("success_stories",),
+}
+
+cache = LocalCache(ttl=CACHE_TTL_SECONDS)
+change_watcher = None
+
+logger = logging.getLogger("wish-platform")
+
+# Indexes the API relies on, verified (created if missing) at startup
+INDEXES = {
+    "wishes": [
+        ([("id", 1)], {"unique": True}),
+        ([("status", 1), ("payment_status", 1), ("category", 1), ("created_at", -1)], {}),
+        ([("payment_status", 1)], {}),
+        ([("status", 1), ("payout_queued_at", 1)], {}),
+        ([("created_at", 1)], {}),
+    ],
+    "payment_transactions": [
+        ([("payment_id", 1)], {}),
+        ([("id", 1)], {}),
+        ([("created_at", 1)], {}),
+        ([("risk_flagged", 1), ("created_at", -1)], {}),
+    ],
+    "success_stories": [
+        ([("fulfillment_date", -1)], {}),
+    ],
+    "donation_ledger": [
+        ([("wish_id", 1), ("created_at", -1)], {}),
+        ([("payment_id", 1), ("wish_id", 1)], {"unique": True}),
+    ],
+    "payouts": [
+        ([("wish_id", 1), ("sequence", 1)], {"unique": True}),
+        ([("status", 1), ("created_at", 1)], {}),
+        ([("status", 1), ("updated_at", 1)], {}),
+        ([("batch_id", 1)], {}),
+    ],
+    "payout_batches": [
+        ([("status", 1), ("next_poll_at", 1)], {}),
+        ([("status", 1), ("retry_at", 1)], {}),
+        ([("created_at", -1)], {}),
+    ],
+    "outbox": [
+        ([("state", 1), ("available_at", 1)], {}),
+        ([("claimed_by", 1)], {}),
+        ([("processed_at", 1)], {"expireAfterSeconds": OUTBOX_RETENTION_SECONDS}),
+    ],
+    "notifications": [
+        ([("state", 1), ("created_at", 1)], {}),
+        ([("creator_email", 1), ("state", 1)], {}),
+        ([("digest_id", 1)], {}),
+        ([("sent_at", 1)], {"expireAfterSeconds": NOTIFICATION_RETENTION_SECONDS}),
+    ],
+    "fx_rates": [
+        ([("version", -1)], {"unique": True}),
+    ],
+    "stats_rollups": [
+        ([("granularity", 1), ("start", 1)], {}),
+    ],
+    "rate_limits": [
+        ([("expires_at", 1)], {"expireAfterSeconds": 0}),
+    ],
+    "idempotency_keys": [
+        ([("created_at", 1)], {"expireAfterSeconds": IDEMPOTENCY_TTL_SECONDS}),
+    ],
+}
+
+# Indexes replaced by one of the above, dropped where they still exist
+RETIRED_INDEXES = {
+    # A wish gets one payout per top-up now, see payouts.queue_fulfilled
+    "payouts": ["wish_id_1"],
+}
+
+# Readiness (reported by /api/ready, flipped by warm_up)
+readiness = {
+    "mongo": False,
+    "indexes": False,
+    "caches": False,
+}
 
 # Pydantic models
 class WishCreate(BaseModel):
     title: str
     description: str
-    amount_needed: float
+    amount_needed: float = Field(gt=0)
     currency: str
     creator_name: str
-    creator_email: str
+    creator_email: EmailStr  # goes into the To: header of digest emails
     creator_paypal: Optional[str] = None
     category: str
     urgency: str = "medium"
@@ -84,6 +486,9 @@ class Wish(BaseModel):
     fulfillment_percentage: float = 0.0
     payment_status: str = "pending"  # pending, paid, failed
 
+class SimilarWish(Wish):
+    similarity: float
+
 class SuccessStory(BaseModel):
     id: str
     title: str
@@ -103,23 +508,65 @@ class PaymentRequest(BaseModel):
     return_url: str
     cancel_url: str
 
+class CartItem(BaseModel):
+    wish_id: str
+    amount: float
+
+class CartPaymentRequest(BaseModel):
+    items: List[CartItem]
+    currency: str
+    return_url: str
+    cancel_url: str
+
 class PaymentTransaction(BaseModel):
     id: str
     payment_id: str
     session_id: Optional[str] = None
     amount: float
     currency: str
-    purpose: str
+    purpose: str  # posting_fee, donation or cart
     wish_id: Optional[str] = None
+    items: Optional[List[CartItem]] = None  # cart payments only
     payer_email: Optional[str] = None
     status: str  # pending, completed, failed, cancelled
+    risk_score: Optional[float] = None
+    risk_flagged: bool = False
     created_at: datetime
     updated_at: datetime
 
 # Helper functions
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Dependency guarding admin endpoints with the ADMIN_TOKEN secret"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+def rate_limited(route: str, idempotency_scope: Optional[str] = None):
+    """Dependency refusing clients over the RATE_LIMITS of `route` with 429.
+
+    Retries of a completed idempotent request (an Idempotency-Key with a
+    stored response in `idempotency_scope`) pass: they only replay it.
+    """
+    def check(request: Request, idempotency_key: Optional[str] = Header(None)):
+        if not RATE_LIMIT_ENABLED:
+            return
+        if idempotency_scope and idempotency_key and idempotency.completed(idempotency_key, idempotency_scope):
+            return
+        wait = rate_limiter.check(route, request.client.host if request.client else "unknown")
+        if wait:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, please try again later",
+                headers={"Retry-After": str(wait)}
+            )
+    return check
+
+@timed("paypal_token")
 def get_paypal_access_token():
     """Get PayPal access token for API calls"""
-    url = f"https://api.{PAYPAL_ENVIRONMENT}.paypal.com/v1/oauth2/token"
+    base_url = PAYPAL_API_BASE or f"https://api.{PAYPAL_ENVIRONMENT}.paypal.com"
+    url = f"{base_url}/v1/oauth2/token"
     
     headers = {
         'Accept': 'application/json',
@@ -128,21 +575,32 @@ def get_paypal_access_token():
     
     data = 'grant_type=client_credentials'
     
-    response = requests.post(
-        url, 
-        headers=headers, 
-        data=data, 
-        auth=(PAYPAL_CLIENT_ID, PAYPAL_CLIENT_SECRET)
-    )
+    import requests
     
-    if response.status_code == 200:
-        return response.json()['access_token']
-    else:
-        raise HTTPException(status_code=500, detail="Failed to get PayPal access token")
+    with metrics.paypal_call("oauth_token"):
+        response = requests.post(
+            url, 
+            headers=headers, 
+            data=data, 
+            auth=(PAYPAL_CLIENT_ID, PAYPAL_CLIENT_SECRET)
+        )
+        if response.status_code != 200:
+            raise HTTPException(status_code=500, detail="Failed to get PayPal access token")
+    
+    return response.json()['access_token']
 
-def create_paypal_payment(amount: float, currency: str, return_url: str, cancel_url: str, description: str):
-    """Create PayPal payment"""
-    payment = paypalrestsdk.Payment({
+def build_paypal_payment(amount: float, currency: str, return_url: str, cancel_url: str, description: str,
+                         items: Optional[List[dict]] = None):
+    """PayPal payment payload, a single item unless `items` is given"""
+    if items is None:
+        items = [{
+            "name": description,
+            "sku": "001",
+            "price": str(amount),
+            "currency": currency.upper(),
+            "quantity": 1
+        }]
+    return {
         "intent": "sale",
         "payer": {
             "payment_method": "paypal"
@@ -153,13 +611,7 @@ def create_paypal_payment(amount: float, currency: str, return_url: str, cancel_
         },
         "transactions": [{
             "item_list": {
-                "items": [{
-                    "name": description,
-                    "sku": "001",
-                    "price": str(amount),
-                    "currency": currency.upper(),
-                    "quantity": 1
-                }]
+                "items": items
             },
             "amount": {
                 "total": str(amount),
@@ -167,201 +619,255 @@ def create_paypal_payment(amount: float, currency: str, return_url: str, cancel_
             },
             "description": description
         }]
-    })
+    }
+
+@timed("paypal_create")
+def create_paypal_payment(amount: float, currency: str, return_url: str, cancel_url: str, description: str,
+                          items: Optional[List[dict]] = None):
+    """Create PayPal payment"""
+    payment = paypal_sdk().Payment(build_paypal_payment(amount, currency, return_url, cancel_url, description, items))
     
-    if payment.create():
-        return payment
-    else:
-        raise HTTPException(status_code=500, detail=f"PayPal payment creation failed: {payment.error}")
+    with metrics.paypal_call("create_payment"):
+        if not payment.create():
+            raise HTTPException(status_code=500, detail=f"PayPal payment creation failed: {payment.error}")
+    return payment
 
-def execute_paypal_payment(payment_id: str, payer_id: str):
+def find_paypal_payment(payment_id: str):
+    with metrics.paypal_call("find_payment"):
+        return paypal_sdk().Payment.find(payment_id)
+
+@timed("paypal_execute")
+def execute_paypal_payment(payment, payer_id: str):
     """Execute PayPal payment after user approval"""
-    payment = paypalrestsdk.Payment.find(payment_id)
-    
-    if payment.execute({"payer_id": payer_id}):
+    if payment.state == "approved":
+        # Executed by an earlier attempt whose result was not recorded
         return payment
+    
+    with metrics.paypal_call("execute_payment"):
+        if not payment.execute({"payer_id": payer_id}):
+            raise HTTPException(status_code=500, detail=f"PayPal payment execution failed: {payment.error}")
+    return payment
+
+# Startup warm-up
+def ensure_indexes():
+    for collection_name, indexes in INDEXES.items():
+        for keys, options in indexes:
+            db[collection_name].create_index(keys, **options)
+    for collection_name, names in RETIRED_INDEXES.items():
+        for name in names:
+            try:
+                db[collection_name].drop_index(name)
+            except OperationFailure:
+                pass  # already gone
+
+def cached_body(namespace: str, key, compute):
+    """Cached, pre-encoded (and lazily precompressed) response body"""
+    return cache.get_or_compute(namespace, key, lambda: CachedBody(compute(), COMPRESSION_MIN_SIZE))
+
+def warm_caches():
+    # Build the compressed variants now rather than on the first request
+    cached_body("statistics", None, compute_statistics).precompress()
+    cached_body("category_statistics", None, compute_category_statistics).precompress()
+    cached_body("success_stories", None, load_success_stories).precompress()
+    default_query = {"status": "active", "payment_status": "paid"}
+    cached_body("wishes", (50, None, None, "active", True), lambda: load_wishes(default_query, 50)).precompress()
+
+def load_fx_rates():
+    if FX_RATES_FILE:
+        with open(FX_RATES_FILE) as f:
+            fx_rates.publish(json.load(f), source=FX_RATES_FILE)
     else:
-        raise HTTPException(status_code=500, detail=f"PayPal payment execution failed: {payment.error}")
-
-# Initialize demo success stories
-def init_success_stories():
-    if success_stories_collection.count_documents({}) == 0:
-        demo_stories = [
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Medical Treatment for Maria's Surgery",
-                "description": "Thanks to 15 generous donors, Maria received the life-saving surgery she needed. She's now fully recovered and back to her studies.",
-                "amount_fulfilled": 8500.0,
-                "currency": "EUR",
-                "fulfillment_date": datetime.utcnow() - timedelta(days=45),
-                "donor_count": 15,
-                "photo_url": "https://images.unsplash.com/photo-1559757148-5c350d0d3c56",
-                "category": "Health"
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Lisa's Dream University Education",
-                "description": "Lisa's dream of studying computer science came true when 23 donors helped fund her tuition. She just graduated with honors!",
-                "amount_fulfilled": 12000.0,
-                "currency": "EUR",
-                "fulfillment_date": datetime.utcnow() - timedelta(days=120),
-                "donor_count": 23,
-                "photo_url": "https://images.unsplash.com/photo-1541339907198-e08756dedf3f",
-                "category": "Education"
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Emergency Rent for Single Mother",
-                "description": "Within 48 hours, 8 kind strangers helped prevent Sarah and her children from becoming homeless. They're now stable and thriving.",
-                "amount_fulfilled": 2800.0,
-                "currency": "EUR",
-                "fulfillment_date": datetime.utcnow() - timedelta(days=30),
-                "donor_count": 8,
-                "photo_url": "https://images.unsplash.com/photo-1519834785169-98be25ec3f84",
-                "category": "Emergency"
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Community Garden Project",
-                "description": "Local residents came together to fund a community garden that now feeds 50 families weekly. Amazing teamwork!",
-                "amount_fulfilled": 5200.0,
-                "currency": "EUR",
-                "fulfillment_date": datetime.utcnow() - timedelta(days=90),
-                "donor_count": 31,
-                "photo_url": "https://images.pexels.com/photos/3184418/pexels-photo-3184418.jpeg",
-                "category": "Community"
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Small Business Startup Fund",
-                "description": "Anna's dream of opening a local bakery became reality when 42 supporters believed in her vision. Her bakery now employs 6 people!",
-                "amount_fulfilled": 15000.0,
-                "currency": "EUR",
-                "fulfillment_date": datetime.utcnow() - timedelta(days=180),
-                "donor_count": 42,
-                "photo_url": "https://images.unsplash.com/photo-1556909114-f6e7ad7d3136",
-                "category": "Business"
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Art Therapy for Children",
-                "description": "This creative program for underprivileged kids was fully funded by 28 art lovers. Over 100 children have benefited so far!",
-                "amount_fulfilled": 4500.0,
-                "currency": "EUR",
-                "fulfillment_date": datetime.utcnow() - timedelta(days=60),
-                "donor_count": 28,
-                "photo_url": "https://images.unsplash.com/photo-1513475382585-d06e58bcb0e0",
-                "category": "Creative"
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Laptop for Remote Learning",
-                "description": "17-year-old Marcus got his first laptop thanks to 12 donors who wanted to support his education during lockdown. He's now excelling in his studies!",
-                "amount_fulfilled": 800.0,
-                "currency": "EUR",
-                "fulfillment_date": datetime.utcnow() - timedelta(days=20),
-                "donor_count": 12,
-                "photo_url": "https://images.unsplash.com/photo-1517077304055-6e89abbf09b0",
-                "category": "Technology"
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Family Reunion Trip",
-                "description": "After 5 years apart, the Schmidt family was reunited when 19 generous people funded their travel costs. The tears of joy were worth it!",
-                "amount_fulfilled": 2200.0,
-                "currency": "EUR",
-                "fulfillment_date": datetime.utcnow() - timedelta(days=75),
-                "donor_count": 19,
-                "photo_url": "https://images.unsplash.com/photo-1511895426328-dc8714191300",
-                "category": "Family"
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Mental Health Counseling",
-                "description": "David got the therapy he needed thanks to 9 compassionate donors. He's now mentoring others struggling with similar challenges.",
-                "amount_fulfilled": 1800.0,
-                "currency": "EUR",
-                "fulfillment_date": datetime.utcnow() - timedelta(days=40),
-                "donor_count": 9,
-                "photo_url": "https://images.unsplash.com/photo-1573496359142-b8d87734a5a2",
-                "category": "Health"
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Dream Wedding for Cancer Survivor",
-                "description": "Emma's fairy tale wedding happened 6 months after beating cancer. 67 donors made her dream day possible during her recovery.",
-                "amount_fulfilled": 6800.0,
-                "currency": "EUR",
-                "fulfillment_date": datetime.utcnow() - timedelta(days=15),
-                "donor_count": 67,
-                "photo_url": "https://images.unsplash.com/photo-1519741497674-611481863552",
-                "category": "Family"
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Music Instruments for Youth Orchestra",
-                "description": "The local youth orchestra got new instruments thanks to 35 music lovers. Now 50 kids can pursue their musical dreams!",
-                "amount_fulfilled": 7500.0,
-                "currency": "EUR",
-                "fulfillment_date": datetime.utcnow() - timedelta(days=95),
-                "donor_count": 35,
-                "photo_url": "https://images.unsplash.com/photo-1493225457124-a3eb161ffa5f",
-                "category": "Creative"
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Wheelchair Accessible Van",
-                "description": "Tom's mobility was restored when 52 caring people funded his accessible vehicle. Independence has changed his entire life!",
-                "amount_fulfilled": 18500.0,
-                "currency": "EUR",
-                "fulfillment_date": datetime.utcnow() - timedelta(days=200),
-                "donor_count": 52,
-                "photo_url": "https://images.unsplash.com/photo-1544551763-46a013bb70d5",
-                "category": "Health"
-            }
-        ]
-        success_stories_collection.insert_many(demo_stories)
+        fx_rates.refresh()
+    # Totals cached before the first rates were known were computed without them
+    invalidate_currency_totals()
+
+def invalidate_currency_totals():
+    cache.invalidate("statistics", "category_statistics")
+
+async def warm_up():
+    """Bring this worker to ready: reach Mongo, verify indexes, fill caches"""
+    started = datetime.utcnow()
+    delay = 0.5
+    while not readiness["mongo"]:
+        try:
+            await asyncio.to_thread(client.admin.command, "ping")
+            readiness["mongo"] = True
+        except Exception as e:
+            logger.warning("MongoDB not reachable yet: %s", e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 10)
+    
+    await asyncio.to_thread(ensure_indexes)
+    readiness["indexes"] = True
+    await asyncio.to_thread(load_fx_rates)
+    await asyncio.to_thread(warm_caches)
+    readiness["caches"] = True
+    logger.info("Worker %s ready in %.2fs", os.getpid(), (datetime.utcnow() - started).total_seconds())
+
+async def maintain_similar_index():
+    """Background task: load or build the similar wishes index, then keep it current"""
+    global similar_index
+    while not readiness["mongo"]:
+        await asyncio.sleep(0.5)
+    loaded_mtime = None
+    while True:
+        delay = SIMILARITY_RELOAD_CHECK_SECONDS if SIMILARITY_INDEX_PATH else SIMILARITY_REBUILD_SECONDS
+        try:
+            if SIMILARITY_INDEX_PATH and os.path.exists(SIMILARITY_INDEX_PATH):
+                mtime = os.path.getmtime(SIMILARITY_INDEX_PATH)
+                if mtime != loaded_mtime:
+                    index = await asyncio.to_thread(WishIndex.load, SIMILARITY_INDEX_PATH)
+                    loaded_mtime = mtime
+                else:
+                    index = None
+            else:
+                index = await asyncio.to_thread(build_from_db, db)
+            if index is not None:
+                if similar_index is not None:
+                    index.adopt(similar_index)
+                similar_index = index
+                cache.invalidate("similar_wishes")
+                logger.info("Similar wishes index ready: %s", index.stats())
+        except Exception:
+            logger.exception("Similar wishes index update failed")
+            delay = SIMILARITY_RELOAD_CHECK_SECONDS
+        await asyncio.sleep(delay)
 
 # API Routes
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy", "service": "wish-platform", "payments": "paypal"}
 
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness probe: 200 once Mongo is reachable, indexes verified and caches warm"""
+    ready = all(readiness.values())
+    content = {"status": "ready" if ready else "starting", "checks": readiness}
+    return JSONResponse(content=content, status_code=200 if ready else 503)
+
 @app.get("/api/categories")
 async def get_categories():
     return {"categories": WISH_CATEGORIES}
 
-@app.get("/api/statistics")
-async def get_statistics():
+def compute_statistics():
     # Calculate real statistics
-    total_wishes = wishes_collection.count_documents({})
-    fulfilled_wishes = wishes_collection.count_documents({"status": "fulfilled"}) + 12  # Include demo stories
+    total_wishes = storage.wishes.count()
+    fulfilled_wishes = storage.wishes.count({"status": "fulfilled"}) + 12  # Include demo stories
     
-    # Get total from paid wishes only + demo amounts
-    paid_wishes = list(wishes_collection.find({"payment_status": "paid"}))
-    total_raised = sum([wish.get("donations_received", 0) for wish in paid_wishes]) + 95700  # Include demo amounts
+    # Get total from paid wishes only + demo amounts, per currency
+    raised = storage.wishes.raised_by_currency({"payment_status": "paid"})
+    raised["EUR"] = raised.get("EUR", 0) + 95700  # Include demo amounts
+    total_raised, unconverted = fx_rates.convert(raised, REPORTING_CURRENCY)
     
     return {
         "total_wishes": total_wishes + 12,
         "fulfilled_wishes": fulfilled_wishes,
         "total_raised": total_raised,
+        "currency": REPORTING_CURRENCY,
+        "raised_by_currency": {currency: round(amount, 2) for currency, amount in raised.items()},
+        "unconverted": unconverted,
+        "fx_version": fx_rates.version,
         "success_rate": round((fulfilled_wishes / max(total_wishes + 12, 1)) * 100, 1),
         "posting_fee": POSTING_FEE,
         "active_users": 1247,  # Demo number for active users
         "countries": 23  # Demo number for countries
     }
 
+@app.get("/api/statistics")
+async def get_statistics(request: Request):
+    body = cached_body("statistics", None, compute_statistics)
+    return body.response(request.headers.get("accept-encoding"))
+
+@app.get("/api/statistics/categories")
+async def get_category_statistics(request: Request):
+    body = cached_body("category_statistics", None, compute_category_statistics)
+    return body.response(request.headers.get("accept-encoding"))
+
+def compute_category_statistics():
+    categories, overall = storage.wishes.category_stats(WISH_CATEGORIES, fallback="Other")
+    rows = [categories.get(category, empty_category_stats()) for category in WISH_CATEGORIES]
+    # One vectorized conversion for every category; conversion is linear, so they add up to the overall total
+    totals, unconverted = fx_rates.convert_many([row["raised"] for row in rows], REPORTING_CURRENCY)
+    
+    def summarize(name, stats, total_raised):
+        return {
+            "category": name,
+            "wishes": stats["wishes"],
+            "active": stats["active"],
+            "paid": stats["paid"],
+            "fulfilled": stats["fulfilled"],
+            "total_raised": total_raised,
+            "raised_by_currency": {currency: round(amount, 2) for currency, amount in stats["raised"].items()},
+            "average_fulfillment": round(stats["average_fulfillment"] or 0.0, 1)
+        }
+    
+    return {
+        "currency": REPORTING_CURRENCY,
+        "fx_version": fx_rates.version,
+        "categories": [summarize(category, row, total)
+                       for category, row, total in zip(WISH_CATEGORIES, rows, totals)],
+        "overall": summarize("All", overall, round(sum(totals), 2)),
+        "unconverted": unconverted
+    }
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Stored timestamps are naive UTC, convert aware query parameters to match"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+@app.get("/api/statistics/timeseries")
+async def get_statistics_timeseries(
+    granularity: str = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """Donations, amounts per currency, new and fulfilled wishes per hour or day (UTC)"""
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {', '.join(GRANULARITIES)}")
+    step = GRANULARITIES[granularity]
+    start, end = naive_utc(start), naive_utc(end)
+    if end is None:
+        end = bucket_start(datetime.utcnow(), granularity) + step
+    if start is None:
+        start = end - step * TIMESERIES_DEFAULT_BUCKETS[granularity]
+    start = bucket_start(start, granularity)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if (end - start) / step > TIMESERIES_MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"At most {TIMESERIES_MAX_BUCKETS} buckets per request")
+    return {
+        "granularity": granularity,
+        "start": start,
+        "end": end,
+        "buckets": rollups.series(granularity, start, end)
+    }
+
 @app.get("/api/success-stories", response_model=List[SuccessStory])
-async def get_success_stories():
-    stories = list(success_stories_collection.find({}).sort("fulfillment_date", -1))
+async def get_success_stories(request: Request):
+    body = cached_body("success_stories", None, load_success_stories)
+    return body.response(request.headers.get("accept-encoding"))
+
+def load_success_stories():
+    stories = storage.success_stories.list_recent()
     for story in stories:
         story["_id"] = str(story["_id"])
     return [SuccessStory(**story) for story in stories]
 
 # Payment endpoints
-@app.post("/api/payments/create")
-async def create_payment(payment_request: PaymentRequest):
-    """Create a PayPal payment"""
+@app.post("/api/payments/create", dependencies=[Depends(rate_limited("payments", "payments.create"))])
+async def create_payment(
+    request: Request, payment_request: PaymentRequest, idempotency_key: Optional[str] = Header(None)
+):
+    """Create a PayPal payment (retries with the same Idempotency-Key reuse it)"""
+    client = request.client.host if request.client else None
+    if idempotency_key:
+        return await idempotency.run(
+            idempotency_key, "payments.create", payment_request, lambda: start_payment(payment_request, client)
+        )
+    return start_payment(payment_request, client)
+
+def start_payment(payment_request: PaymentRequest, client: Optional[str] = None):
     try:
         # Validate amount
         if payment_request.amount <= 0:
@@ -375,6 +881,21 @@ async def create_payment(payment_request: PaymentRequest):
         else:
             description = f"Donation for Wish"
         
+        donation = payment_request.purpose == "donation" and payment_request.wish_id
+        payment_request.currency = payment_request.currency.upper()
+        if donation:
+            # Donations count towards the wish in its own currency
+            wish = storage.wishes.get(payment_request.wish_id)
+            if not wish:
+                raise HTTPException(status_code=404, detail="Wish not found")
+            wish_currency = wish.get("currency", "EUR").upper()
+            if payment_request.currency != wish_currency:
+                raise HTTPException(status_code=400, detail=f"Donations to this wish must be in {wish_currency}")
+        risk = score_payment(
+            payment_request.currency, payment_request.amount, client=client,
+            wish_amounts={payment_request.wish_id: payment_request.amount} if donation else None
+        )
+        
         # Create PayPal payment
         payment = create_paypal_payment(
             amount=payment_request.amount,
@@ -394,100 +915,294 @@ async def create_payment(payment_request: PaymentRequest):
             "purpose": payment_request.purpose,
             "wish_id": payment_request.wish_id,
             "status": "pending",
+            **risk,
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         }
         
-        payment_transactions_collection.insert_one(transaction)
-        
-        # Get approval URL
-        approval_url = None
-        for link in payment.links:
-            if link.rel == "approval_url":
-                approval_url = link.href
-                break
+        storage.transactions.insert(transaction)
         
         return {
             "payment_id": payment.id,
             "transaction_id": transaction_id,
-            "approval_url": approval_url,
+            "approval_url": approval_url(payment),
             "status": "created"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Payment creation failed: {str(e)}")
 
+def score_payment(currency: str, amount: float, client: Optional[str] = None, payer: Optional[str] = None,
+                  wish_amounts: Optional[dict] = None, previous: Optional[dict] = None) -> dict:
+    """Risk fields for a payment attempt; raises 429 when it is throttled"""
+    factor = fx_rates.factors([currency.upper()], REPORTING_CURRENCY)[0]
+    if not factor > 0:
+        factor = 1.0  # no rate (NaN): score the amount as it is
+    score, signals = risk_scorer.assess(
+        time.time(), amount * factor, client=client, payer=payer,
+        wish_amounts={wish_id: value * factor for wish_id, value in (wish_amounts or {}).items()}
+    )
+    if previous:
+        # Scored once at creation already, keep the strongest evidence
+        score = max(score, previous.get("risk_score") or 0.0)
+        signals = {**(previous.get("risk_signals") or {}), **signals}
+    risk = {"risk_score": score, "risk_signals": signals, "risk_flagged": score >= RISK_FLAG_SCORE}
+    if score >= RISK_THROTTLE_SCORE:
+        logger.warning("Throttled payment attempt (client %s, payer %s): %.2f %s", client, payer, score, signals)
+        if previous:
+            storage.transactions.update(previous["payment_id"], {**risk, "updated_at": datetime.utcnow()})
+        raise HTTPException(
+            status_code=429,
+            detail="Too many payment attempts, please try again later",
+            headers={"Retry-After": str(int(RISK_WINDOW_SECONDS))}
+        )
+    if risk["risk_flagged"]:
+        logger.warning("Flagged payment attempt (client %s, payer %s): %.2f %s", client, payer, score, signals)
+    return risk
+
+def approval_url(payment):
+    for link in payment.links:
+        if link.rel == "approval_url":
+            return link.href
+    return None
+
+@app.post("/api/payments/cart", dependencies=[Depends(rate_limited("payments", "payments.cart"))])
+async def create_cart_payment(
+    request: Request, cart: CartPaymentRequest, idempotency_key: Optional[str] = Header(None)
+):
+    """One PayPal payment donating to several wishes (one item per wish)"""
+    client = request.client.host if request.client else None
+    if idempotency_key:
+        return await idempotency.run(
+            idempotency_key, "payments.cart", cart, lambda: start_cart_payment(cart, client)
+        )
+    return start_cart_payment(cart, client)
+
+def start_cart_payment(cart: CartPaymentRequest, client: Optional[str] = None):
+    if not cart.items:
+        raise HTTPException(status_code=400, detail="Cart is empty")
+    if len(cart.items) > CART_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A cart can hold at most {CART_MAX_ITEMS} wishes")
+    if any(item.amount <= 0 for item in cart.items):
+        raise HTTPException(status_code=400, detail="Amount must be greater than 0")
+    wish_ids = [item.wish_id for item in cart.items]
+    if len(set(wish_ids)) != len(wish_ids):
+        raise HTTPException(status_code=400, detail="Each wish can only appear once in a cart")
+    
+    wishes = storage.wishes.get_many(wish_ids)
+    missing = [wish_id for wish_id in wish_ids if wish_id not in wishes]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Wish not found: {', '.join(missing)}")
+    currency = cart.currency.upper()
+    mismatched = [wish_id for wish_id in wish_ids if wishes[wish_id].get("currency", "EUR").upper() != currency]
+    if mismatched:
+        raise HTTPException(
+            status_code=400, detail=f"Wishes not funded in {currency}, pay for them separately: {', '.join(mismatched)}"
+        )
+    
+    # Item prices must add up to the total exactly, so round each one first
+    amounts = {item.wish_id: round(item.amount, 2) for item in cart.items}
+    total = round(sum(amounts.values()), 2)
+    items = [{
+        "name": wishes[wish_id]["title"][:127],
+        "sku": wish_id,
+        "price": f"{amount:.2f}",
+        "currency": currency,
+        "quantity": 1
+    } for wish_id, amount in amounts.items()]
+    risk = score_payment(currency, total, client=client, wish_amounts=amounts)
+    
+    try:
+        payment = create_paypal_payment(
+            amount=total,
+            currency=currency,
+            return_url=cart.return_url,
+            cancel_url=cart.cancel_url,
+            description=f"Donations for {len(items)} wishes",
+            items=items
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Payment creation failed: {str(e)}")
+    
+    transaction_id = str(uuid.uuid4())
+    storage.transactions.insert({
+        "id": transaction_id,
+        "payment_id": payment.id,
+        "amount": total,
+        "currency": currency,
+        "purpose": "cart",
+        "wish_id": None,
+        "items": [{"wish_id": wish_id, "amount": amount} for wish_id, amount in amounts.items()],
+        "status": "pending",
+        **risk,
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    })
+    
+    return {
+        "payment_id": payment.id,
+        "transaction_id": transaction_id,
+        "approval_url": approval_url(payment),
+        "total": total,
+        "items": len(items),
+        "status": "created"
+    }
+
+def publish_donations(settled: list, amounts: dict):
+    """Push progress for each (wish, newly fulfilled) and one statistics delta"""
+    fulfilled = 0
+    raised = {}
+    for wish, newly_fulfilled in settled:
+        broadcaster.publish("wish_progress", {
+            "id": wish["id"],
+            "donations_received": wish["donations_received"],
+            "donor_count": wish["donor_count"],
+            "fulfillment_percentage": wish["fulfillment_percentage"],
+            "status": wish.get("status", "active")
+        })
+        fulfilled += 1 if newly_fulfilled else 0
+        if wish.get("payment_status") == "paid":
+            currency = wish.get("currency", "EUR").upper()
+            raised[currency] = raised.get(currency, 0) + amounts[wish["id"]]
+    if fulfilled or raised:
+        broadcaster.publish("statistics", {
+            "fulfilled_wishes": fulfilled,
+            "total_raised": fx_rates.convert(raised, REPORTING_CURRENCY)[0]
+        })
+
 @app.post("/api/payments/execute")
 async def execute_payment(payment_id: str, payer_id: str):
     """Execute PayPal payment after user approval"""
+    # Find transaction
+    transaction = storage.transactions.get_by_payment_id(payment_id)
+    if not transaction:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    
     try:
-        # Find transaction
-        transaction = payment_transactions_collection.find_one({"payment_id": payment_id})
-        if not transaction:
-            raise HTTPException(status_code=404, detail="Transaction not found")
-        
-        # Execute payment
-        payment = execute_paypal_payment(payment_id, payer_id)
+        payment = find_paypal_payment(payment_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Payment execution failed: {str(e)}")
+    
+    # Scored by PayPal payer before any money moves, once: a retry, above all
+    # one after PayPal captured the money, is never throttled
+    risk = {}
+    if payment.state != "approved" and not transaction.get("payer_scored"):
+        risk = score_payment(transaction["currency"], transaction["amount"], payer=payer_id, previous=transaction)
+        risk["payer_scored"] = True
+        storage.transactions.update(payment_id, {**risk, "updated_at": datetime.utcnow()})
+    
+    # Execute payment; only a failure here means nothing was captured
+    try:
+        payment = execute_paypal_payment(payment, payer_id)
+    except Exception as e:
+        storage.transactions.update(payment_id, {
+            "status": "failed",
+            "updated_at": datetime.utcnow()
+        })
+        raise HTTPException(status_code=500, detail=f"Payment execution failed: {str(e)}")
+    payer_email = payment.payer.payer_info.email if payment.payer.payer_info else None
+    completed_at = datetime.utcnow()
+    
+    # The money is confirmed: record what follows it before the status
+    # change, so a crash in between still settles the payment. A storage
+    # error from here on must not mark the captured payment failed.
+    try:
+        outbox.add("payment_completed", {
+            "transaction_id": transaction["id"],
+            "payment_id": payment_id,
+            "purpose": transaction["purpose"],
+            "wish_id": transaction.get("wish_id"),
+            "amount": transaction["amount"],
+            "currency": transaction["currency"],
+            "items": transaction.get("items"),
+            "payer_email": payer_email,
+            "completed_at": completed_at
+        }, key=f"payment_completed:{payment_id}")
         
         # Update transaction status
-        payment_transactions_collection.update_one(
-            {"payment_id": payment_id},
-            {"$set": {
-                "status": "completed",
-                "payer_email": payment.payer.payer_info.email if payment.payer.payer_info else None,
-                "updated_at": datetime.utcnow()
-            }}
-        )
-        
-        # If this was a posting fee, mark the wish as paid
-        if transaction["purpose"] == "posting_fee" and transaction.get("wish_id"):
-            wishes_collection.update_one(
-                {"id": transaction["wish_id"]},
-                {"$set": {"payment_status": "paid"}}
-            )
-        
-        # If this was a donation, update the wish
-        elif transaction["purpose"] == "donation" and transaction.get("wish_id"):
-            wish = wishes_collection.find_one({"id": transaction["wish_id"]})
-            if wish:
-                new_amount = wish.get("donations_received", 0) + transaction["amount"]
-                new_donor_count = wish.get("donor_count", 0) + 1
-                fulfillment_percentage = min(100, (new_amount / wish["amount_needed"]) * 100)
-                
-                # Update status if fully funded
-                new_status = "fulfilled" if fulfillment_percentage >= 100 else "active"
-                
-                wishes_collection.update_one(
-                    {"id": transaction["wish_id"]},
-                    {"$set": {
-                        "donations_received": new_amount,
-                        "donor_count": new_donor_count,
-                        "fulfillment_percentage": fulfillment_percentage,
-                        "status": new_status
-                    }}
-                )
-        
-        return {
+        storage.transactions.update(payment_id, {
             "status": "completed",
-            "payment_id": payment_id,
-            "transaction_id": transaction["id"]
-        }
-        
+            "payer_email": payer_email,
+            "completed_at": completed_at,
+            "updated_at": completed_at
+        })
     except Exception as e:
-        # Update transaction as failed
-        payment_transactions_collection.update_one(
-            {"payment_id": payment_id},
-            {"$set": {
-                "status": "failed",
-                "updated_at": datetime.utcnow()
-            }}
+        logger.exception("Recording captured payment %s failed", payment_id)
+        raise HTTPException(status_code=500, detail=f"Payment captured but not recorded yet: {str(e)}")
+    outbox.notify()
+    
+    return {
+        "status": "completed",
+        "payment_id": payment_id,
+        "transaction_id": transaction["id"]
+    }
+
+def settle_payment(event: dict):
+    """Outbox handler for payment_completed: apply a confirmed payment to its wishes"""
+    cache.invalidate(*CACHE_NAMESPACES["payment_transactions"])
+    transaction = {
+        "id": event["transaction_id"],
+        "payment_id": event["payment_id"],
+        "currency": event["currency"]
+    }
+    
+    # If this was a posting fee, mark the wish as paid
+    if event["purpose"] == "posting_fee" and event.get("wish_id"):
+        # None when a retry finds the wish already paid, so nothing is published twice
+        wish = storage.wishes.mark_paid(event["wish_id"])
+        cache.invalidate(*CACHE_NAMESPACES["wishes"])
+        if wish:
+            broadcaster.publish("wish_paid", {
+                "id": wish["id"],
+                "category": wish.get("category", "Other"),
+                "urgency": wish.get("urgency", "medium"),
+                "status": wish.get("status", "active")
+            })
+            if wish.get("donations_received"):
+                broadcaster.publish("statistics", {
+                    "total_raised": fx_rates.convert(
+                        {wish.get("currency", "EUR"): wish["donations_received"]}, REPORTING_CURRENCY
+                    )[0]
+                })
+        return
+    
+    # A donation settles one wish, a cart every wish in one bulk write
+    if event["purpose"] == "donation" and event.get("wish_id"):
+        amounts = {event["wish_id"]: event["amount"]}
+    elif event["purpose"] == "cart" and event.get("items"):
+        amounts = {item["wish_id"]: item["amount"] for item in event["items"]}
+    else:
+        return
+    # Donations to wishes that no longer exist are dropped
+    existing = storage.wishes.get_many(list(amounts))
+    amounts = {wish_id: amount for wish_id, amount in amounts.items() if wish_id in existing}
+    # The ledger entries say which wishes a retry still has to count; atomic
+    # increments, the status flips to fulfilled once fully funded
+    pending = storage.ledger.claim(transaction, amounts)
+    settled = storage.wishes.add_donations(pending)
+    storage.ledger.mark_applied(event["payment_id"], list(pending))
+    settled += [(existing[wish_id], False) for wish_id in amounts if wish_id not in pending]
+    counted = len(pending) == len(amounts)
+    cache.invalidate(*CACHE_NAMESPACES["wishes"])
+    if notifier:
+        notifier.queue_donations(event["payment_id"], settled, amounts)
+    if counted:
+        # Push the delta to live clients and count it in the rollups (both
+        # skipped when retrying a partly applied event; a backfill repairs the rollups)
+        publish_donations(settled, amounts)
+        rollups.record(
+            event.get("completed_at") or datetime.utcnow(),
+            donations=len(settled),
+            amounts={event["currency"]: sum(amounts[wish["id"]] for wish, _ in settled)},
+            fulfilled=sum(1 for _, newly_fulfilled in settled if newly_fulfilled)
         )
-        raise HTTPException(status_code=500, detail=f"Payment execution failed: {str(e)}")
 
 @app.get("/api/payments/status/{payment_id}")
 async def get_payment_status(payment_id: str):
     """Get payment status"""
-    transaction = payment_transactions_collection.find_one({"payment_id": payment_id})
+    transaction = storage.transactions.get_by_payment_id(payment_id)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
@@ -505,10 +1220,134 @@ async def get_payment_status(payment_id: str):
         "updated_at": transaction["updated_at"]
     }
 
+# Observability
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus text exposition of this worker's collectors"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/admin/slow-ops", dependencies=[Depends(require_admin)])
+async def get_slow_operations(limit: int = Query(100, ge=1, le=1000)):
+    """Most recent MongoDB commands above SLOW_OP_THRESHOLD_MS, newest first"""
+    return {
+        "threshold_ms": SLOW_OP_THRESHOLD_MS,
+        "explain_sample_rate": SLOW_OP_EXPLAIN_SAMPLE_RATE,
+        "operations": slow_ops.snapshot(limit)
+    }
+
+@app.delete("/api/admin/slow-ops", dependencies=[Depends(require_admin)])
+async def clear_slow_operations():
+    slow_ops.clear()
+    return {"status": "cleared"}
+
+@app.get("/api/admin/payouts", dependencies=[Depends(require_admin)])
+async def get_payouts(limit: int = Query(20, ge=1, le=200)):
+    """Payout counts by status and the most recent batches"""
+    return {"enabled": PAYOUTS_ENABLED, **payout_scheduler.summary(limit)}
+
+@app.get("/api/admin/outbox", dependencies=[Depends(require_admin)])
+async def get_outbox():
+    """Outbox event counts by state and the events that gave up"""
+    return outbox.summary()
+
+@app.get("/api/admin/risk", dependencies=[Depends(require_admin)])
+async def get_flagged_payments(limit: int = Query(50, ge=1, le=500)):
+    """Recently flagged payment transactions and the keys this worker is tracking"""
+    return {
+        "flag_score": RISK_FLAG_SCORE,
+        "throttle_score": RISK_THROTTLE_SCORE,
+        "tracked": risk_scorer.stats(),
+        "flagged": storage.transactions.list_flagged(limit)
+    }
+
+@app.get("/api/admin/rate-limits", dependencies=[Depends(require_admin)])
+async def get_rate_limits():
+    """Configured limits and the clients this worker is tracking per route"""
+    return {"enabled": RATE_LIMIT_ENABLED, **rate_limiter.stats()}
+
+@app.get("/api/admin/notifications", dependencies=[Depends(require_admin)])
+async def get_notifications():
+    """Creator notification counts by state"""
+    return {"enabled": notifier is not None, **(notifier.summary() if notifier else {})}
+
+@app.get("/api/admin/analytics", dependencies=[Depends(require_admin)])
+async def get_analytics(
+    since: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    until: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$")
+):
+    """Donation sizes, time to fulfillment and category conversion from the latest export"""
+    # Imported on first use, pyarrow is slow to load
+    import analytics
+    manifest = analytics.read_manifest(ANALYTICS_DIR)
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="No analytics export yet, run analytics.py")
+    key = (manifest["exported_at"], since, until, fx_rates.version)
+    summary = await asyncio.to_thread(cache.get_or_compute, "analytics", key, lambda: analytics.summarize(
+        ANALYTICS_DIR, fx_rates, REPORTING_CURRENCY, since=since, until=until, manifest=manifest
+    ))
+    return {"exported_at": manifest["exported_at"], **summary}
+
+@app.get("/api/admin/fx-rates", dependencies=[Depends(require_admin)])
+async def get_fx_rates():
+    """The FX rate table in use by this worker"""
+    return {"reporting_currency": REPORTING_CURRENCY, **fx_rates.snapshot()}
+
+@app.put("/api/admin/fx-rates", dependencies=[Depends(require_admin)])
+async def put_fx_rates(table: Dict):
+    """Publish a new rate table version ({"base": "EUR", "rates": {"USD": 1.08, ...}})"""
+    try:
+        fx_rates.publish(table, source="admin")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Other workers pick the new version up within FX_REFRESH_SECONDS
+    invalidate_currency_totals()
+    return {"reporting_currency": REPORTING_CURRENCY, **fx_rates.snapshot()}
+
+@app.get("/api/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """Stored on-demand profiles (request one with X-Profile: 1)"""
+    return [
+        {key: value for key, value in profile.items() if key != "stacks"}
+        for profile in reversed(profiler.profiles.values())
+    ]
+
+@app.get("/api/admin/profiles/hot", dependencies=[Depends(require_admin)])
+async def get_hot_functions(route: Optional[str] = None, limit: int = Query(20, ge=1, le=200)):
+    """Per-route hot-function tables from global sampling (PROFILE_SAMPLE_EVERY)"""
+    return {"sample_every": profiler.sample_every, "routes": profiler.hot_functions(route, limit)}
+
+@app.get("/api/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str):
+    """Collapsed stacks for flamegraph.pl or speedscope"""
+    profile = profiler.profiles.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profiler.collapsed(profile))
+
+# Live updates
+@app.get("/api/events")
+async def stream_events():
+    """Server-Sent Events stream of wish progress, newly paid wishes and statistics deltas"""
+    try:
+        queue = broadcaster.subscribe()
+    except OverflowError:
+        raise HTTPException(status_code=503, detail="Too many live connections, please retry later")
+    
+    return StreamingResponse(
+        broadcaster.stream(queue, SSE_HEARTBEAT_SECONDS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Existing wish endpoints with payment integration
-@app.post("/api/wishes", response_model=Wish)
-async def create_wish(wish: WishCreate):
+@app.post("/api/wishes", response_model=Wish, dependencies=[Depends(rate_limited("wishes", "wishes.create"))])
+async def create_wish(wish: WishCreate, idempotency_key: Optional[str] = Header(None)):
     """Create a new wish (payment will be handled separately)"""
+    if idempotency_key:
+        return await idempotency.run(idempotency_key, "wishes.create", wish, lambda: insert_wish(wish))
+    return insert_wish(wish)
+
+def insert_wish(wish: WishCreate):
     wish_dict = wish.dict()
     wish_dict["id"] = str(uuid.uuid4())
     wish_dict["created_at"] = datetime.utcnow()
@@ -518,16 +1357,20 @@ async def create_wish(wish: WishCreate):
     wish_dict["fulfillment_percentage"] = 0.0
     wish_dict["payment_status"] = "pending"  # Will be updated after payment
     
-    result = wishes_collection.insert_one(wish_dict)
+    created_wish = storage.wishes.insert(wish_dict)
+    cache.invalidate(*CACHE_NAMESPACES["wishes"])
+    rollups.record(wish_dict["created_at"], new_wishes=1)
+    if similar_index:
+        similar_index.add(wish_dict)
     
     # Return the created wish
-    created_wish = wishes_collection.find_one({"_id": result.inserted_id})
     created_wish["_id"] = str(created_wish["_id"])
     
     return Wish(**created_wish)
 
 @app.get("/api/wishes", response_model=List[Wish])
 async def get_wishes(
+    request: Request,
     limit: int = 50,
     category: Optional[str] = Query(None),
     urgency: Optional[str] = Query(None),
@@ -544,54 +1387,90 @@ async def get_wishes(
         query["category"] = category
     if urgency:
         query["urgency"] = urgency
-        
-    wishes = list(wishes_collection.find(query).sort("created_at", -1).limit(limit))
+    
+    cache_key = (limit, query.get("category"), urgency, status, paid_only)
+    body = cached_body("wishes", cache_key, lambda: load_wishes(query, limit))
+    return body.response(request.headers.get("accept-encoding"))
+
+def load_wishes(query: dict, limit: int):
+    wishes = storage.wishes.list(query, limit)
     
     for wish in wishes:
-        wish["_id"] = str(wish["_id"])
-        # Add default values for missing fields (backward compatibility)
-        if "category" not in wish:
-            wish["category"] = "Other"
-        if "urgency" not in wish:
-            wish["urgency"] = "medium"
-        if "photo_url" not in wish:
-            wish["photo_url"] = None
-        if "payment_status" not in wish:
-            wish["payment_status"] = "pending"
-        # Calculate fulfillment percentage
-        if wish["amount_needed"] > 0:
-            wish["fulfillment_percentage"] = min(100, (wish["donations_received"] / wish["amount_needed"]) * 100)
+        fill_wish_defaults(wish)
     
     return [Wish(**wish) for wish in wishes]
 
-@app.get("/api/wishes/{wish_id}", response_model=Wish)
-async def get_wish(wish_id: str):
-    wish = wishes_collection.find_one({"id": wish_id})
-    
-    if not wish:
-        raise HTTPException(status_code=404, detail="Wish not found")
-    
+def fill_wish_defaults(wish: dict):
+    """Normalize a stored wish document before building the response model"""
     wish["_id"] = str(wish["_id"])
-    # Add default values for missing fields
-    if "payment_status" not in wish:
-        wish["payment_status"] = "pending"
+    # Add default values for missing fields (backward compatibility)
     if "category" not in wish:
         wish["category"] = "Other"
     if "urgency" not in wish:
         wish["urgency"] = "medium"
     if "photo_url" not in wish:
         wish["photo_url"] = None
-        
+    if "payment_status" not in wish:
+        wish["payment_status"] = "pending"
+    # Calculate fulfillment percentage
     if wish["amount_needed"] > 0:
         wish["fulfillment_percentage"] = min(100, (wish["donations_received"] / wish["amount_needed"]) * 100)
+    return wish
+
+@app.get("/api/wishes/{wish_id}", response_model=Wish)
+async def get_wish(wish_id: str):
+    wish = cache.get_or_compute("wish", wish_id, lambda: load_wish(wish_id))
     
-    return Wish(**wish)
+    if not wish:
+        raise HTTPException(status_code=404, detail="Wish not found")
+    
+    return wish
+
+def load_wish(wish_id: str):
+    wish = storage.wishes.get(wish_id)
+    
+    if not wish:
+        return None
+    
+    return Wish(**fill_wish_defaults(wish))
+
+@app.get("/api/wishes/{wish_id}/similar", response_model=List[SimilarWish])
+async def get_similar_wishes(request: Request, wish_id: str, limit: int = Query(5, ge=1)):
+    """Active, paid wishes most similar in wording to this one, best first"""
+    if similar_index is None:
+        raise HTTPException(status_code=503, detail="Similar wishes are not available yet")
+    wish = cache.get_or_compute("wish", wish_id, lambda: load_wish(wish_id))
+    if not wish:
+        raise HTTPException(status_code=404, detail="Wish not found")
+    limit = min(limit, SIMILAR_WISHES_MAX)
+    body = cached_body("similar_wishes", (wish_id, limit), lambda: load_similar_wishes(wish, limit))
+    return body.response(request.headers.get("accept-encoding"))
+
+def load_similar_wishes(wish: Wish, limit: int):
+    # Most candidates are eligible; ask for more while too many are not
+    wanted = limit * 3
+    while True:
+        candidates = similar_index.candidates(wish.title, wish.description, wanted, exclude=wish.id)
+        eligible = {
+            found["id"]: found for found in storage.wishes.list(
+                {"id": {"$in": [wish_id for wish_id, _ in candidates]}, "status": "active", "payment_status": "paid"},
+                len(candidates)
+            )
+        }
+        if len(eligible) >= limit or len(candidates) < wanted or wanted >= limit * 50:
+            break
+        wanted *= 4
+    similar = [
+        SimilarWish(**fill_wish_defaults(eligible[wish_id]), similarity=score)
+        for wish_id, score in candidates if wish_id in eligible
+    ]
+    return similar[:limit]
 
 # Legacy donation endpoint (now redirects to payment system)
 @app.put("/api/wishes/{wish_id}/donate")
 async def donate_to_wish(wish_id: str, amount: float):
     """Legacy endpoint - now returns payment instructions"""
-    wish = wishes_collection.find_one({"id": wish_id})
+    wish = storage.wishes.get(wish_id)
     
     if not wish:
         raise HTTPException(status_code=404, detail="Wish not found")
@@ -604,12 +1483,6 @@ async def donate_to_wish(wish_id: str, amount: float):
         "purpose": "donation"
     }
 
-# Initialize success stories on startup
-@app.on_event("startup")
-async def startup_event():
-    init_success_stories()
-    print(f"PayPal configured for {PAYPAL_ENVIRONMENT} environment")
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
@@ -0,0 +1,206 @@
+"""Similar wishes from hashed bag-of-words vectors.
+
+Every wish becomes a sparse vector: the words of its title (counted twice)
+and description, hashed into `dim` buckets, weighted by sublinear term
+frequency times IDF and L2-normalized, so a dot product is the cosine
+similarity. The vectors are stored as an inverted index in three NumPy
+arrays (CSR by bucket: `indptr`, `rows`, float16 `weights`). A query only
+visits the postings of its own words, which keeps lookups at a few
+milliseconds even with a million wishes: very common buckets are skipped
+and a query reads at most QUERY_POSTINGS_BUDGET postings, rarest words
+first.
+
+The index is built offline and loaded by the API, or built by the API
+itself when there is no file; wishes created later are kept in a small
+side table until the next build:
+
+    python similarity.py --out wish_index.npz
+"""
+import argparse
+import os
+import re
+import threading
+import zlib
+from collections import Counter
+
+import numpy as np
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+DEFAULT_DIM = 2 ** 18
+# Buckets in more than this share of wishes carry almost no signal
+MAX_DF_FRACTION = 0.2
+# Postings a query visits at most, its highest-weight (rarest) words first;
+# this bounds the query time whatever the size of the index
+QUERY_POSTINGS_BUDGET = 50000
+
+TOKEN_RE = re.compile(r"\w\w+", re.UNICODE)
+STOPWORDS = frozenset("""
+    a an and are as at be but by for from has have i in is it its me my of on or our so that the their
+    this to was we were will with you your
+    der die das und ist ich mit für ein eine zu von den dem nicht
+""".split())
+
+# Wishes that can still be recommended once paid; fulfilled ones are left out
+INDEXED_STATUSES = ["active"]
+
+
+def bucket_counts(title: str, description: str, dim: int) -> Counter:
+    """{bucket: term frequency}, title words count twice"""
+    counts = Counter()
+    for text, weight in ((title or "", 2), (description or "", 1)):
+        for token in TOKEN_RE.findall(text.lower()):
+            if token not in STOPWORDS:
+                # crc32 rather than hash(): stable across processes
+                counts[zlib.crc32(token.encode("utf-8")) % dim] += weight
+    return counts
+
+
+class WishIndex:
+    def __init__(self, ids, indptr, rows, weights, df, dim: int):
+        self.ids = ids  # row -> wish id
+        self.rows_by_id = {wish_id: row for row, wish_id in enumerate(ids.tolist())}
+        self.indptr = indptr
+        self.rows = rows
+        self.weights = weights
+        self.df = df
+        self.dim = dim
+        self.size = len(ids)
+        self.idf = (np.log((self.size + 1) / (df + 1)) + 1).astype(np.float32)
+        self.common = df > max(MAX_DF_FRACTION * self.size, 10)
+        # Wishes added since the build: id -> (buckets, weights)
+        self._added = {}
+        self._lock = threading.Lock()
+
+    # Build and persist
+    @classmethod
+    def build(cls, wishes, dim: int = DEFAULT_DIM) -> "WishIndex":
+        """Index an iterable of wish documents (id, title, description)"""
+        ids, doc_counts = [], []
+        for wish in wishes:
+            ids.append(wish["id"])
+            doc_counts.append(bucket_counts(wish.get("title"), wish.get("description"), dim))
+        size = len(ids)
+
+        lengths = np.array([len(counts) for counts in doc_counts], dtype=np.int64)
+        doc_rows = np.repeat(np.arange(size, dtype=np.int32), lengths)
+        buckets = np.fromiter((bucket for counts in doc_counts for bucket in counts), dtype=np.int64, count=lengths.sum())
+        tf = np.fromiter((tf for counts in doc_counts for tf in counts.values()), dtype=np.float64, count=lengths.sum())
+        # A bucket appears once per wish, so its postings count is its document frequency
+        df = np.bincount(buckets, minlength=dim)
+        idf = np.log((size + 1) / (df + 1)) + 1
+        values = (1 + np.log(tf)) * idf[buckets]
+        norms = np.sqrt(np.bincount(doc_rows, weights=values ** 2, minlength=size))
+        values /= np.maximum(norms[doc_rows], 1e-12)
+
+        # Re-sort the postings by bucket into CSR form
+        order = np.argsort(buckets, kind="stable")
+        indptr = np.zeros(dim + 1, dtype=np.int64)
+        np.cumsum(df, out=indptr[1:])
+        return cls(np.array(ids), indptr, doc_rows[order], values[order].astype(np.float16), df, dim)
+
+    def save(self, path: str):
+        # Write then rename, so a loading API never sees half a file
+        temporary = f"{path}.tmp.npz"
+        np.savez(temporary, ids=self.ids, indptr=self.indptr, rows=self.rows, weights=self.weights,
+                 df=self.df, dim=np.array(self.dim))
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str) -> "WishIndex":
+        with np.load(path) as data:
+            return cls(data["ids"], data["indptr"], data["rows"], data["weights"], data["df"], int(data["dim"]))
+
+    # Query
+    def vector(self, title: str, description: str):
+        """(buckets, weights) for a text, using this index's IDF"""
+        counts = bucket_counts(title, description, self.dim)
+        if not counts:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+        buckets = np.fromiter(counts, dtype=np.int64, count=len(counts))
+        values = (1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))) * self.idf[buckets]
+        return buckets, values / max(float(np.linalg.norm(values)), 1e-12)
+
+    def add(self, wish: dict):
+        """Make a wish created after the build findable until the next one"""
+        if wish["id"] not in self.rows_by_id:
+            with self._lock:
+                self._added[wish["id"]] = self.vector(wish.get("title"), wish.get("description"))
+
+    def adopt(self, previous: "WishIndex"):
+        """Carry over wishes `previous` added that this build does not contain"""
+        with previous._lock:
+            added = dict(previous._added)
+        with self._lock:
+            for wish_id, vector in added.items():
+                if wish_id not in self.rows_by_id:
+                    self._added[wish_id] = vector
+
+    def candidates(self, title: str, description: str, limit: int, exclude: str = None) -> list:
+        """Up to `limit` (wish id, cosine similarity), best first"""
+        buckets, values = self.vector(title, description)
+        keep = ~self.common[buckets]
+        buckets, values = buckets[keep], values[keep]
+        ids, scores = [], []
+
+        if len(buckets):
+            order = np.argsort(-values)
+            buckets, values = buckets[order], values[order]
+            starts, ends = self.indptr[buckets], self.indptr[buckets + 1]
+            lengths = ends - starts
+            within = max(1, int(np.searchsorted(lengths.cumsum(), QUERY_POSTINGS_BUDGET, side="right")))
+            buckets, values, ends, lengths = buckets[:within], values[:within], ends[:within], lengths[:within]
+            # Gather every posting of the query's buckets in one go
+            positions = np.repeat(ends - lengths.cumsum(), lengths) + np.arange(lengths.sum())
+            rows = self.rows[positions]
+            contributions = self.weights[positions].astype(np.float32) * np.repeat(values, lengths)
+            matched, inverse = np.unique(rows, return_inverse=True)
+            totals = np.bincount(inverse, weights=contributions)
+            # One extra: the queried wish is usually its own best match
+            count = min(limit + 1, len(totals))
+            top = np.argpartition(-totals, count - 1)[:count]
+            ids = self.ids[matched[top]].tolist()
+            scores = totals[top].tolist()
+
+        with self._lock:
+            added = list(self._added.items())
+        query = dict(zip(buckets.tolist(), values.tolist()))
+        for wish_id, (other_buckets, other_values) in added:
+            score = sum(query.get(bucket, 0.0) * value
+                        for bucket, value in zip(other_buckets.tolist(), other_values.tolist()))
+            if score > 0:
+                ids.append(wish_id)
+                scores.append(score)
+
+        ranked = sorted((pair for pair in zip(ids, scores) if pair[0] != exclude), key=lambda pair: -pair[1])
+        return [(wish_id, round(float(score), 4)) for wish_id, score in ranked[:limit]]
+
+    def stats(self) -> dict:
+        return {"wishes": self.size, "added": len(self._added), "dim": self.dim, "postings": int(len(self.rows)),
+                "bytes": int(self.indptr.nbytes + self.rows.nbytes + self.weights.nbytes)}
+
+
+def build_from_db(db, dim: int = DEFAULT_DIM) -> WishIndex:
+    return WishIndex.build(
+        db.wishes.find({"status": {"$in": INDEXED_STATUSES}}, {"_id": 0, "id": 1, "title": 1, "description": 1}),
+        dim=dim
+    )
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Build the similar wishes index")
+    parser.add_argument("--out", default=os.environ.get('SIMILARITY_INDEX_PATH', 'wish_index.npz'))
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM, help="hash buckets")
+    args = parser.parse_args()
+
+    client = MongoClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017'))
+    index = build_from_db(client[os.environ.get('MONGO_DB_NAME', 'wishplatform')], dim=args.dim)
+    index.save(args.out)
+    stats = index.stats()
+    print(f"Indexed {stats['wishes']} wishes, {stats['postings']} postings, {stats['bytes'] / 2 ** 20:.1f} MiB")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Slow MongoDB operation log.
+
+A pymongo CommandListener keeps every command slower than a threshold in an
+in-memory ring buffer, together with the API route that issued it, the shape
+of its filter (values redacted) and, for a sample of them, the documents
+examined vs. returned according to `explain`. Explains run on a background
+thread so the request that hit the slow command is not delayed further.
+"""
+import logging
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from datetime import datetime
+
+from pymongo import monitoring
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+_current_scope = ContextVar("current_request_scope", default=None)
+
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+IGNORED_COMMANDS = {"explain", "hello", "isMaster", "ismaster", "ping", "endSessions", "getMore", "killCursors"}
+# Generic command fields that must not be forwarded to explain
+SESSION_FIELDS = {"lsid", "$db", "$clusterTime", "txnNumber", "$readPreference", "autocommit",
+                  "startTransaction", "readConcern", "writeConcern"}
+
+
+def redact(value):
+    """Keep the structure of a filter (keys and operators) but hide every value"""
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(item, dict) for item in value):
+            return [redact(item) for item in value]
+        return "?"
+    return "?"
+
+
+def filter_shape(command_name: str, command: dict):
+    if command_name == "find":
+        return redact(command.get("filter", {}))
+    if command_name in ("count", "findAndModify", "distinct"):
+        return redact(command.get("query", {}))
+    if command_name == "aggregate":
+        return [{stage: redact(spec) if stage in ("$match", "$facet") else "..." for stage, spec in step.items()}
+                for step in command.get("pipeline", [])]
+    if command_name == "update":
+        return [redact(update.get("q", {})) for update in command.get("updates", [])[:3]]
+    if command_name == "delete":
+        return [redact(delete.get("q", {})) for delete in command.get("deletes", [])[:3]]
+    return None
+
+
+def _find_execution_stats(explain_output):
+    if isinstance(explain_output, dict):
+        if "executionStats" in explain_output:
+            return explain_output["executionStats"]
+        for value in explain_output.values():
+            stats = _find_execution_stats(value)
+            if stats:
+                return stats
+    elif isinstance(explain_output, list):
+        for value in explain_output:
+            stats = _find_execution_stats(value)
+            if stats:
+                return stats
+    return None
+
+
+class RequestScopeMiddleware:
+    """Make the current ASGI scope (and so its matched route) visible to listeners"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        token = _current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_scope.reset(token)
+
+
+def current_route() -> str:
+    scope = _current_scope.get()
+    if scope is None:
+        return "background"
+    route = scope.get("route")
+    return route.path if route is not None else scope.get("path", "unknown")
+
+
+class SlowOperationLog(monitoring.CommandListener):
+    def __init__(self, threshold_ms: float = 100.0, buffer_size: int = 500, explain_sample_rate: float = 0.1):
+        self.threshold_micros = threshold_ms * 1000
+        self.explain_sample_rate = explain_sample_rate
+        self.records = deque(maxlen=buffer_size)
+        self.client = None
+        self._inflight = {}
+        self._explainer = None
+        self._pending_explains = 0
+        self._lock = threading.Lock()
+
+    def attach(self, client):
+        """Client used to run sampled explains (set once it exists)"""
+        self.client = client
+        self._explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-op-explain")
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        self._inflight[event.request_id] = (event.command, event.database_name, current_route())
+
+    def succeeded(self, event):
+        self._finish(event, event.reply)
+
+    def failed(self, event):
+        self._finish(event, None)
+
+    def _finish(self, event, reply):
+        started = self._inflight.pop(event.request_id, None)
+        if started is None or event.duration_micros < self.threshold_micros:
+            return
+        command, database_name, route = started
+        record = {
+            "time": datetime.utcnow(),
+            "route": route,
+            "command": event.command_name,
+            "collection": command.get(event.command_name),
+            "filter": filter_shape(event.command_name, command),
+            "duration_ms": round(event.duration_micros / 1000, 2),
+            "failed": reply is None,
+            "docs_returned": _returned_count(reply),
+            "docs_examined": None,
+            "keys_examined": None,
+        }
+        self.records.append(record)
+        if (event.command_name in EXPLAINABLE_COMMANDS and self._explainer is not None
+                and random.random() < self.explain_sample_rate):
+            self._schedule_explain(record, database_name, command, event.command_name)
+
+    def _schedule_explain(self, record, database_name, command, command_name):
+        with self._lock:
+            if self._pending_explains >= 16:
+                return
+            self._pending_explains += 1
+        explained = {key: value for key, value in command.items() if key not in SESSION_FIELDS}
+        if command_name == "find":
+            explained.pop("batchSize", None)
+        self._explainer.submit(self._explain, record, database_name, explained)
+
+    def _explain(self, record, database_name, command):
+        try:
+            output = self.client[database_name].command("explain", command, verbosity="executionStats")
+            stats = _find_execution_stats(output) or {}
+            record["docs_examined"] = stats.get("totalDocsExamined")
+            record["keys_examined"] = stats.get("totalKeysExamined")
+            if record["docs_returned"] is None:
+                record["docs_returned"] = stats.get("nReturned")
+        except PyMongoError as e:
+            logger.debug("explain failed for slow %s: %s", record["command"], e)
+        finally:
+            with self._lock:
+                self._pending_explains -= 1
+
+    def snapshot(self, limit: int = 100):
+        return list(self.records)[-limit:][::-1]
+
+    def clear(self):
+        self.records.clear()
+
+    def close(self):
+        if self._explainer is not None:
+            self._explainer.shutdown(wait=False, cancel_futures=True)
+            self._explainer = None
+
+
+def _returned_count(reply):
+    if not reply:
+        return None
+    cursor = reply.get("cursor")
+    if cursor is not None:
+        return len(cursor.get("firstBatch", []))
+    if "n" in reply:
+        return reply["n"]
+    return None
@@ -0,0 +1,802 @@
+"""Storage for wishes, success stories, payment transactions and the donation ledger.
+
+Route handlers go through the repositories at the bottom of this module
+instead of touching collections directly. The repositories only need a
+pymongo-style database, which comes from one of two backends
+(STORAGE_BACKEND):
+
+* ``mongo`` (default) - a pymongo MongoClient
+* ``memory`` - MemoryClient, an in-process, thread-safe stand-in for the
+  subset of the pymongo API the backend uses: the same filter operators,
+  multi-key sorts, $set/$inc/$max updates, upserts, unique indexes and
+  the aggregation stages and expressions the repositories run.
+  Nothing is persisted; it exists for fast tests and local development.
+"""
+import copy
+import threading
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from bson import ObjectId
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+_MISSING = object()
+
+
+# Document helpers
+def _get_path(doc, path: str):
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return _MISSING
+        if value is _MISSING:
+            return _MISSING
+    return value
+
+
+def _set_path(doc, path: str, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _unset_path(doc, path: str):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+def _compare(value, operand, op) -> bool:
+    if value is _MISSING or value is None or operand is None:
+        return False
+    try:
+        return op(value, operand)
+    except TypeError:
+        return False
+
+
+def _equals(value, operand) -> bool:
+    if value is _MISSING:
+        return operand is None
+    if isinstance(value, list) and not isinstance(operand, list):
+        return operand in value
+    return value == operand
+
+
+_COMPARISONS = {
+    "$gt": lambda a, b: a > b,
+    "$gte": lambda a, b: a >= b,
+    "$lt": lambda a, b: a < b,
+    "$lte": lambda a, b: a <= b,
+}
+
+
+def _matches_condition(value, condition) -> bool:
+    if not (isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition)):
+        return _equals(value, condition)
+    for op, operand in condition.items():
+        if op == "$eq":
+            matched = _equals(value, operand)
+        elif op == "$ne":
+            matched = not _equals(value, operand)
+        elif op == "$in":
+            matched = any(_equals(value, item) for item in operand)
+        elif op == "$nin":
+            matched = not any(_equals(value, item) for item in operand)
+        elif op == "$exists":
+            matched = (value is not _MISSING) == bool(operand)
+        elif op in _COMPARISONS:
+            matched = _compare(value, operand, _COMPARISONS[op])
+        else:
+            raise OperationFailure(f"unsupported query operator {op} in the memory backend")
+        if not matched:
+            return False
+    return True
+
+
+def matches(doc: dict, query: Optional[dict]) -> bool:
+    """Whether `doc` satisfies a MongoDB query filter"""
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            matched = all(matches(doc, clause) for clause in condition)
+        elif key == "$or":
+            matched = any(matches(doc, clause) for clause in condition)
+        elif key == "$nor":
+            matched = not any(matches(doc, clause) for clause in condition)
+        else:
+            matched = _matches_condition(_get_path(doc, key), condition)
+        if not matched:
+            return False
+    return True
+
+
+def _project(doc: dict, projection):
+    if not projection:
+        return doc
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include_id = projection.get("_id", 1)
+    fields = {field: flag for field, flag in projection.items() if field != "_id"}
+    if fields and any(fields.values()):
+        result = {}
+        for field in fields:
+            value = _get_path(doc, field)
+            if value is not _MISSING:
+                _set_path(result, field, value)
+    else:
+        result = copy.copy(doc)
+        for field in fields:
+            _unset_path(result, field)
+    if include_id and "_id" in doc:
+        result["_id"] = doc["_id"]
+    elif not include_id:
+        result.pop("_id", None)
+    return result
+
+
+def _sort_documents(docs: list, sort_spec):
+    # Stable sorts applied from the least to the most significant key;
+    # missing and null values order first, as in MongoDB
+    for field, direction in reversed(sort_spec):
+        def sort_key(doc, field=field):
+            value = _get_path(doc, field)
+            return (0, 0) if value is _MISSING or value is None else (1, value)
+        docs.sort(key=sort_key, reverse=direction < 0)
+    return docs
+
+
+def _normalize_sort(key_or_list, direction=None):
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction if direction is not None else 1)]
+    return list(key_or_list)
+
+
+def _apply_update(doc: dict, update: dict, inserting: bool = False) -> bool:
+    """Apply update operators in place, returns whether anything changed"""
+    before = copy.deepcopy(doc)
+    for op, fields in update.items():
+        if op == "$setOnInsert":
+            if not inserting:
+                continue
+            op = "$set"
+        for path, operand in fields.items():
+            current = _get_path(doc, path)
+            if op == "$set":
+                _set_path(doc, path, copy.deepcopy(operand))
+            elif op == "$unset":
+                _unset_path(doc, path)
+            elif op == "$inc":
+                _set_path(doc, path, (0 if current is _MISSING else current) + operand)
+            elif op == "$max":
+                if current is _MISSING or operand > current:
+                    _set_path(doc, path, operand)
+            elif op == "$min":
+                if current is _MISSING or operand < current:
+                    _set_path(doc, path, operand)
+            elif op == "$push":
+                _set_path(doc, path, (current if isinstance(current, list) else []) + [copy.deepcopy(operand)])
+            else:
+                raise OperationFailure(f"unsupported update operator {op} in the memory backend")
+    return doc != before
+
+
+# Aggregation: $match, $project, $group and $facet, with the expressions the repositories use
+def _evaluate(doc: dict, expression):
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = _get_path(doc, expression[1:])
+        return None if value is _MISSING else value
+    if isinstance(expression, list):
+        return [_evaluate(doc, item) for item in expression]
+    if not isinstance(expression, dict):
+        return expression
+    if len(expression) != 1 or not next(iter(expression)).startswith("$"):
+        return {key: _evaluate(doc, value) for key, value in expression.items()}
+    op, args = next(iter(expression.items()))
+    if op == "$toUpper":
+        value = _evaluate(doc, args[0] if isinstance(args, list) else args)
+        return "" if value is None else str(value).upper()
+    if op == "$cond":
+        if isinstance(args, dict):
+            args = [args["if"], args["then"], args["else"]]
+        condition = _evaluate(doc, args[0])
+        return _evaluate(doc, args[1] if condition not in (None, False, 0) else args[2])
+    if op == "$eq":
+        left, right = _evaluate(doc, args)
+        return left == right
+    if op == "$in":
+        value, values = _evaluate(doc, args)
+        return value in values
+    if op == "$ifNull":
+        return next((value for value in _evaluate(doc, args) if value is not None), None)
+    raise OperationFailure(f"unsupported expression operator {op} in the memory backend")
+
+
+def _hashable(value):
+    if isinstance(value, dict):
+        return tuple((key, _hashable(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(_hashable(item) for item in value)
+    return value
+
+
+def _numbers(values: list) -> list:
+    return [value for value in values if isinstance(value, (int, float)) and not isinstance(value, bool)]
+
+
+def _group(docs: list, spec: dict) -> list:
+    accumulators = {field: next(iter(operand.items())) for field, operand in spec.items() if field != "_id"}
+    groups = {}
+    for doc in docs:
+        key = _evaluate(doc, spec["_id"])
+        _, values = groups.setdefault(_hashable(key), (key, {field: [] for field in accumulators}))
+        for field, (_, operand) in accumulators.items():
+            values[field].append(_evaluate(doc, operand))
+    rows = []
+    for key, values in groups.values():
+        row = {"_id": key}
+        for field, (op, _) in accumulators.items():
+            numbers = _numbers(values[field])
+            if op == "$sum":
+                row[field] = sum(numbers)
+            elif op == "$avg":
+                row[field] = sum(numbers) / len(numbers) if numbers else None
+            elif op in ("$min", "$max"):
+                present = [value for value in values[field] if value is not None]
+                row[field] = (min if op == "$min" else max)(present) if present else None
+            else:
+                raise OperationFailure(f"unsupported accumulator {op} in the memory backend")
+        rows.append(row)
+    return rows
+
+
+def _project_stage(doc: dict, spec: dict) -> dict:
+    result = {}
+    if spec.get("_id", 1) not in (0, False) and "_id" in doc:
+        result["_id"] = doc["_id"]
+    for field, value in spec.items():
+        if isinstance(value, (bool, int)) and not isinstance(value, float):
+            included = _get_path(doc, field)
+            if value and included is not _MISSING:
+                _set_path(result, field, included)
+        else:
+            _set_path(result, field, _evaluate(doc, value))
+    return result
+
+
+def _aggregate(docs: list, pipeline: list) -> list:
+    for stage in pipeline:
+        (op, spec), = stage.items()
+        if op == "$match":
+            docs = [doc for doc in docs if matches(doc, spec)]
+        elif op == "$project":
+            docs = [_project_stage(doc, spec) for doc in docs]
+        elif op == "$group":
+            docs = _group(docs, spec)
+        elif op == "$sort":
+            docs = _sort_documents(list(docs), list(spec.items()))
+        elif op == "$limit":
+            docs = docs[:spec]
+        elif op == "$facet":
+            docs = [{name: _aggregate(docs, facet) for name, facet in spec.items()}]
+        else:
+            raise OperationFailure(f"unsupported aggregation stage {op} in the memory backend")
+    return docs
+
+
+class MemoryCursor:
+    def __init__(self, collection, query, projection):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = _normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, count: int):
+        self._skip = count
+        return self
+
+    def batch_size(self, count: int):
+        # Everything is in memory already
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def __iter__(self):
+        with self._collection._lock:
+            docs = self._collection._select(self._query, self._sort)
+            docs = docs[self._skip:self._skip + self._limit] if self._limit else docs[self._skip:]
+            return iter([_project(copy.deepcopy(doc), self._projection) for doc in docs])
+
+
+class MemoryCollection:
+    """Thread-safe in-memory collection with pymongo's method signatures"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._docs = []
+        # Every collection has a unique index on _id
+        self._unique = {"_id_": ("_id",)}
+        self._lock = threading.RLock()
+
+    # Internals (call with the lock held)
+    def _select(self, query, sort=None) -> list:
+        docs = [doc for doc in self._docs if matches(doc, query)]
+        return _sort_documents(docs, sort) if sort else docs
+
+    def _first(self, query, sort=None):
+        docs = self._select(query, sort)
+        return docs[0] if docs else None
+
+    def _check_unique(self, doc, ignore=None):
+        for name, fields in self._unique.items():
+            key = tuple(_get_path(doc, field) for field in fields)
+            key = tuple(None if value is _MISSING else value for value in key)
+            for other in self._docs:
+                if other is ignore or other is doc:
+                    continue
+                other_key = tuple(_get_path(other, field) for field in fields)
+                if tuple(None if value is _MISSING else value for value in other_key) == key:
+                    raise DuplicateKeyError(
+                        f"E11000 duplicate key error collection: {self.name} index: {name}", code=11000)
+
+    def _insert(self, doc: dict):
+        doc.setdefault("_id", ObjectId())
+        stored = copy.deepcopy(doc)
+        self._check_unique(stored)
+        self._docs.append(stored)
+        return doc["_id"]
+
+    def _upsert(self, query: dict, update: dict) -> dict:
+        doc = {key: copy.deepcopy(value) for key, value in query.items()
+               if not key.startswith("$") and not (isinstance(value, dict) and any(k.startswith("$") for k in value))}
+        _apply_update(doc, update, inserting=True)
+        self._insert(doc)
+        return self._docs[-1]
+
+    def _update_doc(self, doc: dict, update: dict) -> bool:
+        updated = copy.deepcopy(doc)
+        if not _apply_update(updated, update):
+            return False
+        self._check_unique(updated, ignore=doc)
+        doc.clear()
+        doc.update(updated)
+        return True
+
+    # Indexes
+    def create_index(self, keys, unique: bool = False, name: Optional[str] = None, **kwargs) -> str:
+        keys = _normalize_sort(keys)
+        name = name or "_".join(f"{field}_{direction}" for field, direction in keys)
+        if unique:
+            with self._lock:
+                fields = tuple(field for field, _ in keys)
+                seen = set()
+                for doc in self._docs:
+                    key = tuple(_get_path(doc, field) for field in fields)
+                    if key in seen:
+                        raise DuplicateKeyError(f"E11000 duplicate key error building index {name}", code=11000)
+                    seen.add(key)
+                self._unique[name] = fields
+        return name
+
+    def drop_index(self, name: str):
+        with self._lock:
+            if self._unique.pop(name, None) is None:
+                raise OperationFailure(f"index not found with name [{name}]", code=27)
+
+    # Reads
+    def find(self, filter: Optional[dict] = None, projection=None) -> MemoryCursor:
+        return MemoryCursor(self, filter, projection)
+
+    def find_one(self, filter: Optional[dict] = None, projection=None, sort=None):
+        with self._lock:
+            doc = self._first(filter, _normalize_sort(sort) if sort else None)
+            return _project(copy.deepcopy(doc), projection) if doc is not None else None
+
+    def aggregate(self, pipeline: list):
+        with self._lock:
+            docs = copy.deepcopy(self._docs)
+        return iter(_aggregate(docs, pipeline))
+
+    def count_documents(self, filter: dict) -> int:
+        with self._lock:
+            return len(self._select(filter))
+
+    def estimated_document_count(self) -> int:
+        return len(self._docs)
+
+    # Writes
+    def insert_one(self, document: dict) -> InsertOneResult:
+        with self._lock:
+            return InsertOneResult(self._insert(document), True)
+
+    def insert_many(self, documents, ordered: bool = True) -> InsertManyResult:
+        # Like pymongo: duplicates raise BulkWriteError, after the rest when unordered
+        inserted, errors = [], []
+        with self._lock:
+            for index, document in enumerate(documents):
+                try:
+                    inserted.append(self._insert(document))
+                except DuplicateKeyError as e:
+                    errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+                    if ordered:
+                        break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(inserted)})
+        return InsertManyResult(inserted, True)
+
+    def update_one(self, filter: dict, update: dict, upsert: bool = False) -> UpdateResult:
+        with self._lock:
+            doc = self._first(filter)
+            if doc is None:
+                if not upsert:
+                    return UpdateResult({"n": 0, "nModified": 0}, True)
+                return UpdateResult({"n": 1, "nModified": 0, "upserted": self._upsert(filter, update)["_id"]}, True)
+            modified = self._update_doc(doc, update)
+            return UpdateResult({"n": 1, "nModified": int(modified)}, True)
+
+    def update_many(self, filter: dict, update: dict, upsert: bool = False) -> UpdateResult:
+        with self._lock:
+            docs = self._select(filter)
+            if not docs and upsert:
+                return UpdateResult({"n": 1, "nModified": 0, "upserted": self._upsert(filter, update)["_id"]}, True)
+            modified = sum(self._update_doc(doc, update) for doc in docs)
+            return UpdateResult({"n": len(docs), "nModified": modified}, True)
+
+    def find_one_and_update(self, filter: dict, update: dict, projection=None, sort=None, upsert: bool = False,
+                            return_document=ReturnDocument.BEFORE):
+        with self._lock:
+            doc = self._first(filter, _normalize_sort(sort) if sort else None)
+            if doc is None:
+                if not upsert:
+                    return None
+                doc = self._upsert(filter, update)
+                return _project(copy.deepcopy(doc), projection) if return_document == ReturnDocument.AFTER else None
+            before = copy.deepcopy(doc)
+            self._update_doc(doc, update)
+            result = copy.deepcopy(doc) if return_document == ReturnDocument.AFTER else before
+            return _project(result, projection)
+
+    def bulk_write(self, requests, ordered: bool = True) -> BulkWriteResult:
+        # Applied under one lock, so other threads see all of it or none
+        result = {"nInserted": 0, "nMatched": 0, "nModified": 0, "nUpserted": 0, "nRemoved": 0, "upserted": []}
+        with self._lock:
+            for index, request in enumerate(requests):
+                if isinstance(request, InsertOne):
+                    self._insert(request._doc)
+                    result["nInserted"] += 1
+                elif isinstance(request, (UpdateOne, UpdateMany)):
+                    update = self.update_one if isinstance(request, UpdateOne) else self.update_many
+                    outcome = update(request._filter, request._doc, upsert=request._upsert)
+                    result["nMatched"] += outcome.matched_count
+                    result["nModified"] += outcome.modified_count
+                    if outcome.upserted_id is not None:
+                        result["nUpserted"] += 1
+                        result["upserted"].append({"index": index, "_id": outcome.upserted_id})
+                elif isinstance(request, (DeleteOne, DeleteMany)):
+                    delete = self.delete_one if isinstance(request, DeleteOne) else self.delete_many
+                    result["nRemoved"] += delete(request._filter).deleted_count
+                else:
+                    raise OperationFailure(f"unsupported bulk operation {type(request).__name__} in the memory backend")
+        return BulkWriteResult(result, True)
+
+    def delete_one(self, filter: dict) -> DeleteResult:
+        with self._lock:
+            doc = self._first(filter)
+            if doc is not None:
+                self._docs.remove(doc)
+            return DeleteResult({"n": int(doc is not None)}, True)
+
+    def delete_many(self, filter: dict) -> DeleteResult:
+        with self._lock:
+            remaining = [doc for doc in self._docs if not matches(doc, filter)]
+            deleted = len(self._docs) - len(remaining)
+            self._docs = remaining
+            return DeleteResult({"n": deleted}, True)
+
+    def drop(self):
+        with self._lock:
+            self._docs = []
+            self._unique = {"_id_": ("_id",)}
+
+
+class MemoryDatabase:
+    def __init__(self, name: str):
+        self.name = name
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = MemoryCollection(name)
+            return self._collections[name]
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def list_collection_names(self) -> list:
+        return list(self._collections)
+
+    def drop_collection(self, name: str):
+        with self._lock:
+            self._collections.pop(name, None)
+
+    def command(self, command, **kwargs) -> dict:
+        name = command if isinstance(command, str) else next(iter(command))
+        if name == "ping":
+            return {"ok": 1.0}
+        raise OperationFailure(f"command {name} is not supported by the memory backend")
+
+    def watch(self, *args, **kwargs):
+        # Same answer as a standalone mongod, so ChangeStreamWatcher disables itself
+        raise OperationFailure("The $changeStream stage is only supported on replica sets", code=40573)
+
+
+class MemoryClient:
+    """In-process replacement for MongoClient (one instance per worker)"""
+
+    def __init__(self):
+        self._databases = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        with self._lock:
+            if name not in self._databases:
+                self._databases[name] = MemoryDatabase(name)
+            return self._databases[name]
+
+    @property
+    def admin(self) -> MemoryDatabase:
+        return self["admin"]
+
+    def drop_database(self, name: str):
+        with self._lock:
+            self._databases.pop(name, None)
+
+    def close(self):
+        pass
+
+
+# Repositories
+
+CATEGORY_STATS_FIELDS = {
+    "_id": 0, "category": 1, "status": 1, "payment_status": 1, "currency": 1,
+    "donations_received": 1, "fulfillment_percentage": 1
+}
+
+
+def empty_category_stats() -> dict:
+    return {"wishes": 0, "active": 0, "paid": 0, "fulfilled": 0, "raised": {}, "average_fulfillment": None}
+
+
+class WishRepository:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def insert(self, wish: dict) -> dict:
+        result = self.collection.insert_one(wish)
+        return self.collection.find_one({"_id": result.inserted_id})
+
+    def get(self, wish_id: str) -> Optional[dict]:
+        return self.collection.find_one({"id": wish_id})
+
+    def list(self, query: dict, limit: int) -> list:
+        return list(self.collection.find(query).sort("created_at", -1).limit(limit))
+
+    def count(self, query: Optional[dict] = None) -> int:
+        return self.collection.count_documents(query or {})
+
+    def raised_by_currency(self, query: dict) -> dict:
+        """{currency: donations_received summed over the matching wishes}"""
+        return {row["_id"]: row["raised"] for row in self.collection.aggregate([
+            {"$match": query},
+            {"$group": {"_id": {"$toUpper": "$currency"}, "raised": {"$sum": "$donations_received"}}}
+        ])}
+
+    def category_stats(self, categories: list, fallback: str) -> tuple:
+        """({category: counts, raised per currency and average fulfillment}, the same over all wishes)
+        in one round trip.
+        
+        Wishes whose category is not in `categories` count towards `fallback`.
+        """
+        group = {
+            "wishes": {"$sum": 1},
+            "active": {"$sum": {"$cond": [{"$eq": ["$status", "active"]}, 1, 0]}},
+            "paid": {"$sum": {"$cond": [{"$eq": ["$payment_status", "paid"]}, 1, 0]}},
+            "fulfilled": {"$sum": {"$cond": [{"$eq": ["$status", "fulfilled"]}, 1, 0]}},
+            # $avg skips the nulls, so this averages listed (paid) wishes only
+            "average_fulfillment": {"$avg": {"$cond": [
+                {"$eq": ["$payment_status", "paid"]}, "$fulfillment_percentage", None
+            ]}}
+        }
+        result = next(self.collection.aggregate([
+            {"$project": {
+                **CATEGORY_STATS_FIELDS,
+                "category": {"$cond": [{"$in": ["$category", list(categories)]}, "$category", fallback]},
+                "currency": {"$toUpper": "$currency"}
+            }},
+            {"$facet": {
+                "categories": [{"$group": {"_id": "$category", **group}}],
+                "overall": [{"$group": {"_id": None, **group}}],
+                "raised": [
+                    {"$match": {"payment_status": "paid"}},
+                    {"$group": {"_id": {"category": "$category", "currency": "$currency"},
+                                "raised": {"$sum": "$donations_received"}}}
+                ]
+            }}
+        ]))
+        categories = {row.pop("_id"): {**row, "raised": {}} for row in result["categories"]}
+        overall = result["overall"][0] if result["overall"] else empty_category_stats()
+        overall.pop("_id", None)
+        overall["raised"] = {}
+        for row in result["raised"]:
+            category, currency = row["_id"]["category"], row["_id"]["currency"]
+            categories[category]["raised"][currency] = row["raised"]
+            overall["raised"][currency] = overall["raised"].get(currency, 0) + row["raised"]
+        return categories, overall
+
+    def mark_paid(self, wish_id: str) -> Optional[dict]:
+        """Set payment_status to paid, returns the updated wish or None if it already was"""
+        return self.collection.find_one_and_update(
+            {"id": wish_id, "payment_status": {"$ne": "paid"}},
+            {"$set": {"payment_status": "paid"}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    def get_many(self, wish_ids: list) -> dict:
+        return {wish["id"]: wish for wish in self.collection.find({"id": {"$in": list(wish_ids)}})}
+
+    def add_donations(self, donations: dict) -> list:
+        """Count donations to several wishes ({wish_id: amount}) in one bulk write.
+        
+        Not idempotent on its own: callers claim the donations in the ledger
+        first. Returns [(updated wish, newly fulfilled)] for the wishes that exist.
+        Donations to wishes that were already fulfilled set payout_due, so the
+        payout scheduler sends the creator the difference.
+        """
+        if not donations:
+            return []
+        self.collection.bulk_write([
+            UpdateOne({"id": wish_id}, {"$inc": {"donations_received": amount, "donor_count": 1}})
+            for wish_id, amount in donations.items()
+        ], ordered=False)
+        wishes = list(self.collection.find({"id": {"$in": list(donations)}}))
+        if wishes:
+            self.collection.bulk_write([
+                UpdateOne({"id": wish["id"]}, {"$max": {"fulfillment_percentage": self._fulfillment(wish)},
+                                               **({"$set": {"payout_due": True}} if wish.get("status") == "fulfilled" else {})})
+                for wish in wishes
+            ], ordered=False)
+        return [(wish, self._flip_fulfilled(wish)) for wish in wishes]
+
+    @staticmethod
+    def _fulfillment(wish: dict) -> float:
+        # Wishes from before amount_needed was validated may need nothing: funded
+        needed = wish.get("amount_needed") or 0
+        fulfillment_percentage = min(100, wish["donations_received"] / needed * 100) if needed > 0 else 100
+        wish["fulfillment_percentage"] = max(fulfillment_percentage, wish.get("fulfillment_percentage", 0))
+        return fulfillment_percentage
+
+    def _flip_fulfilled(self, wish: dict) -> bool:
+        """Mark a fully funded wish fulfilled; True only for the donation that flipped it"""
+        if wish["fulfillment_percentage"] < 100:
+            return False
+        # Only one of several concurrent donations flips the status
+        result = self.collection.update_one(
+            {"id": wish["id"], "status": {"$ne": "fulfilled"}},
+            {"$set": {"status": "fulfilled", "fulfilled_at": datetime.utcnow()}}
+        )
+        wish["status"] = "fulfilled"
+        return result.modified_count == 1
+
+
+class SuccessStoryRepository:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def list_recent(self) -> list:
+        return list(self.collection.find({}).sort("fulfillment_date", -1))
+
+
+class TransactionRepository:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def insert(self, transaction: dict):
+        self.collection.insert_one(transaction)
+
+    def get_by_payment_id(self, payment_id: str) -> Optional[dict]:
+        return self.collection.find_one({"payment_id": payment_id})
+
+    def update(self, payment_id: str, fields: dict):
+        self.collection.update_one({"payment_id": payment_id}, {"$set": fields})
+
+    def list_flagged(self, limit: int) -> list:
+        """Most recent transactions flagged by the risk scorer"""
+        return list(self.collection.find({"risk_flagged": True}, {"_id": 0}).sort("created_at", -1).limit(limit))
+
+
+class DonationLedgerRepository:
+    """One entry per wish and settled donation, the audit trail behind donations_received"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def claim(self, transaction: dict, donations: dict) -> dict:
+        """Record the entries of one transaction, returns the donations not yet applied to their wish.
+        
+        The unique (payment_id, wish_id) entry is what makes settling a payment
+        twice count it once: an entry is marked applied right after its $inc.
+        A crash between the two leaves it unapplied and a retry counts it.
+        """
+        self.record(transaction, donations)
+        # Entries written before the applied flag existed were applied already
+        applied = {entry["wish_id"] for entry in self.collection.find(
+            {"payment_id": transaction["payment_id"], "wish_id": {"$in": list(donations)}, "applied": {"$ne": False}},
+            {"wish_id": 1}
+        )}
+        return {wish_id: amount for wish_id, amount in donations.items() if wish_id not in applied}
+
+    def mark_applied(self, payment_id: str, wish_ids: list):
+        if wish_ids:
+            self.collection.update_many(
+                {"payment_id": payment_id, "wish_id": {"$in": list(wish_ids)}}, {"$set": {"applied": True}}
+            )
+
+    def record(self, transaction: dict, donations: dict):
+        """Insert the entries of one transaction, not yet applied; ones already recorded are skipped"""
+        if not donations:
+            return
+        now = datetime.utcnow()
+        try:
+            self.collection.insert_many([
+                {
+                    "id": str(uuid.uuid4()),
+                    "transaction_id": transaction["id"],
+                    "payment_id": transaction["payment_id"],
+                    "wish_id": wish_id,
+                    "amount": amount,
+                    "currency": transaction["currency"],
+                    "applied": False,
+                    "created_at": now
+                }
+                for wish_id, amount in donations.items()
+            ], ordered=False)
+        except BulkWriteError as e:
+            # (payment_id, wish_id) is unique, duplicates come from a retried settlement
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+
+    def for_wish(self, wish_id: str) -> list:
+        return list(self.collection.find({"wish_id": wish_id}).sort("created_at", -1))
+
+
+class Storage:
+    """Repositories over one database (pymongo or MemoryDatabase)"""
+
+    def __init__(self, db):
+        self.db = db
+        self.wishes = WishRepository(db.wishes)
+        self.success_stories = SuccessStoryRepository(db.success_stories)
+        self.transactions = TransactionRepository(db.payment_transactions)
+        self.ledger = DonationLedgerRepository(db.donation_ledger)
@@ -0,0 +1,145 @@
+"""Request-scoped timing spans reported as a Server-Timing header.
+
+Spans are collected in a context variable that is only set for sampled
+requests. Outside a sampled request `span()` and `record()` return after a
+single ContextVar lookup, so instrumented code paths cost next to nothing
+when sampling is off.
+"""
+import functools
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi.responses import JSONResponse
+from pymongo import monitoring
+
+logger = logging.getLogger("wish-platform.timing")
+
+_current = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    __slots__ = ("spans",)
+
+    def __init__(self):
+        self.spans = {}
+
+    def add(self, name: str, seconds: float):
+        entry = self.spans.get(name)
+        if entry is None:
+            self.spans[name] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+    def header_value(self, total: float) -> str:
+        parts = []
+        for name, (seconds, count) in self.spans.items():
+            part = f"{name};dur={seconds * 1000:.2f}"
+            if count > 1:
+                part += f';desc="{count} calls"'
+            parts.append(part)
+        parts.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(parts)
+
+
+def record(name: str, seconds: float):
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextmanager
+def span(name: str):
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def timed(name: str):
+    """Decorator recording every call of a function as a span"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse that records body encoding as the `encode` span"""
+
+    def render(self, content) -> bytes:
+        with span("encode"):
+            return super().render(content)
+
+
+class MongoCommandTimings(monitoring.CommandListener):
+    """Adds every MongoDB command's duration to the `mongo` span"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        record("mongo", event.duration_micros / 1e6)
+
+    def failed(self, event):
+        record("mongo", event.duration_micros / 1e6)
+
+
+class ServerTimingMiddleware:
+    """Time a `sample_rate` fraction of requests, plus every request carrying the admin token"""
+
+    def __init__(self, app, sample_rate: float = 0.0, log_timings: bool = False, admin_token: str = None):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.log_timings = log_timings
+        self.admin_token = admin_token
+
+    def _sampled(self, scope) -> bool:
+        if self.sample_rate >= 1 or (self.sample_rate > 0 and random.random() < self.sample_rate):
+            return True
+        return bool(self.admin_token) and dict(scope.get("headers", [])).get(
+            b"x-admin-token", b"").decode() == self.admin_token
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._sampled(scope):
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = timings.header_value(time.perf_counter() - started)
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if self.log_timings:
+                route = scope.get("route")
+                logger.info(json.dumps({
+                    "method": scope["method"],
+                    "route": route.path if route is not None else scope["path"],
+                    "status": status,
+                    "total_ms": round((time.perf_counter() - started) * 1000, 2),
+                    "spans": {name: round(seconds * 1000, 2) for name, (seconds, _) in timings.spans.items()},
+                }, separators=(",", ":")))
@@ -0,0 +1,129 @@
+"""Sampled capture of production requests for capacity planning.
+
+Each sampled request becomes one compact JSON line: method, path, route
+template, query, the *shape* of the JSON body and the response status and
+duration. Personal data never reaches the log: PII fields are replaced by a
+placeholder and free-text strings are reduced to their length. Lines are
+handed to a background thread and written to a size-rotated file, so the
+request path only pays for building the record.
+
+Replay a capture against staging with scripts/replay_traffic.py.
+"""
+import json
+import logging
+import os
+import queue
+import random
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from urllib.parse import parse_qsl
+
+SCRUBBED = "<scrubbed>"
+PII_FIELDS = {"creator_email", "creator_paypal", "creator_name", "payer_email", "payer_id", "email"}
+# Low-cardinality fields whose values shape the workload and are kept verbatim
+KEPT_FIELDS = {"category", "urgency", "currency", "purpose", "status", "paid_only", "limit"}
+MAX_CAPTURED_BODY = 64 * 1024
+
+
+def body_shape(value, key=None):
+    if key in PII_FIELDS:
+        return SCRUBBED
+    if isinstance(value, dict):
+        return {k: body_shape(v, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [body_shape(item) for item in value[:20]]
+    if isinstance(value, str):
+        return value if key in KEPT_FIELDS else {"str": len(value)}
+    return value
+
+
+def scrub_query(query_string: bytes) -> dict:
+    return {
+        key: SCRUBBED if key in PII_FIELDS else value
+        for key, value in parse_qsl(query_string.decode("latin-1"), keep_blank_values=True)
+    }
+
+
+class TrafficCapture:
+    """Rotating capture log; `path` may contain {pid} so workers never share a file"""
+
+    def __init__(self, path: str, sample_rate: float = 0.01, max_bytes: int = 50 * 1024 * 1024, backups: int = 5):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.logger = logging.getLogger("wish-platform.traffic")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self._queue = queue.SimpleQueue()
+        self._queue_handler = QueueHandler(self._queue)
+        self._listener = None
+
+    def start(self):
+        file_handler = RotatingFileHandler(
+            self.path.format(pid=os.getpid()), maxBytes=self.max_bytes, backupCount=self.backups, delay=True)
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+        self._listener = QueueListener(self._queue, file_handler)
+        self._listener.start()
+        self.logger.addHandler(self._queue_handler)
+
+    def stop(self):
+        self.logger.removeHandler(self._queue_handler)
+        if self._listener is not None:
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = None
+
+    def write(self, record: dict):
+        self.logger.info(json.dumps(record, separators=(",", ":"), default=str))
+
+
+class TrafficCaptureMiddleware:
+    def __init__(self, app, capture: TrafficCapture):
+        self.app = app
+        self.capture = capture
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or not scope["path"].startswith("/api/")
+                or random.random() >= self.capture.sample_rate):
+            await self.app(scope, receive, send)
+            return
+
+        body = bytearray()
+        status = 500
+        received_at = time.time()
+        started = time.perf_counter()
+
+        async def capturing_receive():
+            message = await receive()
+            if message["type"] == "http.request" and len(body) < MAX_CAPTURED_BODY:
+                body.extend(message.get("body", b"")[:MAX_CAPTURED_BODY - len(body)])
+            return message
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, capturing_receive, send_with_status)
+        finally:
+            shape = None
+            if body:
+                try:
+                    shape = body_shape(json.loads(body))
+                except ValueError:
+                    shape = {"bytes": len(body)}
+            route = scope.get("route")
+            self.capture.write({
+                "ts": round(received_at, 3),
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route.path if route is not None else None,
+                "query": scrub_query(scope.get("query_string", b"")),
+                "body": shape,
+                "status": status,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+            })
@@ -1,13 +1,18 @@
 
 import requests
+import os
+import socket
 import sys
+import threading
+import time
 import uuid
 import json
 from datetime import datetime
 
 class WishFulfillAPITester:
-    def __init__(self, base_url):
+    def __init__(self, base_url, http=requests):
         self.base_url = base_url
+        self.http = http
         self.tests_run = 0
         self.tests_passed = 0
         self.created_wish_id = None
@@ -25,11 +30,11 @@ class WishFulfillAPITester:
         
         try:
             if method == 'GET':
-                response = requests.get(url, headers=headers, params=params)
+                response = self.http.get(url, headers=headers, params=params)
             elif method == 'POST':
-                response = requests.post(url, json=data, headers=headers)
+                response = self.http.post(url, json=data, headers=headers)
             elif method == 'PUT':
-                response = requests.put(url, json=data, headers=headers, params=params)
+                response = self.http.put(url, json=data, headers=headers, params=params)
 
             success = response.status_code == expected_status
             if success:
@@ -505,7 +510,46 @@ class WishFulfillAPITester:
                 return False
         return success
 
+def start_paypal_standin():
+    """Serve scripts/paypal_standin.py on a free local port, returns its base URL"""
+    import uvicorn
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+    import paypal_standin
+    
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    server = uvicorn.Server(uvicorn.Config(paypal_standin.app, log_level='warning'))
+    threading.Thread(target=server.run, kwargs={'sockets': [sock]}, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+def in_process_client():
+    """Run the API inside this process on the memory storage backend.
+    
+    Every run gets its own empty database and PayPal stand-in, so runs are
+    independent of each other and can go in parallel.
+    """
+    os.environ.update({
+        'STORAGE_BACKEND': 'memory',
+        'PAYPAL_API_BASE': start_paypal_standin(),
+        'PAYPAL_CLIENT_ID': 'test',
+        'PAYPAL_CLIENT_SECRET': 'test',
+    })
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+    from fastapi.testclient import TestClient
+    import server
+    return TestClient(server.app)
+
 def main():
+    # python backend_test.py --in-process: no deployment, Mongo or PayPal needed
+    if '--in-process' in sys.argv:
+        started = time.perf_counter()
+        with in_process_client() as http:
+            result = run_suite(WishFulfillAPITester('http://testserver', http=http))
+        print(f"⏱️  In-process suite finished in {time.perf_counter() - started:.2f}s")
+        return result
+    
     # Get the backend URL from the frontend .env file
     try:
         with open('/app/frontend/.env', 'r') as f:
@@ -521,7 +565,9 @@ def main():
     
     # Setup
     tester = WishFulfillAPITester(backend_url)
-    
+    return run_suite(tester)
+
+def run_suite(tester):
     # Run tests
     health_ok = tester.test_health_endpoint()
     if not health_ok:
@@ -0,0 +1,328 @@
+"""Mixed-workload HTTP benchmark for the wish platform API.
+
+Drives a realistic blend of browse, filter, view, create-wish and
+payment create/execute traffic and reports throughput plus p50/p95/p99
+latency per endpoint. Results can be saved as a baseline JSON file and
+later runs compared against it.
+
+Run against an API you started yourself:
+
+    python benchmarks/load_test.py --base-url http://127.0.0.1:8001
+
+or let the script start a PayPal stand-in and the API (against MONGO_URL,
+in a throwaway database) for you:
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/load_test.py --spawn \\
+        --duration 30 --concurrency 32 --save benchmarks/results/baseline.json
+    python benchmarks/load_test.py --spawn --compare benchmarks/results/baseline.json
+"""
+import argparse
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+import requests
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+CATEGORIES = ["Education", "Health", "Emergency", "Business", "Travel",
+              "Technology", "Family", "Community", "Creative", "Other"]
+URGENCIES = ["low", "medium", "high"]
+
+# Operation name -> relative weight in the mix
+WORKLOAD = {
+    "browse": 35,
+    "filter": 20,
+    "view_wish": 20,
+    "statistics": 5,
+    "success_stories": 5,
+    "create_wish": 5,
+    "payment_create": 5,
+    "payment_execute": 5,
+}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def wish_payload():
+    return {
+        "title": f"Benchmark wish {uuid.uuid4().hex[:8]}",
+        "description": "A realistic description of what this wish is about. " * 4,
+        "amount_needed": random.choice([250.0, 800.0, 1500.0, 5000.0]),
+        "currency": "EUR",
+        "creator_name": "Bench Mark",
+        "creator_email": "bench@example.com",
+        "creator_paypal": "bench@example.com",
+        "category": random.choice(CATEGORIES),
+        "urgency": random.choice(URGENCIES),
+        "photo_url": "https://images.unsplash.com/photo-1559757148-5c350d0d3c56",
+    }
+
+
+class Workload:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self.wish_ids = []
+        self.pending_payments = []
+        self.lock = threading.Lock()
+
+    def url(self, path):
+        return f"{self.base_url}{path}"
+
+    def pay(self, session, purpose, wish_id, amount):
+        response = session.post(self.url("/api/payments/create"), json={
+            "amount": amount,
+            "currency": "EUR",
+            "purpose": purpose,
+            "wish_id": wish_id,
+            "return_url": "http://localhost/return",
+            "cancel_url": "http://localhost/cancel",
+        })
+        return response
+
+    def seed(self, count):
+        """Create and pay for `count` wishes so browse traffic has data"""
+        session = requests.Session()
+        for _ in range(count):
+            wish = self.seed_call(lambda: session.post(self.url("/api/wishes"), json=wish_payload())).json()
+            payment = self.seed_call(lambda: self.pay(session, "posting_fee", wish["id"], 2.0)).json()
+            self.seed_call(lambda: session.post(self.url("/api/payments/execute"), params={
+                "payment_id": payment["payment_id"], "payer_id": "SEEDPAYER"
+            }))
+            self.wish_ids.append(wish["id"])
+
+    @staticmethod
+    def seed_call(send, attempts=10):
+        """Send a seeding request, waiting out rate limits (429 with Retry-After)"""
+        for _ in range(attempts):
+            response = send()
+            if response.status_code != 429:
+                break
+            time.sleep(float(response.headers.get("Retry-After", "1")))
+        response.raise_for_status()
+        return response
+
+    def run(self, operation, session):
+        if operation == "browse":
+            return session.get(self.url("/api/wishes"), params={"limit": 50, "paid_only": "true"})
+        if operation == "filter":
+            params = {"limit": 50, "category": random.choice(CATEGORIES)}
+            if random.random() < 0.5:
+                params["urgency"] = random.choice(URGENCIES)
+            return session.get(self.url("/api/wishes"), params=params)
+        if operation == "view_wish":
+            return session.get(self.url(f"/api/wishes/{random.choice(self.wish_ids)}"))
+        if operation == "statistics":
+            return session.get(self.url("/api/statistics"))
+        if operation == "success_stories":
+            return session.get(self.url("/api/success-stories"))
+        if operation == "create_wish":
+            response = session.post(self.url("/api/wishes"), json=wish_payload())
+            if response.ok:
+                with self.lock:
+                    self.wish_ids.append(response.json()["id"])
+            return response
+        if operation == "payment_create":
+            response = self.pay(session, "donation", random.choice(self.wish_ids), random.choice([5.0, 20.0, 50.0]))
+            if response.ok:
+                with self.lock:
+                    self.pending_payments.append(response.json()["payment_id"])
+            return response
+        if operation == "payment_execute":
+            with self.lock:
+                payment_id = self.pending_payments.pop() if self.pending_payments else None
+            if payment_id is None:
+                return self.run("payment_create", session)
+            return session.post(self.url("/api/payments/execute"),
+                                params={"payment_id": payment_id, "payer_id": "BENCHPAYER"})
+        raise ValueError(operation)
+
+
+def worker(workload, deadline, samples, errors):
+    session = requests.Session()
+    operations = list(WORKLOAD)
+    weights = [WORKLOAD[name] for name in operations]
+    local_samples = defaultdict(list)
+    local_errors = defaultdict(int)
+    while time.monotonic() < deadline:
+        operation = random.choices(operations, weights)[0]
+        started = time.perf_counter()
+        try:
+            response = workload.run(operation, session)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - started
+        if ok:
+            local_samples[operation].append(elapsed)
+        else:
+            local_errors[operation] += 1
+    for operation, values in local_samples.items():
+        samples[operation].extend(values)
+    for operation, count in local_errors.items():
+        errors[operation] += count
+
+
+def run_benchmark(base_url, duration, concurrency, seed_wishes):
+    workload = Workload(base_url)
+    workload.seed(seed_wishes)
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    deadline = time.monotonic() + duration
+    threads = [threading.Thread(target=worker, args=(workload, deadline, samples, errors))
+               for _ in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    endpoints = {}
+    for operation in WORKLOAD:
+        values = sorted(samples.get(operation, []))
+        endpoints[operation] = {
+            "requests": len(values),
+            "errors": errors.get(operation, 0),
+            "throughput": round(len(values) / elapsed, 2),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        }
+    total = sum(endpoint["requests"] for endpoint in endpoints.values())
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": git_commit(),
+        "duration_s": round(elapsed, 2),
+        "concurrency": concurrency,
+        "total_throughput": round(total / elapsed, 2),
+        "endpoints": endpoints,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(result):
+    print(f"\n{'endpoint':<16} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for name, endpoint in result["endpoints"].items():
+        print(f"{name:<16} {endpoint['throughput']:>8.1f} {endpoint['p50_ms']:>8.1f} "
+              f"{endpoint['p95_ms']:>8.1f} {endpoint['p99_ms']:>8.1f} {endpoint['errors']:>7}")
+    print(f"{'total':<16} {result['total_throughput']:>8.1f}")
+
+
+def compare(result, baseline, tolerance):
+    """Return the list of regressions beyond `tolerance` (fraction)"""
+    regressions = []
+    for name, endpoint in result["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if not before or not before["requests"]:
+            continue
+        if before["p95_ms"] and endpoint["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']} -> {endpoint['p95_ms']} ms")
+        if endpoint["throughput"] < before["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['throughput']} -> {endpoint['throughput']} req/s")
+    return regressions
+
+
+def wait_until_up(url, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def spawn_stack(api_port, paypal_port, workers):
+    """Start the PayPal stand-in and the API in a throwaway database"""
+    db_name = f"wishplatform_bench_{uuid.uuid4().hex[:8]}"
+    paypal = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "scripts", "paypal_standin.py"), "--port", str(paypal_port)],
+        start_new_session=True
+    )
+    env = dict(os.environ,
+               PAYPAL_API_BASE=f"http://127.0.0.1:{paypal_port}",
+               PAYPAL_CLIENT_ID="bench", PAYPAL_CLIENT_SECRET="bench",
+               MONGO_DB_NAME=db_name, WEB_CONCURRENCY=str(workers), PORT=str(api_port),
+               # All traffic comes from one client, never throttle it
+               RISK_THROTTLE_SCORE="2", RATE_LIMIT_ENABLED="false")
+    api = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "server:app", "-c", "gunicorn.conf.py"],
+        cwd=os.path.join(ROOT, "backend"), env=env, start_new_session=True
+    )
+    wait_until_up(f"http://127.0.0.1:{paypal_port}/docs")
+    wait_until_up(f"http://127.0.0.1:{api_port}/api/ready")
+    return [api, paypal], db_name
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8001")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed-wishes", type=int, default=50)
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed regression (fraction)")
+    parser.add_argument("--spawn", action="store_true", help="start the PayPal stand-in and the API")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="API workers with --spawn")
+    parser.add_argument("--api-port", type=int, default=8021)
+    parser.add_argument("--paypal-port", type=int, default=8099)
+    args = parser.parse_args()
+
+    processes, db_name = [], None
+    base_url = args.base_url
+    if args.spawn:
+        processes, db_name = spawn_stack(args.api_port, args.paypal_port, args.workers)
+        base_url = f"http://127.0.0.1:{args.api_port}"
+
+    try:
+        result = run_benchmark(base_url, args.duration, args.concurrency, args.seed_wishes)
+    finally:
+        for process in processes:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait(timeout=30)
+        if db_name:
+            from pymongo import MongoClient
+            MongoClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017")).drop_database(db_name)
+
+    print_report(result)
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"❌ regression: {regression}")
+        if regressions:
+            return 1
+        print(f"✅ no regressions beyond {args.tolerance:.0%} vs {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""Microbenchmarks for the CPU-bound hot paths of backend/server.py.
+
+Covers model construction (Wish, SuccessStory) at several page sizes, the
+per-document default filling done by get_wishes, FastAPI's response_model
+re-validation, JSON encoding of datetime-heavy payloads, PayPal payload
+construction and payment risk scoring. No MongoDB or network access is needed.
+
+Each run is appended to benchmarks/results/microbench.jsonl together with
+the git commit, and compared with the previous entry:
+
+    python benchmarks/microbench.py
+    python benchmarks/microbench.py --only wish --repeat 9
+"""
+import argparse
+import asyncio
+import copy
+import json
+import os
+import subprocess
+import sys
+import time
+import timeit
+import uuid
+from datetime import datetime, timedelta
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+from bson import ObjectId  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+
+import server  # noqa: E402
+from anomaly import RiskScorer  # noqa: E402
+
+PAGE_SIZES = (1, 10, 50, 200)
+DEFAULT_RESULTS = os.path.join(ROOT, "benchmarks", "results", "microbench.jsonl")
+
+
+def wish_doc(index, legacy=False):
+    doc = {
+        "_id": ObjectId(),
+        "id": str(uuid.uuid4()),
+        "title": f"Wish number {index}",
+        "description": "Help me reach my goal, every contribution counts. " * 6,
+        "amount_needed": 1500.0,
+        "currency": "EUR",
+        "creator_name": "Jane Doe",
+        "creator_email": "jane@example.com",
+        "creator_paypal": "jane@example.com",
+        "category": "Education",
+        "urgency": "medium",
+        "photo_url": "https://images.unsplash.com/photo-1541339907198-e08756dedf3f",
+        "created_at": datetime(2025, 1, 1) + timedelta(minutes=index),
+        "status": "active",
+        "donations_received": 320.0,
+        "donor_count": 7,
+        "fulfillment_percentage": 0.0,
+        "payment_status": "paid",
+    }
+    if legacy:
+        # Old documents predate these fields and take the default-filling path
+        for field in ("category", "urgency", "photo_url", "payment_status"):
+            doc.pop(field)
+    return doc
+
+
+def story_doc(index):
+    return {
+        "_id": str(ObjectId()),
+        "id": str(uuid.uuid4()),
+        "title": f"Success story {index}",
+        "description": "Thanks to many generous donors this dream came true. " * 3,
+        "amount_fulfilled": 4200.0,
+        "currency": "EUR",
+        "fulfillment_date": datetime(2025, 1, 1) - timedelta(days=index),
+        "donor_count": 25,
+        "photo_url": "https://images.unsplash.com/photo-1513475382585-d06e58bcb0e0",
+        "category": "Creative",
+    }
+
+
+def response_field(path):
+    for route in server.app.routes:
+        if getattr(route, "path", None) == path and "GET" in route.methods:
+            return route.response_field
+    raise LookupError(path)
+
+
+def build_cases(only=None):
+    """name -> (callable, items processed per call)"""
+    cases = {}
+    wishes_field = response_field("/api/wishes")
+    loop = asyncio.new_event_loop()
+
+    for size in PAGE_SIZES:
+        docs = [server.fill_wish_defaults(wish_doc(i)) for i in range(size)]
+        legacy_docs = [wish_doc(i, legacy=True) for i in range(size)]
+        stories = [story_doc(i) for i in range(size)]
+        models = [server.Wish(**doc) for doc in docs]
+        encoded = jsonable_encoder(models)
+
+        cases[f"wish_model_construction[{size}]"] = (lambda d=docs: [server.Wish(**doc) for doc in d], size)
+        cases[f"success_story_construction[{size}]"] = (
+            lambda s=stories: [server.SuccessStory(**story) for story in s], size)
+        cases[f"fill_wish_defaults_legacy[{size}]"] = (
+            lambda d=legacy_docs: [server.fill_wish_defaults(copy.copy(doc)) for doc in d], size)
+        cases[f"response_model_revalidation[{size}]"] = (
+            lambda m=models: loop.run_until_complete(serialize_response(field=wishes_field, response_content=m)),
+            size)
+        cases[f"jsonable_encoder_wishes[{size}]"] = (lambda m=models: jsonable_encoder(m), size)
+        cases[f"json_render_wishes[{size}]"] = (lambda e=encoded: server.TimedJSONResponse(e).body, size)
+
+    datetimes = [datetime(2025, 1, 1) + timedelta(seconds=i) for i in range(1000)]
+    cases["jsonable_encoder_datetimes[1000]"] = (lambda: jsonable_encoder(datetimes), 1000)
+    cases["paypal_payload_build"] = (
+        lambda: server.build_paypal_payment(25.0, "eur", "https://a/return", "https://a/cancel", "Donation for Wish"),
+        1)
+    payload = server.build_paypal_payment(25.0, "eur", "https://a/return", "https://a/cancel", "Donation for Wish")
+    payment_class = server.paypal_sdk().Payment
+    cases["paypal_payment_object"] = (lambda: payment_class(payload), 1)
+    scorer = RiskScorer()
+    cases["risk_score_assess"] = (
+        lambda: scorer.assess(time.time(), 5.0, client="203.0.113.7", wish_amounts={"wish-1": 5.0}), 1)
+
+    if only:
+        cases = {name: case for name, case in cases.items() if only in name}
+    return cases
+
+
+def run(cases, repeat, min_time):
+    results = {}
+    for name, (func, items) in cases.items():
+        timer = timeit.Timer(func)
+        number, _ = timer.autorange()
+        number = max(number, int(number * min_time / 0.2))
+        best = min(timer.repeat(repeat=repeat, number=number)) / number
+        results[name] = {
+            "us_per_call": round(best * 1e6, 3),
+            "us_per_item": round(best * 1e6 / items, 3),
+        }
+        print(f"{name:<42} {best * 1e6:>12.2f} µs/call {best * 1e6 / items:>10.3f} µs/item")
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_entry(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        lines = [line for line in f if line.strip()]
+    return json.loads(lines[-1]) if lines else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", help="run only benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing repeat")
+    parser.add_argument("--results", default=DEFAULT_RESULTS, help="JSONL history file")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    results = run(build_cases(args.only), args.repeat, args.min_time)
+
+    previous = previous_entry(args.results)
+    if previous:
+        print(f"\nChange vs {previous.get('commit')} ({previous.get('timestamp')}):")
+        for name, result in results.items():
+            before = previous["results"].get(name)
+            if before and before["us_per_call"]:
+                change = (result["us_per_call"] - before["us_per_call"]) / before["us_per_call"]
+                print(f"{name:<42} {change:>+8.1%}")
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(args.results), exist_ok=True)
+        with open(args.results, "a") as f:
+            f.write(json.dumps({
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "commit": git_commit(),
+                "python": sys.version.split()[0],
+                "results": results,
+            }) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""CPU cost vs. bytes saved for response compression.
+
+Builds realistic /api/wishes and /api/success-stories payloads (long
+descriptions, photo URLs) at several page sizes and, for each gzip level
+and brotli quality, reports the compressed size, the ratio and the time to
+compress one response. The last table compares serving a cached response
+that is compressed on every hit with serving a precompressed CachedBody.
+No MongoDB or network access is needed.
+
+    python benchmarks/response_compression.py
+    python benchmarks/response_compression.py --sizes 10 50 --repeat 9
+"""
+import argparse
+import gzip
+import os
+import sys
+import timeit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+import compression  # noqa: E402
+import server  # noqa: E402
+from microbench import story_doc, wish_doc  # noqa: E402
+
+GZIP_LEVELS = (1, 4, 6, 9)
+BROTLI_QUALITIES = (1, 4, 5, 8, 11)
+
+
+def payloads(sizes):
+    """name -> response models, as the endpoints would cache them"""
+    contents = {}
+    for size in sizes:
+        contents[f"wishes[{size}]"] = [server.Wish(**server.fill_wish_defaults(wish_doc(i))) for i in range(size)]
+    contents["success_stories[12]"] = [server.SuccessStory(**story_doc(i)) for i in range(12)]
+    return contents
+
+
+def best_time(func, repeat):
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def codecs():
+    for level in GZIP_LEVELS:
+        yield f"gzip-{level}", lambda body, level=level: gzip.compress(body, compresslevel=level, mtime=0)
+    if compression.brotli is None:
+        print("brotli is not installed; only gzip is measured\n")
+        return
+    for quality in BROTLI_QUALITIES:
+        yield f"br-{quality}", lambda body, quality=quality: compression.brotli.compress(body, quality=quality)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 50, 200], help="wish page sizes")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    contents = payloads(args.sizes)
+    bodies = {name: compression.CachedBody(content).identity for name, content in contents.items()}
+    print(f"Defaults: gzip level {compression.GZIP_LEVEL}, brotli quality {compression.BROTLI_QUALITY}\n")
+    for name, body in bodies.items():
+        print(f"{name}: {len(body)} bytes")
+        print(f"  {'codec':<10} {'bytes':>9} {'ratio':>7} {'µs':>10} {'MB/s':>8}")
+        for codec, compress in codecs():
+            compressed = compress(body)
+            seconds = best_time(lambda: compress(body), args.repeat)
+            print(f"  {codec:<10} {len(compressed):>9} {len(compressed) / len(body):>7.1%} "
+                  f"{seconds * 1e6:>10.1f} {len(body) / seconds / 1e6:>8.1f}")
+        print()
+
+    print("Cache hit: compress per request vs precompressed CachedBody")
+    print(f"  {'payload':<22} {'encoding':<9} {'per-hit µs':>11} {'cached µs':>10}")
+    for name, content in contents.items():
+        body = bodies[name]
+        cached = compression.CachedBody(content).precompress()
+        for encoding in compression.ENCODINGS:
+            accept = f"{encoding}, identity"
+            per_hit = best_time(lambda: compression.compress(body, encoding), args.repeat)
+            hit = best_time(lambda: cached.response(accept), args.repeat)
+            print(f"  {name:<22} {encoding:<9} {per_hit * 1e6:>11.1f} {hit * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Build time, size and query latency of the similar wishes index.
+
+Generates a synthetic corpus of wishes from a fixed vocabulary with a
+Zipf-like word distribution (a few very common words, a long tail), builds
+the WishIndex from it, round-trips it through its .npz file and times
+top-k queries for random wishes of the corpus. No MongoDB is needed.
+
+    python benchmarks/similar_wishes.py
+    python benchmarks/similar_wishes.py --wishes 1000000 --queries 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+from similarity import DEFAULT_DIM, WishIndex  # noqa: E402
+
+VOCABULARY = 50000
+
+
+def corpus(size: int, seed: int = 7):
+    """Wish documents with 4-8 title words and 20-60 description words"""
+    rng = np.random.default_rng(seed)
+    weights = 1 / np.arange(1, VOCABULARY + 1)
+    cumulative = np.cumsum(weights / weights.sum())
+    title_lengths = rng.integers(4, 9, size=size)
+    description_lengths = rng.integers(20, 61, size=size)
+    draws = np.searchsorted(cumulative, rng.random(int(title_lengths.sum() + description_lengths.sum())))
+    draws = np.minimum(draws, VOCABULARY - 1)
+    position = 0
+    for index in range(size):
+        title = draws[position:position + title_lengths[index]]
+        position += title_lengths[index]
+        description = draws[position:position + description_lengths[index]]
+        position += description_lengths[index]
+        yield {
+            "id": f"wish-{index}",
+            "title": " ".join(f"w{word}" for word in title.tolist()),
+            "description": " ".join(f"w{word}" for word in description.tolist())
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wishes", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=15, help="candidates per query (the endpoint asks 3x its limit)")
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM)
+    args = parser.parse_args()
+
+    print(f"Generating {args.wishes} wishes")
+    documents = list(corpus(args.wishes))
+
+    started = time.perf_counter()
+    index = WishIndex.build(documents, dim=args.dim)
+    build_seconds = time.perf_counter() - started
+    stats = index.stats()
+    print(f"Build: {build_seconds:.1f}s, {stats['postings']} postings, {stats['bytes'] / 2 ** 20:.1f} MiB, "
+          f"{int(index.common.sum())} common buckets skipped")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "wish_index.npz")
+        index.save(path)
+        started = time.perf_counter()
+        index = WishIndex.load(path)
+        print(f"Load: {time.perf_counter() - started:.2f}s from {os.path.getsize(path) / 2 ** 20:.1f} MiB")
+
+    rng = np.random.default_rng(11)
+    timings = []
+    for position in rng.integers(0, len(documents), size=args.queries):
+        document = documents[position]
+        started = time.perf_counter()
+        index.candidates(document["title"], document["description"], args.limit, exclude=document["id"])
+        timings.append(time.perf_counter() - started)
+    timings = np.array(timings) * 1000
+    print(f"Query top-{args.limit} over {args.queries} queries: "
+          f"p50 {np.percentile(timings, 50):.2f} ms, p95 {np.percentile(timings, 95):.2f} ms, "
+          f"p99 {np.percentile(timings, 99):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
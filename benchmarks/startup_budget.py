@@ -0,0 +1,108 @@
+"""Startup-time budget check for the API.
+
+Reports how long `import server` takes in a fresh interpreter (and which
+modules dominate it), then how long a worker needs from lifespan start until
+/api/ready would report ready. Exits non-zero when a budget is exceeded.
+The warm-up phase needs a reachable MongoDB (MONGO_URL); skip it with
+--skip-warmup.
+
+    python benchmarks/startup_budget.py --import-budget 1.0 --warmup-budget 5.0
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+# Modules that must not be imported when the app module loads
+LAZY_MODULES = ["paypalrestsdk", "requests"]
+
+IMPORT_PROBE = (
+    "import sys, time\n"
+    "t = time.perf_counter()\n"
+    "import server\n"
+    "print(time.perf_counter() - t)\n"
+    "print(','.join(m for m in {lazy!r} if m in sys.modules))\n"
+)
+
+
+def measure_import(runs):
+    timings = []
+    eagerly_loaded = ""
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE.format(lazy=LAZY_MODULES)],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.splitlines()
+        timings.append(float(output[0]))
+        eagerly_loaded = output[1] if len(output) > 1 else ""
+    return statistics.median(timings), eagerly_loaded
+
+
+def top_imports(limit):
+    """Slowest top-level imports according to -X importtime"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        if not name.startswith(" ") and "." not in name:
+            rows.append((int(cumulative), name))
+    return sorted(rows, reverse=True)[:limit]
+
+
+async def measure_warm_up(timeout):
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ.setdefault("CHANGE_STREAMS_ENABLED", "false")
+    import server
+
+    started = time.perf_counter()
+    async with server.lifespan(server.app):
+        while not all(server.readiness.values()):
+            if time.perf_counter() - started > timeout:
+                raise TimeoutError(f"not ready after {timeout}s: {server.readiness}")
+            await asyncio.sleep(0.01)
+        return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--import-budget", type=float, default=1.0, help="seconds")
+    parser.add_argument("--warmup-budget", type=float, default=5.0, help="seconds")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--skip-warmup", action="store_true")
+    args = parser.parse_args()
+    failures = []
+
+    import_time, eagerly_loaded = measure_import(args.runs)
+    print(f"import server: {import_time * 1000:.0f} ms (median of {args.runs}, budget {args.import_budget * 1000:.0f} ms)")
+    for cumulative_us, name in top_imports(8):
+        print(f"    {cumulative_us / 1000:8.1f} ms  {name}")
+    if import_time > args.import_budget:
+        failures.append("import time over budget")
+    if eagerly_loaded:
+        failures.append(f"modules imported eagerly: {eagerly_loaded}")
+
+    if not args.skip_warmup:
+        warm_up_time = asyncio.run(measure_warm_up(timeout=args.warmup_budget * 4))
+        print(f"warm-up to ready: {warm_up_time * 1000:.0f} ms (budget {args.warmup_budget * 1000:.0f} ms)")
+        if warm_up_time > args.warmup_budget:
+            failures.append("warm-up time over budget")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ startup within budget")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""Measure API throughput as the number of gunicorn/uvicorn workers grows.
+
+Starts the backend with 1, 2, 4, ... workers (up to the core count), drives
+it with keep-alive clients running in separate processes and prints
+requests/s per configuration. Needs a reachable MongoDB (MONGO_URL).
+
+    python benchmarks/worker_scaling.py --duration 10 --path /api/categories
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+
+def wait_until_up(port, path, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", path)
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def client_loop(port, path, duration, results):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    done = errors = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            if response.status == 200:
+                done += 1
+            else:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    results.put((done, errors))
+
+
+def run_load(port, path, duration, clients):
+    results = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=client_loop, args=(port, path, duration, results))
+        for _ in range(clients)
+    ]
+    for proc in procs:
+        proc.start()
+    totals = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    return sum(t[0] for t in totals), sum(t[1] for t in totals)
+
+
+def measure(workers, args):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(args.port), CHANGE_STREAMS_ENABLED="false")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "server:app", "-c", "gunicorn.conf.py"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+    try:
+        if not wait_until_up(args.port, args.path):
+            raise RuntimeError(f"backend with {workers} workers did not come up")
+        run_load(args.port, args.path, 1.0, args.clients)  # warm-up
+        done, errors = run_load(args.port, args.path, args.duration, args.clients)
+        return done / args.duration, errors
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait(timeout=30)
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default="/api/categories")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=max(4, cores * 2))
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--max-workers", type=int, default=cores)
+    args = parser.parse_args()
+
+    counts = []
+    n = 1
+    while n < args.max_workers:
+        counts.append(n)
+        n *= 2
+    counts.append(args.max_workers)
+
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8} {'errors':>7}")
+    baseline = None
+    for workers in counts:
+        rps, errors = measure(workers, args)
+        baseline = baseline or rps
+        print(f"{workers:>8} {rps:>10.0f} {rps / baseline:>7.2f}x {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
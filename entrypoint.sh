@@ -4,18 +4,31 @@ set -e
 # Start the FastAPI backend
 cd /backend || { echo "Backend directory not found"; exit 1; }
 
-echo "Starting FastAPI backend"
-# Start Uvicorn with proper host binding
-uvicorn server:app --host 0.0.0.0 --port 8001 &
-BACKEND_PID=$!
+# Demo content is seeded explicitly, not on every API start
+if [ "${SEED_DEMO_DATA:-false}" = "true" ]; then
+    python3 seed.py
+fi
 
-echo "Waiting for backend to start..."
-sleep 30
+echo "Starting FastAPI backend with ${WEB_CONCURRENCY:-$(nproc)} workers"
+# Gunicorn preloads the app and forks uvicorn workers (see gunicorn.conf.py)
+gunicorn server:app -c gunicorn.conf.py &
+BACKEND_PID=$!
 
-if ! kill -0 $BACKEND_PID 2>/dev/null; then
-    echo "Backend failed to start at initialization, exiting"
-    exit 1
-fi
+echo "Waiting for backend to become ready..."
+READY_TIMEOUT=${READY_TIMEOUT:-60}
+WAITED=0
+until wget -q -O /dev/null http://127.0.0.1:8001/api/ready 2>/dev/null; do
+    if ! kill -0 $BACKEND_PID 2>/dev/null; then
+        echo "Backend failed to start at initialization, exiting"
+        exit 1
+    fi
+    if [ $WAITED -ge $((READY_TIMEOUT * 4)) ]; then
+        echo "Backend not ready after ${READY_TIMEOUT}s, starting nginx anyway"
+        break
+    fi
+    sleep 0.25
+    WAITED=$((WAITED + 1))
+done
 
 # Start Nginx
 nginx -g 'daemon off;' &
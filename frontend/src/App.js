@@ -1,14 +1,42 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import './App.css';
 
 const API_URL = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8001';
 
+const newIdempotencyKey = () => (
+  window.crypto && window.crypto.randomUUID
+    ? window.crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`
+);
+
+// POST that retries network failures; every attempt carries the same
+// Idempotency-Key so the backend never creates the wish or payment twice
+const postWithRetry = async (url, body, attempts = 3) => {
+  const idempotencyKey = newIdempotencyKey();
+  for (let attempt = 1; ; attempt++) {
+    try {
+      return await fetch(url, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'Idempotency-Key': idempotencyKey,
+        },
+        body: JSON.stringify(body),
+      });
+    } catch (error) {
+      if (attempt >= attempts) throw error;
+      await new Promise((resolve) => setTimeout(resolve, 500 * attempt));
+    }
+  }
+};
+
 function App() {
   const [wishes, setWishes] = useState([]);
   const [successStories, setSuccessStories] = useState([]);
   const [statistics, setStatistics] = useState({});
   const [categories, setCategories] = useState([]);
   const [selectedWish, setSelectedWish] = useState(null);
+  const [similarWishes, setSimilarWishes] = useState([]);
   const [currentView, setCurrentView] = useState('home');
   const [loading, setLoading] = useState(false);
   const [paymentLoading, setPaymentLoading] = useState(false);
@@ -101,19 +129,13 @@ function App() {
       const returnUrl = `${currentUrl}?paymentSuccess=true`;
       const cancelUrl = `${currentUrl}?paymentCancelled=true`;
 
-      const response = await fetch(`${API_URL}/api/payments/create`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          amount: amount,
-          currency: currency,
-          purpose: purpose,
-          wish_id: wishId,
-          return_url: returnUrl,
-          cancel_url: cancelUrl
-        }),
+      const response = await postWithRetry(`${API_URL}/api/payments/create`, {
+        amount: amount,
+        currency: currency,
+        purpose: purpose,
+        wish_id: wishId,
+        return_url: returnUrl,
+        cancel_url: cancelUrl
       });
 
       if (response.ok) {
@@ -185,6 +207,17 @@ function App() {
     }
   };
 
+  // Fetch wishes similar to the one being viewed
+  const fetchSimilarWishes = async (wishId) => {
+    try {
+      const response = await fetch(`${API_URL}/api/wishes/${wishId}/similar?limit=3`);
+      setSimilarWishes(response.ok ? await response.json() : []);
+    } catch (error) {
+      console.error('Error fetching similar wishes:', error);
+      setSimilarWishes([]);
+    }
+  };
+
   // Create wish (now with payment integration)
   const createWish = async (e) => {
     e.preventDefault();
@@ -192,15 +225,9 @@ function App() {
     
     try {
       // First create the wish
-      const response = await fetch(`${API_URL}/api/wishes`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          ...formData,
-          amount_needed: parseFloat(formData.amount_needed)
-        }),
+      const response = await postWithRetry(`${API_URL}/api/wishes`, {
+        ...formData,
+        amount_needed: parseFloat(formData.amount_needed)
       });
       
       if (response.ok) {
@@ -239,6 +266,63 @@ function App() {
     fetchWishes();
   }, [selectedCategory, selectedUrgency]);
 
+  const selectedWishId = selectedWish && selectedWish.id;
+  useEffect(() => {
+    setSimilarWishes([]);
+    if (selectedWishId) fetchSimilarWishes(selectedWishId);
+  }, [selectedWishId]);
+
+  // Live updates from the server (progress, newly paid wishes, statistics)
+  const filtersRef = useRef({ category: selectedCategory, urgency: selectedUrgency });
+  useEffect(() => {
+    filtersRef.current = { category: selectedCategory, urgency: selectedUrgency };
+  }, [selectedCategory, selectedUrgency]);
+
+  useEffect(() => {
+    if (!window.EventSource) return undefined;
+    const events = new EventSource(`${API_URL}/api/events`);
+
+    events.addEventListener('wish_progress', (e) => {
+      const update = JSON.parse(e.data);
+      const applyUpdate = (wish) => (wish && wish.id === update.id ? { ...wish, ...update } : wish);
+      setWishes(prev => prev.map(applyUpdate));
+      setSelectedWish(prev => applyUpdate(prev));
+    });
+
+    events.addEventListener('wish_paid', async (e) => {
+      const paid = JSON.parse(e.data);
+      const { category, urgency } = filtersRef.current;
+      if (paid.status !== 'active') return;
+      if (category !== 'All' && paid.category !== category) return;
+      if (urgency && paid.urgency !== urgency) return;
+      try {
+        const response = await fetch(`${API_URL}/api/wishes/${paid.id}`);
+        const wish = await response.json();
+        setWishes(prev => (prev.some(w => w.id === wish.id) ? prev : [wish, ...prev]));
+      } catch (error) {
+        console.error('Error fetching new wish:', error);
+      }
+    });
+
+    events.addEventListener('statistics', (e) => {
+      // Deltas carry only the counters that changed
+      const delta = JSON.parse(e.data);
+      setStatistics(prev => {
+        const totalWishes = (prev.total_wishes || 0) + (delta.total_wishes || 0);
+        const fulfilledWishes = (prev.fulfilled_wishes || 0) + (delta.fulfilled_wishes || 0);
+        return {
+          ...prev,
+          total_wishes: totalWishes,
+          fulfilled_wishes: fulfilledWishes,
+          total_raised: (prev.total_raised || 0) + (delta.total_raised || 0),
+          success_rate: Math.round((fulfilledWishes / Math.max(totalWishes, 1)) * 1000) / 10,
+        };
+      });
+    });
+
+    return () => events.close();
+  }, []);
+
   const formatAmount = (amount, currency) => {
     return new Intl.NumberFormat('en-US', {
       style: 'currency',
@@ -302,7 +386,7 @@ function App() {
                 <div className="text-sm">Fulfilled</div>
               </div>
               <div>
-                <div className="text-3xl font-bold">{formatAmount(statistics.total_raised || 0, 'EUR').replace('€', '€')}</div>
+                <div className="text-3xl font-bold">{formatAmount(statistics.total_raised || 0, statistics.currency || 'EUR')}</div>
                 <div className="text-sm">Total Raised</div>
               </div>
               <div>
@@ -903,6 +987,30 @@ function App() {
               </div>
             </div>
           </div>
+
+          {similarWishes.length > 0 && (
+            <div className="mt-8">
+              <h2 className="text-2xl font-bold mb-4 text-gray-800">Similar Wishes</h2>
+              <div className="grid md:grid-cols-3 gap-4">
+                {similarWishes.map((wish) => (
+                  <button
+                    key={wish.id}
+                    onClick={() => {
+                      setSelectedWish(wish);
+                      window.scrollTo(0, 0);
+                    }}
+                    className="bg-white rounded-lg shadow-md p-4 text-left hover:shadow-lg transition-shadow"
+                  >
+                    <div className="text-sm text-blue-600 mb-1">{wish.category}</div>
+                    <div className="font-semibold text-gray-800 mb-2">{wish.title}</div>
+                    <div className="text-sm text-gray-500">
+                      {formatAmount(wish.donations_received, wish.currency)} of {formatAmount(wish.amount_needed, wish.currency)}
+                    </div>
+                  </button>
+                ))}
+              </div>
+            </div>
+          )}
         </div>
       </div>
     );
@@ -0,0 +1,77 @@
+"""Check cross-worker cache invalidation against a local replica set.
+
+Simulates two API workers sharing one database: writes go through worker A
+while worker B only learns about them through its change stream watcher.
+
+    MONGO_URL="mongodb://localhost:27017/?replicaSet=rs0" python scripts/check_change_streams.py
+"""
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from pymongo import MongoClient  # noqa: E402
+
+from cache import LocalCache  # noqa: E402
+from change_watcher import ChangeStreamWatcher  # noqa: E402
+
+NAMESPACES = {
+    "wishes": ("wishes", "wish", "statistics"),
+    "payment_transactions": ("statistics",),
+    "success_stories": ("success_stories",),
+}
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def main():
+    mongo_url = os.environ.get("MONGO_URL", "mongodb://localhost:27017/?replicaSet=rs0")
+    client = MongoClient(mongo_url)
+    db = client[f"change_stream_check_{uuid.uuid4().hex[:8]}"]
+    failures = 0
+
+    worker_b_cache = LocalCache(ttl=300)
+    watcher = ChangeStreamWatcher(db, worker_b_cache, NAMESPACES)
+    watcher.start()
+    time.sleep(0.5)
+
+    try:
+        for collection, namespaces in NAMESPACES.items():
+            for namespace in namespaces:
+                worker_b_cache.set(namespace, None, "stale")
+            started = time.monotonic()
+            db[collection].insert_one({"id": str(uuid.uuid4())})
+            invalidated = wait_for(lambda: all(worker_b_cache.get(ns) is None for ns in namespaces))
+            elapsed_ms = (time.monotonic() - started) * 1000
+            if invalidated:
+                print(f"✅ {collection}: {', '.join(namespaces)} invalidated in {elapsed_ms:.1f} ms")
+            else:
+                print(f"❌ {collection}: cache entries were not invalidated")
+                failures += 1
+
+        worker_b_cache.set("success_stories", None, "fresh")
+        db.unrelated.insert_one({"id": "ignored"})
+        time.sleep(0.3)
+        if worker_b_cache.get("success_stories") == "fresh":
+            print("✅ writes to unwatched collections leave caches alone")
+        else:
+            print("❌ unwatched collection invalidated the cache")
+            failures += 1
+    finally:
+        watcher.stop()
+
+    client.drop_database(db.name)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""End-to-end check of creator notification digests against the SMTP sink.
+
+Runs the API in process on the memory storage backend with the PayPal
+stand-in, sends several donations to wishes of a few creators, then drives
+the notifier and checks that each creator got exactly one digest, only
+after the coalescing window, over the pooled connections:
+
+    python scripts/notification_e2e.py
+    python scripts/notification_e2e.py --creators 10 --donations 5 --pool-size 3
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+from payout_e2e import pay, start_standin  # noqa: E402
+from smtp_sink import start_sink  # noqa: E402
+
+ADMIN_TOKEN = "notification-e2e"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--creators", type=int, default=4)
+    parser.add_argument("--donations", type=int, default=3, help="donations per wish")
+    parser.add_argument("--pool-size", type=int, default=2)
+    args = parser.parse_args()
+
+    sink, smtp_port = start_sink(verbose=False)
+    os.environ.update({
+        "STORAGE_BACKEND": "memory",
+        "PAYPAL_API_BASE": start_standin(),
+        "PAYPAL_CLIENT_ID": "e2e",
+        "PAYPAL_CLIENT_SECRET": "e2e",
+        # Scripted payments from one client in quick succession look like a probe
+        "RISK_THROTTLE_SCORE": "2",
+        "RATE_LIMIT_ENABLED": "false",
+        "ADMIN_TOKEN": ADMIN_TOKEN,
+        "SMTP_HOST": "127.0.0.1",
+        "SMTP_PORT": str(smtp_port),
+        "SMTP_POOL_SIZE": str(args.pool_size),
+        "NOTIFICATION_WINDOW_SECONDS": "60",
+        # Ticks are driven below
+        "NOTIFICATION_INTERVAL_SECONDS": "3600",
+    })
+    sys.path.insert(0, os.path.join(ROOT, "backend"))
+    from fastapi.testclient import TestClient
+    import server
+
+    expected = {}
+    with TestClient(server.app) as http:
+        for creator in range(args.creators):
+            email = f"creator{creator}@example.com"
+            # Every creator has two wishes, the first one gets fully funded
+            for index, amount_needed in enumerate((10.0 * args.donations, 1000.0)):
+                wish = http.post("/api/wishes", json={
+                    "title": f"Wish {index} of creator {creator}", "description": "Notification end-to-end check",
+                    "amount_needed": amount_needed, "currency": "EUR", "creator_name": f"Creator {creator}",
+                    "creator_email": email, "category": "Other"
+                }).json()
+                pay(http, "posting_fee", wish["id"], 2.0)
+                for _ in range(args.donations):
+                    pay(http, "donation", wish["id"], 10.0)
+            expected[email] = 2 * args.donations
+
+        asyncio.run(server.outbox.drain())
+        notifier = server.notifier
+        early = asyncio.run(notifier.tick())
+        # Let the window close without waiting it out
+        notifier.window = 0
+        started = time.perf_counter()
+        sent = asyncio.run(notifier.tick())
+        elapsed = time.perf_counter() - started
+        summary = http.get("/api/admin/notifications", headers={"X-Admin-Token": ADMIN_TOKEN}).json()
+
+    received = {}
+    for entry in sink.messages:
+        received.setdefault(entry["rcpt_to"][0], []).append(entry["message"])
+    print(f"{sent} digests in {elapsed:.2f}s over {sink.connections} SMTP connection(s)")
+    problems = []
+    if early:
+        problems.append(f"{early} digests went out before the window closed")
+    if sink.connections > args.pool_size:
+        problems.append(f"{sink.connections} connections opened, pool size is {args.pool_size}")
+    for email, donations in expected.items():
+        messages = received.get(email, [])
+        if len(messages) != 1:
+            problems.append(f"{email}: expected one digest, got {len(messages)}")
+            continue
+        body = messages[0].get_content()
+        if body.count(f"{args.donations} donation") != 2 or "fully funded" not in body:
+            problems.append(f"{email}: digest does not list {donations} donations and the funded wish")
+    if summary["notifications"].get("queued"):
+        problems.append("notifications left queued")
+    for problem in problems:
+        print(f"❌ {problem}")
+    if not problems:
+        print("✅ Every creator got one digest covering all their donations")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
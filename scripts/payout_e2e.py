@@ -0,0 +1,125 @@
+"""End-to-end check of the payout scheduler against the PayPal stand-in.
+
+Runs the API in process on the memory storage backend, creates and fully
+funds a set of wishes through the real payment endpoints, then drives the
+payout scheduler until every batch is final and checks each payout's
+outcome (the stand-in fails or leaves unclaimed the receivers named so):
+
+    python scripts/payout_e2e.py
+    python scripts/payout_e2e.py --wishes 25 --batch-size 10 --poll-concurrency 2
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+import uvicorn  # noqa: E402
+
+import paypal_standin  # noqa: E402
+
+ADMIN_TOKEN = "payout-e2e"
+
+
+def start_standin():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(paypal_standin.app, log_level="warning"))
+    threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+def receiver_for(index):
+    if index % 7 == 3:
+        return f"creator{index}-unclaimed@example.com", "UNCLAIMED"
+    if index % 11 == 5:
+        return f"creator{index}-fail@example.com", "FAILED"
+    return f"creator{index}@example.com", "SUCCESS"
+
+
+def pay(http, purpose, wish_id, amount):
+    payment = http.post("/api/payments/create", json={
+        "amount": amount, "currency": "EUR", "purpose": purpose, "wish_id": wish_id,
+        "return_url": "http://localhost/return", "cancel_url": "http://localhost/cancel"
+    }).json()
+    result = http.post("/api/payments/execute", params={"payment_id": payment["payment_id"], "payer_id": "E2E"})
+    assert result.status_code == 200, result.text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wishes", type=int, default=12)
+    parser.add_argument("--batch-size", type=int, default=5)
+    parser.add_argument("--poll-concurrency", type=int, default=2)
+    args = parser.parse_args()
+
+    os.environ.update({
+        "STORAGE_BACKEND": "memory",
+        "PAYPAL_API_BASE": start_standin(),
+        "PAYPAL_CLIENT_ID": "e2e",
+        "PAYPAL_CLIENT_SECRET": "e2e",
+        # Scripted payments from one client in quick succession look like a probe
+        "RISK_THROTTLE_SCORE": "2",
+        "RATE_LIMIT_ENABLED": "false",
+        "ADMIN_TOKEN": ADMIN_TOKEN,
+        "PAYOUT_BATCH_SIZE": str(args.batch_size),
+        "PAYOUT_POLL_CONCURRENCY": str(args.poll_concurrency),
+        "PAYOUT_POLL_INTERVAL_SECONDS": "0",
+    })
+    sys.path.insert(0, os.path.join(ROOT, "backend"))
+    from fastapi.testclient import TestClient
+    import server
+
+    expected = {}
+    with TestClient(server.app) as http:
+        for index in range(args.wishes):
+            receiver, outcome = receiver_for(index)
+            wish = http.post("/api/wishes", json={
+                "title": f"E2E wish {index}", "description": "Payout end-to-end check",
+                "amount_needed": 50.0 + index, "currency": "EUR", "creator_name": f"Creator {index}",
+                "creator_email": f"contact{index}@example.com", "creator_paypal": receiver, "category": "Other"
+            }).json()
+            pay(http, "posting_fee", wish["id"], 2.0)
+            pay(http, "donation", wish["id"], 50.0 + index)
+            expected[wish["id"]] = outcome
+
+        # Payments settle in the background, finish that before paying out
+        asyncio.run(server.outbox.drain())
+        scheduler = server.payout_scheduler
+        started = time.perf_counter()
+        for _ in range(10):
+            asyncio.run(scheduler.tick())
+            summary = http.get("/api/admin/payouts", headers={"X-Admin-Token": ADMIN_TOKEN}).json()
+            if summary["batches"] and all(batch["status"] == "SUCCESS" for batch in summary["batches"]):
+                break
+        elapsed = time.perf_counter() - started
+
+    payouts = {payout["wish_id"]: payout for payout in server.db.payouts.find({})}
+    batches = summary["batches"]
+    print(f"{len(payouts)} payouts in {len(batches)} batches, settled in {elapsed:.2f}s")
+    print(f"Statuses: {summary['payouts']}")
+    problems = []
+    if len(payouts) != len(expected):
+        problems.append(f"expected {len(expected)} payouts, found {len(payouts)}")
+    if any(batch["items"] > args.batch_size for batch in batches):
+        problems.append(f"a batch exceeded {args.batch_size} items")
+    for wish_id, outcome in expected.items():
+        payout = payouts.get(wish_id)
+        if payout and payout["status"] != outcome:
+            problems.append(f"payout for {wish_id}: expected {outcome}, got {payout['status']}")
+    for problem in problems:
+        print(f"❌ {problem}")
+    if not problems:
+        print("✅ Every fulfilled wish was paid out with the expected outcome")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""Local stand-in for the parts of the PayPal REST API the backend uses.
+
+Payments are approved automatically, so /api/payments/execute works with any
+PayerID. Payout batches move from PENDING to PROCESSING to SUCCESS over
+successive polls; items whose receiver contains "unclaimed" or "fail" end
+UNCLAIMED or FAILED. Point the backend at it with PAYPAL_API_BASE:
+
+    python scripts/paypal_standin.py --port 8099 --latency-ms 50
+    PAYPAL_API_BASE=http://127.0.0.1:8099 uvicorn server:app --port 8001
+"""
+import argparse
+import asyncio
+import uuid
+from datetime import datetime
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+
+app = FastAPI(title="PayPal stand-in")
+app.state.latency = 0.0
+payments = {}
+payout_batches = {}
+
+
+def _now():
+    return datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+async def _simulate_latency():
+    if app.state.latency:
+        await asyncio.sleep(app.state.latency)
+
+
+@app.post("/v1/oauth2/token")
+async def oauth_token():
+    await _simulate_latency()
+    return {
+        "access_token": f"A21-standin-{uuid.uuid4().hex}",
+        "token_type": "Bearer",
+        "app_id": "APP-STANDIN",
+        "expires_in": 32400,
+        "scope": "https://uri.paypal.com/services/payments/payment"
+    }
+
+
+@app.post("/v1/payments/payment")
+async def create_payment(request: Request):
+    await _simulate_latency()
+    body = await request.json()
+    payment_id = f"PAYID-{uuid.uuid4().hex[:24].upper()}"
+    token = f"EC-{uuid.uuid4().hex[:17].upper()}"
+    base = str(request.base_url).rstrip("/")
+    payment = {
+        **body,
+        "id": payment_id,
+        "state": "created",
+        "create_time": _now(),
+        "links": [
+            {"href": f"{base}/v1/payments/payment/{payment_id}", "rel": "self", "method": "GET"},
+            {"href": f"https://www.sandbox.paypal.com/cgi-bin/webscr?cmd=_express-checkout&token={token}",
+             "rel": "approval_url", "method": "REDIRECT"},
+            {"href": f"{base}/v1/payments/payment/{payment_id}/execute", "rel": "execute", "method": "POST"}
+        ]
+    }
+    payments[payment_id] = payment
+    return payment
+
+
+@app.get("/v1/payments/payment/{payment_id}")
+async def get_payment(payment_id: str):
+    await _simulate_latency()
+    if payment_id not in payments:
+        raise HTTPException(status_code=404, detail={"name": "INVALID_RESOURCE_ID"})
+    return payments[payment_id]
+
+
+@app.post("/v1/payments/payment/{payment_id}/execute")
+async def execute_payment(payment_id: str, request: Request):
+    await _simulate_latency()
+    payment = payments.get(payment_id)
+    if payment is None:
+        raise HTTPException(status_code=404, detail={"name": "INVALID_RESOURCE_ID"})
+    if payment["state"] == "approved":
+        raise HTTPException(status_code=400, detail={"name": "PAYMENT_ALREADY_DONE"})
+    body = await request.json()
+    payment["state"] = "approved"
+    payment["update_time"] = _now()
+    payment["payer"] = {
+        "payment_method": "paypal",
+        "status": "VERIFIED",
+        "payer_info": {
+            "email": f"buyer-{body.get('payer_id', 'unknown').lower()}@example.com",
+            "payer_id": body.get("payer_id")
+        }
+    }
+    return payment
+
+
+@app.post("/v1/payments/payouts")
+@app.post("/v1/payments/payouts/")
+async def create_payout(request: Request):
+    await _simulate_latency()
+    body = await request.json()
+    sender_batch_id = body["sender_batch_header"]["sender_batch_id"]
+    if any(batch["sender_batch_header"]["sender_batch_id"] == sender_batch_id for batch in payout_batches.values()):
+        raise HTTPException(status_code=400, detail={"name": "USER_BUSINESS_ERROR",
+                                                     "message": "Batch with given sender_batch_id already exists"})
+    payout_batch_id = uuid.uuid4().hex[:13].upper()
+    payout_batches[payout_batch_id] = {
+        "sender_batch_header": body["sender_batch_header"],
+        "items": body["items"],
+        "polls": 0,
+        "time_created": _now()
+    }
+    return {
+        "batch_header": {
+            "payout_batch_id": payout_batch_id,
+            "batch_status": "PENDING",
+            "sender_batch_header": body["sender_batch_header"]
+        },
+        "links": [{"href": f"{str(request.base_url).rstrip('/')}/v1/payments/payouts/{payout_batch_id}",
+                   "rel": "self", "method": "GET"}]
+    }
+
+
+def _item_status(receiver: str) -> str:
+    if "unclaimed" in receiver:
+        return "UNCLAIMED"
+    if "fail" in receiver:
+        return "FAILED"
+    return "SUCCESS"
+
+
+@app.get("/v1/payments/payouts/{payout_batch_id}")
+async def get_payout(payout_batch_id: str):
+    await _simulate_latency()
+    batch = payout_batches.get(payout_batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail={"name": "INVALID_RESOURCE_ID"})
+    batch["polls"] += 1
+    done = batch["polls"] >= 2
+    items = [{
+        "payout_item_id": f"{payout_batch_id}{index:04d}",
+        "transaction_status": _item_status(item["receiver"]) if done else "PENDING",
+        "payout_batch_id": payout_batch_id,
+        "payout_item": item
+    } for index, item in enumerate(batch["items"])]
+    return {
+        "batch_header": {
+            "payout_batch_id": payout_batch_id,
+            "batch_status": "SUCCESS" if done else "PROCESSING",
+            "time_created": batch["time_created"],
+            "sender_batch_header": batch["sender_batch_header"],
+            "amount": {
+                "value": f"{sum(float(item['amount']['value']) for item in batch['items']):.2f}",
+                "currency": batch["items"][0]["amount"]["currency"] if batch["items"] else "EUR"
+            }
+        },
+        "items": items
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local PayPal REST API stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="artificial delay per call")
+    args = parser.parse_args()
+    app.state.latency = args.latency_ms / 1000
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Replay captured API traffic against a staging instance.
+
+Reads the JSON lines written by the backend's traffic capture
+(TRAFFIC_CAPTURE_SAMPLE_RATE > 0), merges all worker files and rotated
+backups in timestamp order and re-issues the requests. Request bodies are
+rebuilt from their recorded shape: scrubbed PII fields get placeholder
+values and free-text strings are filled to their original length.
+
+    python scripts/replay_traffic.py --target http://staging:8001 --speed 1 backend/traffic-*.jsonl*
+    python scripts/replay_traffic.py --target http://staging:8001 --speed 10 traffic.jsonl
+    python scripts/replay_traffic.py --target http://staging:8001 --speed max --concurrency 64 traffic.jsonl
+
+Captured payment ids will not exist on staging, so /api/payments/execute and
+/api/payments/status replays are expected to answer 404.
+"""
+import argparse
+import glob
+import json
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+PLACEHOLDERS = {
+    "creator_email": "replay@example.com",
+    "creator_paypal": "replay@example.com",
+    "payer_email": "replay@example.com",
+    "email": "replay@example.com",
+    "creator_name": "Replay User",
+    "payer_id": "REPLAYPAYER",
+}
+SCRUBBED = "<scrubbed>"
+
+
+def rebuild(shape, key=None):
+    if shape == SCRUBBED:
+        return PLACEHOLDERS.get(key, "replay")
+    if isinstance(shape, dict):
+        if set(shape) == {"str"}:
+            return "x" * shape["str"]
+        return {k: rebuild(v, k) for k, v in shape.items()}
+    if isinstance(shape, list):
+        return [rebuild(item) for item in shape]
+    return shape
+
+
+def load_records(patterns):
+    paths = sorted({path for pattern in patterns for path in glob.glob(pattern)})
+    records = []
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    records.append(json.loads(line))
+    records.sort(key=lambda record: record["ts"])
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("captures", nargs="+", help="capture files or glob patterns")
+    parser.add_argument("--target", required=True, help="base URL of the staging API")
+    parser.add_argument("--speed", default="1", help="1, 10, ... times real time, or 'max'")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--include-events", action="store_true",
+                        help="also replay long-lived /api/events streams")
+    args = parser.parse_args()
+
+    records = load_records(args.captures)
+    if not args.include_events:
+        records = [record for record in records if record["path"] != "/api/events"]
+    if not records:
+        print("No captured requests found")
+        return 1
+
+    speed = None if args.speed == "max" else float(args.speed)
+    target = args.target.rstrip("/")
+    local = threading.local()
+    latencies = defaultdict(list)
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def issue(record):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        query = {key: PLACEHOLDERS.get(key, "replay") if value == SCRUBBED else value
+                 for key, value in record["query"].items()}
+        body = rebuild(record["body"]) if record.get("body") is not None else None
+        started = time.perf_counter()
+        try:
+            response = session.request(record["method"], f"{target}{record['path']}",
+                                       params=query, json=body, timeout=30)
+            status = response.status_code
+        except requests.RequestException:
+            status = "error"
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies[record.get("route") or record["path"]].append(elapsed)
+            statuses[status] += 1
+
+    print(f"Replaying {len(records)} requests at {args.speed}x against {target}")
+    first_ts = records[0]["ts"]
+    replay_started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for record in records:
+            if speed:
+                due = replay_started + (record["ts"] - first_ts) / speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            pool.submit(issue, record)
+    elapsed = time.monotonic() - replay_started
+
+    print(f"\nDone in {elapsed:.1f}s ({len(records) / elapsed:.1f} req/s)")
+    print(f"Status codes: {dict(statuses)}")
+    print(f"\n{'route':<36} {'count':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for route, values in sorted(latencies.items(), key=lambda item: -len(item[1])):
+        values.sort()
+
+        def pct(fraction):
+            return values[min(len(values) - 1, int(fraction * (len(values) - 1)))] * 1000
+
+        print(f"{route:<36} {len(values):>7} {pct(0.5):>8.1f} {pct(0.95):>8.1f} {pct(0.99):>8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
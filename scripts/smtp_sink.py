@@ -0,0 +1,128 @@
+"""Local SMTP server that accepts every message and keeps it, for testing
+creator notifications without a mail provider:
+
+    python scripts/smtp_sink.py --port 2525 --save /tmp/mail
+    SMTP_HOST=127.0.0.1 SMTP_PORT=2525 uvicorn server:app --port 8001
+
+Each message is printed (and written to --save as .eml); the connection it
+arrived on is shown too, so pooled connections are easy to spot.
+"""
+import argparse
+import asyncio
+import email
+import email.policy
+import itertools
+import os
+import threading
+
+_connection_ids = itertools.count(1)
+
+
+class SMTPSink:
+    def __init__(self, save_dir: str = None, verbose: bool = True):
+        self.save_dir = save_dir
+        self.verbose = verbose
+        self.messages = []  # {"connection", "mail_from", "rcpt_to", "message"}
+        self.connections = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        connection = next(_connection_ids)
+        self.connections += 1
+        mail_from, rcpt_to = None, []
+
+        async def reply(line: str):
+            writer.write(line.encode() + b"\r\n")
+            await writer.drain()
+
+        await reply("220 smtp-sink ready")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode("utf-8", "replace").rstrip("\r\n")
+                verb = command[:4].upper()
+                if verb == "EHLO":
+                    await reply("250-smtp-sink\r\n250-8BITMIME\r\n250 SMTPUTF8")
+                elif verb == "HELO":
+                    await reply("250 smtp-sink")
+                elif verb == "MAIL":
+                    mail_from, rcpt_to = command.split(":", 1)[1].split()[0].strip("<>"), []
+                    await reply("250 OK")
+                elif verb == "RCPT":
+                    rcpt_to.append(command.split(":", 1)[1].split()[0].strip("<>"))
+                    await reply("250 OK")
+                elif verb == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    data = []
+                    while (line := await reader.readline()) not in (b".\r\n", b".\n", b""):
+                        data.append(line[1:] if line.startswith(b"..") else line)
+                    self.store(connection, mail_from, rcpt_to, b"".join(data))
+                    mail_from, rcpt_to = None, []
+                    await reply("250 OK queued")
+                elif verb == "RSET":
+                    mail_from, rcpt_to = None, []
+                    await reply("250 OK")
+                elif verb == "NOOP":
+                    await reply("250 OK")
+                elif verb == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Command not implemented")
+        finally:
+            writer.close()
+
+    def store(self, connection: int, mail_from: str, rcpt_to: list, data: bytes):
+        message = email.message_from_bytes(data, policy=email.policy.default)
+        self.messages.append({"connection": connection, "mail_from": mail_from, "rcpt_to": rcpt_to, "message": message})
+        if self.save_dir:
+            with open(os.path.join(self.save_dir, f"{len(self.messages):05d}.eml"), "wb") as f:
+                f.write(data)
+        if self.verbose:
+            print(f"[connection {connection}] {', '.join(rcpt_to)}: {message['Subject']}")
+
+
+def start_sink(host: str = "127.0.0.1", port: int = 0, **kwargs):
+    """Run a sink on a background thread, returns (sink, port)"""
+    sink = SMTPSink(**kwargs)
+    started = threading.Event()
+    bound = {}
+
+    async def serve():
+        server = await asyncio.start_server(sink.handle, host, port)
+        bound["port"] = server.sockets[0].getsockname()[1]
+        started.set()
+        async with server:
+            await server.serve_forever()
+
+    threading.Thread(target=asyncio.run, args=(serve(),), daemon=True).start()
+    started.wait()
+    return sink, bound["port"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--save", help="directory to write received messages to")
+    args = parser.parse_args()
+    if args.save:
+        os.makedirs(args.save, exist_ok=True)
+
+    sink = SMTPSink(save_dir=args.save)
+
+    async def serve():
+        server = await asyncio.start_server(sink.handle, args.host, args.port)
+        print(f"SMTP sink listening on {args.host}:{args.port}")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
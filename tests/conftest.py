@@ -0,0 +1,96 @@
+"""The API in process on the memory storage backend, against the PayPal stand-in"""
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+ADMIN_TOKEN = "pytest"
+
+
+def start_standin():
+    import uvicorn
+    import paypal_standin
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(paypal_standin.app, log_level="warning"))
+    threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+def settled(server, payment_id, timeout=5.0):
+    """Wait until the payment's outbox event ran, here or in the app's own dispatcher"""
+    asyncio.run(server.outbox.drain())
+    deadline = time.monotonic() + timeout
+    while server.db.outbox.find_one({"_id": f"payment_completed:{payment_id}", "state": "done"}) is None:
+        assert time.monotonic() < deadline, f"payment {payment_id} was not settled"
+        time.sleep(0.01)
+
+
+@pytest.fixture(scope="session")
+def server():
+    os.environ.update({
+        "STORAGE_BACKEND": "memory",
+        "PAYPAL_API_BASE": start_standin(),
+        "PAYPAL_CLIENT_ID": "pytest",
+        "PAYPAL_CLIENT_SECRET": "pytest",
+        # Every test pays from the same client in quick succession
+        "RISK_THROTTLE_SCORE": "2",
+        "RATE_LIMIT_ENABLED": "false",
+        "ADMIN_TOKEN": ADMIN_TOKEN,
+        "PAYOUT_POLL_INTERVAL_SECONDS": "0",
+    })
+    import server
+    return server
+
+
+@pytest.fixture(scope="session")
+def http(server):
+    from fastapi.testclient import TestClient
+    with TestClient(server.app) as client:
+        yield client
+
+
+@pytest.fixture
+def make_wish(http):
+    def make_wish(amount_needed=50.0, currency="EUR", **fields):
+        response = http.post("/api/wishes", json={
+            "title": f"Test wish {uuid.uuid4().hex[:8]}", "description": "Created by the test suite",
+            "amount_needed": amount_needed, "currency": currency, "category": "Other",
+            "creator_name": "Creator", "creator_email": "creator@example.com", **fields
+        })
+        assert response.status_code == 200, response.text
+        return response.json()
+    return make_wish
+
+
+@pytest.fixture
+def settle(server):
+    return lambda payment_id: settled(server, payment_id)
+
+
+@pytest.fixture
+def pay(http, server):
+    """Create and approve a payment through the API, then settle it"""
+    def pay(path="/api/payments/create", **body):
+        created = http.post(path, json={
+            "return_url": "http://localhost/return", "cancel_url": "http://localhost/cancel", **body
+        })
+        assert created.status_code == 200, created.text
+        payment_id = created.json()["payment_id"]
+        executed = http.post("/api/payments/execute", params={"payment_id": payment_id, "payer_id": "PYTEST"})
+        assert executed.status_code == 200, executed.text
+        settled(server, payment_id)
+        return payment_id
+    return pay
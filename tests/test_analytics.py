@@ -0,0 +1,62 @@
+import os
+from datetime import datetime
+
+import analytics
+from fx import FxTable
+from storage import MemoryClient
+
+
+def seeded_db():
+    db = MemoryClient()["test"]
+    db.wishes.insert_many([
+        {"id": "w1", "category": "Health", "status": "fulfilled", "payment_status": "paid", "currency": "EUR",
+         "creator_email": "hidden@example.com", "created_at": datetime(2025, 5, 1), "fulfilled_at": datetime(2025, 5, 2)},
+        {"id": "w2", "category": "Health", "status": "active", "payment_status": "pending", "currency": "EUR",
+         "created_at": datetime(2025, 6, 3)},
+        {"id": "w3", "category": "Travel", "status": "active", "payment_status": "paid", "currency": "USD",
+         "created_at": datetime(2025, 6, 4)},
+    ])
+    db.payment_transactions.insert_many([
+        {"id": "t1", "purpose": "donation", "status": "completed", "amount": 10.0, "currency": "EUR",
+         "wish_id": "w1", "created_at": datetime(2025, 5, 1, 12)},
+        {"id": "t2", "purpose": "cart", "status": "completed", "amount": 30.0, "currency": "usd",
+         "items": [{"wish_id": "w1", "amount": 10.0}, {"wish_id": "w3", "amount": 20.0}],
+         "created_at": datetime(2025, 6, 5)},
+        {"id": "t3", "purpose": "donation", "status": "pending", "amount": 99.0, "currency": "EUR",
+         "wish_id": "w3", "created_at": datetime(2025, 6, 6)},
+    ])
+    return db
+
+
+def test_export_writes_monthly_partitions_without_personal_data(tmp_path):
+    manifest = analytics.export(seeded_db(), str(tmp_path), chunk_size=2)
+
+    assert manifest["datasets"]["wishes"] == {"rows": 3, "months": {"2025-05": 1, "2025-06": 2}}
+    wishes = analytics.load(str(tmp_path), "wishes", ["id", "category"])
+    assert sorted(wishes["id"].to_pylist()) == ["w1", "w2", "w3"]
+    assert "creator_email" not in analytics.SCHEMAS["wishes"].names
+
+
+def test_summaries_convert_donations_and_follow_the_funnel(tmp_path):
+    analytics.export(seeded_db(), str(tmp_path), chunk_size=2)
+    fx = FxTable(MemoryClient()["test"].fx_rates)
+    fx.publish({"base": "EUR", "rates": {"USD": 2.0}}, source="test")
+
+    summary = analytics.summarize(str(tmp_path), fx, "EUR")
+
+    # One single donation and two cart items, the pending one left out
+    assert (summary["donation_size"]["count"], summary["donation_size"]["total"]) == (3, 25.0)
+    assert summary["time_to_fulfillment"]["mean_hours"] == 24.0
+    health, travel = summary["categories"]
+    assert (health["category"], health["created"], health["paid"], health["fulfilled"]) == ("Health", 2, 1, 1)
+    assert travel["paid_rate"] == 1.0
+    assert analytics.summarize(str(tmp_path), fx, "EUR", since="2025-06")["donation_size"]["count"] == 2
+
+
+def test_a_new_export_keeps_only_the_previous_one(tmp_path):
+    db = seeded_db()
+    exports = [analytics.export(db, str(tmp_path), chunk_size=10)["directory"] for _ in range(3)]
+
+    assert analytics.read_manifest(str(tmp_path))["directory"] == exports[-1]
+    remaining = sorted(os.listdir(tmp_path / analytics.EXPORTS))
+    assert remaining == sorted(os.path.basename(directory) for directory in exports[1:])
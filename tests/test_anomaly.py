@@ -0,0 +1,61 @@
+from anomaly import RiskScorer, RollingWindows
+
+
+def test_an_ordinary_attempt_scores_zero():
+    scorer = RiskScorer()
+
+    assert scorer.assess(1000.0, amount=25.0, client="10.0.0.1", wish_amounts={"w1": 25.0}) == (0.0, {})
+
+
+def test_a_burst_of_tiny_donations_from_one_payer_is_flagged():
+    scorer = RiskScorer(max_events=5)
+    for second in range(12):
+        score, signals = scorer.assess(1000.0 + second * 0.5, amount=0.5, payer="PAYER-1")
+
+    assert score == 1.0
+    assert signals == {"payer.velocity": 1.0, "payer.burst": 1.0, "payer.tiny": 1.0}
+    # Another payer is judged on its own history
+    assert scorer.assess(1010.0, amount=0.5, payer="PAYER-2") == (0.0, {})
+
+
+def test_many_donations_to_a_wish_only_count_when_they_are_tiny():
+    scorer = RiskScorer(max_events=2)
+    for second in range(10):
+        score, _ = scorer.assess(1000.0 + second * 60, amount=50.0, wish_amounts={"popular": 50.0})
+    assert score == 0.0
+
+    for second in range(6):
+        score, signals = scorer.assess(2000.0 + second * 60, amount=0.1, wish_amounts={"probed": 0.1})
+    assert signals == {"wish.tiny": 1.0}
+
+
+def test_events_leave_the_window():
+    scorer = RiskScorer(window=60.0, max_events=2)
+    for second in range(6):
+        scorer.assess(1000.0 + second * 5, client="10.0.0.1")
+
+    assert scorer.assess(2000.0, client="10.0.0.1") == (0.0, {})
+
+
+def test_the_least_recently_seen_key_is_evicted():
+    windows = RollingWindows(capacity=2, depth=4)
+    windows.observe("a", 1.0, 1.0)
+    windows.observe("b", 2.0, 1.0)
+    windows.observe("a", 3.0, 1.0)
+    windows.observe("c", 4.0, 1.0)
+
+    assert list(windows.slots) == ["a", "c"]
+    times, _ = windows.observe("c", 5.0, 1.0)
+    assert sorted(time for time in times.tolist() if time > 0) == [4.0, 5.0]
+
+
+def test_flagged_payments_are_listed_for_review(http, server, make_wish, monkeypatch):
+    monkeypatch.setattr(server, "RISK_FLAG_SCORE", 0.0)
+    wish = make_wish()
+    created = http.post("/api/payments/create", json={
+        "purpose": "donation", "wish_id": wish["id"], "amount": 5.0, "currency": "EUR",
+        "return_url": "http://localhost/return", "cancel_url": "http://localhost/cancel"
+    })
+
+    flagged = http.get("/api/admin/risk", headers={"X-Admin-Token": "pytest"}).json()["flagged"]
+    assert created.json()["payment_id"] in [transaction["payment_id"] for transaction in flagged]
@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+CART = "/api/payments/cart"
+
+
+def cart_body(items, currency="EUR"):
+    return {
+        "items": [{"wish_id": wish_id, "amount": amount} for wish_id, amount in items],
+        "currency": currency, "return_url": "http://localhost/return", "cancel_url": "http://localhost/cancel"
+    }
+
+
+def test_cart_settles_every_wish_in_one_payment(http, server, make_wish, pay):
+    first, second = make_wish(amount_needed=10.0), make_wish(amount_needed=40.0)
+    started = datetime.utcnow() - timedelta(hours=1)
+    before = server.rollups.series("hour", started, datetime.utcnow() + timedelta(hours=1))
+
+    payment_id = pay(CART, **cart_body([(first["id"], 10.0), (second["id"], 12.345)], currency="eur"))
+
+    transaction = server.storage.transactions.get_by_payment_id(payment_id)
+    assert transaction["currency"] == "EUR"
+    assert transaction["amount"] == 22.35
+    assert http.get(f"/api/wishes/{first['id']}").json()["status"] == "fulfilled"
+    assert http.get(f"/api/wishes/{second['id']}").json()["donations_received"] == 12.35
+    after = server.rollups.series("hour", started, datetime.utcnow() + timedelta(hours=1))
+    assert sum(bucket["donations"] for bucket in after) - sum(bucket["donations"] for bucket in before) == 2
+
+
+def test_cart_is_validated_before_paypal(http, make_wish):
+    wish = make_wish()
+    assert http.post(CART, json=cart_body([])).status_code == 400
+    assert http.post(CART, json=cart_body([(wish["id"], 5.0), (wish["id"], 5.0)])).status_code == 400
+    assert http.post(CART, json=cart_body([(wish["id"], 0.0)])).status_code == 400
+    assert http.post(CART, json=cart_body([(wish["id"], 5.0), ("missing", 5.0)])).status_code == 404
+
+
+def test_cart_refuses_wishes_in_another_currency(http, make_wish):
+    euro, dollar = make_wish(currency="EUR"), make_wish(currency="USD")
+    response = http.post(CART, json=cart_body([(euro["id"], 5.0), (dollar["id"], 5.0)]))
+    assert response.status_code == 400
+    assert dollar["id"] in response.json()["detail"]
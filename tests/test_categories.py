@@ -0,0 +1,34 @@
+from storage import MemoryClient, WishRepository
+
+
+def test_category_stats_fold_unknown_categories_and_count_raised_on_paid_wishes():
+    wishes = WishRepository(MemoryClient()["test"].wishes)
+    wishes.collection.insert_many([
+        {"id": "1", "category": "Health", "status": "active", "payment_status": "paid",
+         "currency": "eur", "donations_received": 10.0, "fulfillment_percentage": 20.0},
+        {"id": "2", "category": "Health", "status": "fulfilled", "payment_status": "paid",
+         "currency": "USD", "donations_received": 50.0, "fulfillment_percentage": 100.0},
+        {"id": "3", "category": "Health", "status": "active", "payment_status": "pending",
+         "currency": "EUR", "donations_received": 99.0, "fulfillment_percentage": 0.0},
+        {"id": "4", "category": "Gardening", "status": "active", "payment_status": "paid",
+         "currency": "EUR", "donations_received": 5.0, "fulfillment_percentage": 10.0},
+    ])
+
+    categories, overall = wishes.category_stats(["Health", "Other"], fallback="Other")
+
+    health = categories["Health"]
+    assert (health["wishes"], health["active"], health["paid"], health["fulfilled"]) == (3, 2, 2, 1)
+    assert health["raised"] == {"EUR": 10.0, "USD": 50.0}
+    assert health["average_fulfillment"] == 60.0
+    assert categories["Other"]["wishes"] == 1
+    assert overall["wishes"] == 4
+    assert overall["raised"] == {"EUR": 15.0, "USD": 50.0}
+
+
+def test_category_statistics_cover_every_category_and_add_up(http):
+    statistics = http.get("/api/statistics/categories").json()
+    categories = http.get("/api/categories").json()["categories"]
+
+    assert [row["category"] for row in statistics["categories"]] == categories
+    assert sum(row["wishes"] for row in statistics["categories"]) == statistics["overall"]["wishes"]
+    assert round(sum(row["total_raised"] for row in statistics["categories"]), 2) == statistics["overall"]["total_raised"]
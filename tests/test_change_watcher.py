@@ -0,0 +1,82 @@
+import threading
+
+from pymongo.errors import AutoReconnect
+
+from cache import LocalCache
+from change_watcher import ChangeStreamWatcher
+
+NAMESPACES = {"wishes": ("wishes", "statistics"), "success_stories": ("success_stories",)}
+
+
+class Stream:
+    """Replays scripted changes like a pymongo change stream, then fails or idles"""
+
+    def __init__(self, changes, then_fail=False):
+        self.changes = list(changes)
+        self.then_fail = then_fail
+        self.resume_token = None
+        self.alive = True
+        self.drained = threading.Event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.alive = False
+
+    def try_next(self):
+        if self.changes:
+            change = self.changes.pop(0)
+            self.resume_token = {"_data": change["token"]}
+            return change
+        self.drained.set()
+        if self.then_fail:
+            raise AutoReconnect("connection reset")
+        return None
+
+    def close(self):
+        self.alive = False
+
+
+class Database:
+    def __init__(self, *streams):
+        self.streams = list(streams)
+        self.resumed_after = []
+
+    def watch(self, pipeline, resume_after=None):
+        self.resumed_after.append(resume_after)
+        return self.streams.pop(0)
+
+
+def change(token, collection, operation="insert"):
+    return {"token": token, "ns": {"coll": collection}, "operationType": operation}
+
+
+def test_writes_invalidate_the_namespaces_of_their_collection():
+    cache = LocalCache(ttl=300)
+    for namespace in ("wishes", "statistics", "success_stories"):
+        cache.set(namespace, None, "stale")
+    stream = Stream([change("1", "wishes"), change("2", "unwatched")])
+    watcher = ChangeStreamWatcher(Database(stream), cache, NAMESPACES)
+    watcher.start()
+    try:
+        assert stream.drained.wait(5)
+        assert cache.get("wishes") is None and cache.get("statistics") is None
+        assert cache.get("success_stories") == "stale"
+    finally:
+        watcher.stop()
+
+
+def test_a_worker_starts_at_now_and_resumes_from_its_own_token():
+    cache = LocalCache(ttl=300)
+    reconnected = Stream([])
+    db = Database(Stream([change("7", "wishes")], then_fail=True), reconnected)
+    watcher = ChangeStreamWatcher(db, cache, NAMESPACES)
+    cache.set("success_stories", None, "cached while disconnected")
+    watcher.start()
+    assert reconnected.drained.wait(5)
+    watcher.stop()
+
+    assert db.resumed_after == [None, {"_data": "7"}]
+    # Events may have been missed while disconnected
+    assert cache.get("success_stories") is None
@@ -0,0 +1,62 @@
+import gzip
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from compression import CachedBody, CompressionMiddleware, negotiate
+
+LARGE = {"wishes": [{"title": f"Wish {index}", "description": "x" * 40} for index in range(100)]}
+
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @app.get("/large")
+    def large():
+        return LARGE
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse(iter([b"data: 1\n\n" * 200]), media_type="text/event-stream")
+
+    return app
+
+
+def test_the_preferred_acceptable_encoding_is_chosen():
+    assert negotiate("gzip, deflate") == "gzip"
+    assert negotiate("gzip;q=0, identity") is None
+    assert negotiate("") is None
+    assert negotiate("*") in ("br", "gzip")
+
+
+def test_cached_bodies_are_compressed_once_and_only_when_large():
+    body = CachedBody(LARGE, minimum_size=1024)
+    encoding, compressed = body.variant("gzip")
+
+    assert encoding == "gzip"
+    assert gzip.decompress(compressed) == body.identity
+    assert body.variant("gzip")[1] is compressed
+    assert CachedBody({"ok": True}).variant("gzip") == (None, b'{"ok":true}')
+
+
+def test_large_responses_are_compressed_for_clients_that_accept_it():
+    http = TestClient(make_app())
+    compressed = http.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed.headers["Vary"]
+    assert compressed.json() == LARGE
+
+    assert "Content-Encoding" not in http.get("/large", headers={"Accept-Encoding": "identity"}).headers
+    assert "Content-Encoding" not in http.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+
+
+def test_event_streams_are_never_compressed():
+    http = TestClient(make_app())
+
+    assert "Content-Encoding" not in http.get("/events", headers={"Accept-Encoding": "gzip"}).headers
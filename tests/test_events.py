@@ -0,0 +1,61 @@
+import asyncio
+import json
+
+from events import EventBroadcaster, format_sse
+
+
+def decode(message: bytes):
+    event, data = message.decode().strip().split("\n")
+    return event.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+
+def test_messages_are_encoded_once_for_every_subscriber():
+    broadcaster = EventBroadcaster()
+    first, second = broadcaster.subscribe(), broadcaster.subscribe()
+
+    broadcaster.publish("wish_progress", {"id": "w1", "donor_count": 2})
+
+    message = first.get_nowait()
+    assert message is second.get_nowait()
+    assert decode(message) == ("wish_progress", {"id": "w1", "donor_count": 2})
+    assert format_sse("ping", {}) == b"event: ping\ndata: {}\n\n"
+
+
+def test_a_slow_subscriber_loses_its_oldest_messages():
+    broadcaster = EventBroadcaster(queue_size=2)
+    queue = broadcaster.subscribe()
+    for index in range(3):
+        broadcaster.publish("wish_progress", {"id": f"w{index}"})
+
+    assert [decode(queue.get_nowait())[1]["id"] for _ in range(2)] == ["w1", "w2"]
+
+
+def test_the_stream_ends_its_subscription_when_the_client_leaves():
+    broadcaster = EventBroadcaster()
+    queue = broadcaster.subscribe()
+
+    async def first_message():
+        stream = broadcaster.stream(queue, heartbeat=1.0)
+        retry = await stream.__anext__()
+        await stream.aclose()
+        return retry
+
+    assert asyncio.run(first_message()) == b"retry: 5000\n\n"
+    assert broadcaster.subscriber_count == 0
+
+
+def test_donations_publish_progress_and_a_statistics_delta(server, make_wish, pay, monkeypatch):
+    wish = make_wish(amount_needed=10.0)
+    pay(purpose="posting_fee", wish_id=wish["id"], amount=2.0, currency="EUR")
+    published = []
+    monkeypatch.setattr(server.broadcaster, "publish", lambda event, data: published.append((event, data)))
+
+    pay(purpose="donation", wish_id=wish["id"], amount=10.0, currency="EUR")
+
+    progress = [data for event, data in published if event == "wish_progress"]
+    assert progress == [{"id": wish["id"], "donations_received": 10.0, "donor_count": 1,
+                         "fulfillment_percentage": 100.0, "status": "fulfilled"}]
+    # Only the counters that changed, a client adds them to what it has
+    assert [data for event, data in published if event == "statistics"] == [
+        {"fulfilled_wishes": 1, "total_raised": 10.0}
+    ]
@@ -0,0 +1,41 @@
+import pytest
+
+from fx import FxTable, normalize_table
+from storage import MemoryClient
+
+
+def test_tables_are_validated_and_normalized():
+    assert normalize_table({"base": "eur", "rates": {"usd": 1.08}}) == {"base": "EUR", "rates": {"USD": 1.08, "EUR": 1.0}}
+    with pytest.raises(ValueError):
+        normalize_table({"base": "EUR", "rates": {"USD": 0}})
+    with pytest.raises(ValueError):
+        normalize_table({"base": "EURO", "rates": {}})
+
+
+def test_totals_convert_through_the_base_and_report_what_has_no_rate():
+    rates = FxTable(MemoryClient()["test"].fx_rates)
+    rates.publish({"base": "EUR", "rates": {"USD": 2.0, "GBP": 0.5}}, source="test")
+
+    total, unconverted = rates.convert({"EUR": 10.0, "usd": 4.0, "GBP": 1.0, "XYZ": 3.0}, "EUR")
+
+    assert total == 14.0
+    assert unconverted == {"XYZ": 3.0}
+    assert rates.convert_many([{"USD": 2.0}, {"GBP": 1.0}], "usd")[0] == [2.0, 4.0]
+
+
+def test_publishing_the_same_table_twice_keeps_the_version():
+    rates = FxTable(MemoryClient()["test"].fx_rates)
+    first = rates.publish({"base": "EUR", "rates": {"USD": 1.1}}, source="test")
+
+    assert rates.publish({"base": "eur", "rates": {"usd": 1.1}}, source="test") == first
+
+
+def test_loading_rates_drops_totals_cached_without_them(http, server, monkeypatch):
+    monkeypatch.setattr(server, "FX_RATES_FILE", None)
+    stale = http.get("/api/statistics").json()["fx_version"]
+    # Published by another worker
+    FxTable(server.db.fx_rates).publish({"base": "EUR", "rates": {"USD": 1.0 + stale / 100 + 0.01}}, source="test")
+
+    server.load_fx_rates()
+
+    assert http.get("/api/statistics").json()["fx_version"] == server.fx_rates.version > stale
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from idempotency import IdempotencyStore
+from storage import MemoryClient
+
+KEY_HEADER = "Idempotency-Key"
+
+
+class Refusing:
+    """A rate limiter with every bucket empty"""
+
+    def check(self, route, client):
+        return 30
+
+
+def create_payment(http, wish, key, amount=5.0):
+    return http.post("/api/payments/create", headers={KEY_HEADER: key}, json={
+        "purpose": "donation", "wish_id": wish["id"], "amount": amount, "currency": "EUR",
+        "return_url": "http://localhost/return", "cancel_url": "http://localhost/cancel"
+    })
+
+
+def test_a_retry_replays_the_first_response(http, make_wish):
+    wish = make_wish()
+    first = create_payment(http, wish, "retry-1")
+    retry = create_payment(http, wish, "retry-1")
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json()["payment_id"] == first.json()["payment_id"]
+    assert retry.headers["Idempotent-Replayed"] == "true"
+
+
+def test_a_key_cannot_be_reused_for_another_request(http, make_wish):
+    wish = make_wish()
+    assert create_payment(http, wish, "reused-1").status_code == 200
+
+    assert create_payment(http, wish, "reused-1", amount=6.0).status_code == 422
+
+
+def test_replays_are_not_rate_limited(http, make_wish, server, monkeypatch):
+    wish = make_wish()
+    first = create_payment(http, wish, "limited-1")
+    monkeypatch.setattr(server, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(server, "rate_limiter", Refusing())
+
+    assert create_payment(http, wish, "limited-1").json()["payment_id"] == first.json()["payment_id"]
+    assert create_payment(http, wish, "limited-2").status_code == 429
+
+
+def test_a_record_that_keeps_vanishing_gives_up_at_the_deadline(monkeypatch):
+    store = IdempotencyStore(MemoryClient()["test"].idempotency_keys, wait_timeout=0.2, poll_interval=0.05)
+    calls = []
+
+    def vanished(record_id, request_fingerprint):
+        calls.append(record_id)
+        return False, None
+    monkeypatch.setattr(store, "_claim", vanished)
+
+    with pytest.raises(HTTPException) as refused:
+        asyncio.run(store.run("key", "scope", {}, lambda: {}))
+    assert refused.value.status_code == 409
+    assert len(calls) < 10
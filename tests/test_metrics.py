@@ -0,0 +1,43 @@
+import os
+
+from metrics import ApiMetrics, Histogram
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, "/api/wishes")
+
+    lines = list(histogram.samples())
+    assert lines[:3] == [
+        'latency_seconds_bucket{route="/api/wishes",le="0.1"} 1',
+        'latency_seconds_bucket{route="/api/wishes",le="1.0"} 3',
+        'latency_seconds_bucket{route="/api/wishes",le="+Inf"} 4',
+    ]
+    assert lines[4] == 'latency_seconds_count{route="/api/wishes"} 4'
+
+
+def test_requests_are_counted_by_route_template(http):
+    http.get("/api/wishes/does-not-exist")
+
+    exposition = http.get("/metrics").text
+    assert 'http_requests_total{method="GET",route="/api/wishes/{wish_id}",status="404"}' in exposition
+    assert "# TYPE http_request_duration_seconds histogram" in exposition
+
+
+def test_workers_sum_counters_and_keep_gauges_of_live_workers_only(tmp_path):
+    gone = 2 ** 22 + 12345  # above the default pid_max, so no such process
+    exited = ApiMetrics(str(tmp_path))
+    exited.paypal_requests.inc("create_payment", "success", amount=2)
+    exited.pool_in_use.set(7)
+    exited.write_snapshot()
+    os.replace(tmp_path / f"{os.getpid()}.json", tmp_path / f"{gone}.json")
+
+    current = ApiMetrics(str(tmp_path))
+    current.paypal_requests.inc("create_payment", "success")
+    current.pool_in_use.set(3)
+    exposition = current.render()
+
+    assert 'paypal_requests_total{operation="create_payment",outcome="success"} 3.0' in exposition
+    assert f'mongo_pool_connections_in_use{{pid="{os.getpid()}"}} 3' in exposition
+    assert f'pid="{gone}"' not in exposition
@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from notifications import DigestNotifier
+from storage import MemoryClient
+
+
+class Outbox(list):
+    def send(self, message):
+        self.append(message)
+
+
+@pytest.fixture
+def notifier():
+    return DigestNotifier(MemoryClient()["test"].notifications, Outbox(), "wishes@example.com", window=60.0)
+
+
+def wish(wish_id, creator_email, status="active"):
+    return {"id": wish_id, "title": f"Wish {wish_id}", "creator_email": creator_email,
+            "creator_name": "Creator", "currency": "EUR", "status": status}
+
+
+def age(notifier, seconds):
+    notifier.collection.update_many({}, {"$set": {"created_at": datetime.utcnow() - timedelta(seconds=seconds)}})
+
+
+def test_a_creator_gets_one_digest_once_the_window_has_passed(notifier):
+    notifier.queue_donations("PAY-1", [(wish("a", "one@example.com"), False)], {"a": 5.0})
+    notifier.queue_donations("PAY-2", [(wish("a", "one@example.com"), False)], {"a": 7.5})
+    assert notifier.due_creators() == []
+
+    age(notifier, 61)
+
+    assert notifier.send_digest("one@example.com") == 1
+    (message,) = notifier.mailer
+    assert message["To"] == "one@example.com"
+    assert message["Subject"] == "2 new donations to your wishes"
+    assert "12.50 EUR" in message.get_content()
+    assert notifier.summary() == {"notifications": {"sent": 2}}
+
+
+def test_settling_twice_queues_nothing_new(notifier):
+    settled = [(wish("a", "one@example.com", status="fulfilled"), True)]
+    notifier.queue_donations("PAY-1", settled, {"a": 5.0})
+    notifier.queue_donations("PAY-1", settled, {"a": 5.0})
+
+    assert notifier.collection.count_documents({}) == 2
+
+
+def test_only_the_donation_that_fulfilled_a_wish_queues_the_fulfilled_notice(notifier):
+    notifier.queue_donations("PAY-1", [(wish("a", "one@example.com", status="fulfilled"), True)], {"a": 5.0})
+    # A later donation to the already fulfilled wish
+    notifier.queue_donations("PAY-2", [(wish("a", "one@example.com", status="fulfilled"), False)], {"a": 1.0})
+
+    kinds = sorted(notification["kind"] for notification in notifier.collection.find({}))
+    assert kinds == ["donation", "donation", "fulfilled"]
+
+
+def test_due_creators_are_grouped_and_the_longest_waiting_come_first(notifier):
+    notifier.batch_size = 2
+    for index, creator_email in enumerate(["late@example.com", "early@example.com", "middle@example.com"]):
+        notifier.queue_donations(f"PAY-{index}", [(wish(f"w{index}", creator_email), False)], {f"w{index}": 1.0})
+    notifier.queue_donations("PAY-9", [(wish("w9", "early@example.com"), False)], {"w9": 1.0})
+    now = datetime.utcnow()
+    for creator_email, minutes in [("late@example.com", 2), ("early@example.com", 10), ("middle@example.com", 5)]:
+        notifier.collection.update_many({"creator_email": creator_email},
+                                        {"$set": {"created_at": now - timedelta(minutes=minutes)}})
+
+    assert notifier.due_creators() == ["early@example.com", "middle@example.com"]
+
+
+def test_creator_email_must_be_an_address(http):
+    response = http.post("/api/wishes", json={
+        "title": "Header injection", "description": "A line break in the address", "amount_needed": 10.0,
+        "currency": "EUR", "category": "Other", "creator_name": "Creator",
+        "creator_email": "creator@example.com\r\nBcc: everyone@example.com"
+    })
+
+    assert response.status_code == 422
@@ -0,0 +1,112 @@
+def test_donation_settles_through_the_outbox(http, server, make_wish, pay):
+    wish = make_wish(amount_needed=20.0)
+    pay(purpose="posting_fee", wish_id=wish["id"], amount=2.0, currency="EUR")
+    payment_id = pay(purpose="donation", wish_id=wish["id"], amount=20.0, currency="EUR")
+
+    funded = http.get(f"/api/wishes/{wish['id']}").json()
+    assert funded["payment_status"] == "paid"
+    assert funded["donations_received"] == 20.0
+    assert funded["donor_count"] == 1
+    assert funded["status"] == "fulfilled"
+    transaction = server.storage.transactions.get_by_payment_id(payment_id)
+    assert transaction["status"] == "completed"
+    assert transaction["completed_at"]
+    summary = http.get("/api/admin/outbox", headers={"X-Admin-Token": "pytest"}).json()
+    assert summary["events"]["done"] >= 2
+
+
+def test_settling_an_event_twice_counts_it_once(http, server, make_wish, pay):
+    wish = make_wish()
+    payment_id = pay(purpose="donation", wish_id=wish["id"], amount=5.0, currency="EUR")
+    event = server.db.outbox.find_one({"_id": f"payment_completed:{payment_id}"})
+
+    server.settle_payment(event["payload"])
+
+    assert http.get(f"/api/wishes/{wish['id']}").json()["donations_received"] == 5.0
+
+
+def test_retried_execute_records_a_captured_payment(http, server, make_wish, settle):
+    wish = make_wish()
+    payment_id = http.post("/api/payments/create", json={
+        "amount": 5.0, "currency": "EUR", "purpose": "donation", "wish_id": wish["id"],
+        "return_url": "http://localhost/return", "cancel_url": "http://localhost/cancel"
+    }).json()["payment_id"]
+    params = {"payment_id": payment_id, "payer_id": "PYTEST"}
+    assert http.post("/api/payments/execute", params=params).status_code == 200
+
+    # PayPal already executed it: the retry must not mark it failed
+    assert http.post("/api/payments/execute", params=params).status_code == 200
+    settle(payment_id)
+    assert server.storage.transactions.get_by_payment_id(payment_id)["status"] == "completed"
+    assert http.get(f"/api/wishes/{wish['id']}").json()["donations_received"] == 5.0
+
+
+def test_donation_in_another_currency_is_refused(http, make_wish):
+    wish = make_wish(currency="EUR")
+    response = http.post("/api/payments/create", json={
+        "amount": 5.0, "currency": "USD", "purpose": "donation", "wish_id": wish["id"],
+        "return_url": "http://localhost/return", "cancel_url": "http://localhost/cancel"
+    })
+    assert response.status_code == 400
+
+
+def test_retry_counts_a_donation_its_crashed_attempt_left_unapplied(http, server, make_wish):
+    wish = make_wish()
+    payment_id = f"PAY-{wish['id']}"
+    event = {"transaction_id": "t", "payment_id": payment_id, "purpose": "donation", "wish_id": wish["id"],
+             "amount": 4.0, "currency": "EUR"}
+    # Claimed in the ledger, then the worker died before the $inc
+    server.storage.ledger.record({"id": "t", "payment_id": payment_id, "currency": "EUR"}, {wish["id"]: 4.0})
+
+    server.settle_payment(event)
+    server.settle_payment(event)
+
+    assert server.storage.wishes.get(wish["id"])["donations_received"] == 4.0
+    (entry,) = server.storage.ledger.for_wish(wish["id"])
+    assert entry["applied"] is True
+    assert "applied_payments" not in server.storage.wishes.get(wish["id"])
+
+
+def test_wish_needing_nothing_is_refused_and_old_ones_still_settle(http, server, make_wish):
+    response = http.post("/api/wishes", json={
+        "title": "Free", "description": "Nothing needed", "amount_needed": 0, "currency": "EUR",
+        "category": "Other", "creator_name": "Creator", "creator_email": "creator@example.com"
+    })
+    assert response.status_code == 422
+
+    wish = make_wish()
+    server.db.wishes.update_one({"id": wish["id"]}, {"$set": {"amount_needed": 0}})
+    server.settle_payment({"transaction_id": "t", "payment_id": f"PAY-zero-{wish['id']}", "purpose": "donation",
+                           "wish_id": wish["id"], "amount": 1.0, "currency": "EUR"})
+    assert server.storage.wishes.get(wish["id"])["status"] == "fulfilled"
+
+
+def test_execute_after_capture_is_never_throttled(http, server, make_wish, settle, monkeypatch):
+    wish = make_wish()
+    payment_id = http.post("/api/payments/create", json={
+        "amount": 5.0, "currency": "EUR", "purpose": "donation", "wish_id": wish["id"],
+        "return_url": "http://localhost/return", "cancel_url": "http://localhost/cancel"
+    }).json()["payment_id"]
+    # PayPal captured it, then recording the result failed
+    server.execute_paypal_payment(server.find_paypal_payment(payment_id), "PYTEST")
+    monkeypatch.setattr(server, "RISK_THROTTLE_SCORE", 0.0)
+
+    response = http.post("/api/payments/execute", params={"payment_id": payment_id, "payer_id": "PYTEST"})
+
+    assert response.status_code == 200, response.text
+    settle(payment_id)
+    assert server.storage.transactions.get_by_payment_id(payment_id)["status"] == "completed"
+
+
+def test_execute_is_throttled_before_any_money_moves(http, server, make_wish, monkeypatch):
+    wish = make_wish()
+    payment_id = http.post("/api/payments/create", json={
+        "amount": 5.0, "currency": "EUR", "purpose": "donation", "wish_id": wish["id"],
+        "return_url": "http://localhost/return", "cancel_url": "http://localhost/cancel"
+    }).json()["payment_id"]
+    monkeypatch.setattr(server, "RISK_THROTTLE_SCORE", 0.0)
+
+    response = http.post("/api/payments/execute", params={"payment_id": payment_id, "payer_id": "PYTEST"})
+
+    assert response.status_code == 429
+    assert server.find_paypal_payment(payment_id).state == "created"
@@ -0,0 +1,133 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from payouts import PayoutScheduler
+from storage import MemoryClient
+
+
+@pytest.fixture
+def scheduler(server):
+    db = MemoryClient()["test"]
+    return PayoutScheduler(db, server.paypal_sdk, server.metrics, batch_size=2, poll_interval=0)
+
+
+def fulfilled_wish(scheduler, receiver, amount=25.0):
+    wish_id = str(uuid.uuid4())
+    scheduler.wishes.insert_one({
+        "id": wish_id, "title": "Paid out", "status": "fulfilled", "donations_received": amount,
+        "currency": "eur", "creator_email": "contact@example.com", "creator_paypal": receiver
+    })
+    return wish_id
+
+
+def payout_of(scheduler, wish_id):
+    return scheduler.payouts.find_one({"wish_id": wish_id})
+
+
+def test_fulfilled_wishes_are_paid_out_in_batches(scheduler):
+    outcomes = {
+        fulfilled_wish(scheduler, "paid@example.com"): "SUCCESS",
+        fulfilled_wish(scheduler, "someone-unclaimed@example.com"): "UNCLAIMED",
+        fulfilled_wish(scheduler, "someone-fail@example.com"): "FAILED",
+    }
+    for _ in range(4):
+        asyncio.run(scheduler.tick())
+
+    assert {wish_id: payout_of(scheduler, wish_id)["status"] for wish_id in outcomes} == outcomes
+    assert [batch["items"] for batch in scheduler.batches.find({})] == [2, 1]
+    assert payout_of(scheduler, next(iter(outcomes)))["currency"] == "EUR"
+    assert scheduler.summary()["payouts"] == {"SUCCESS": 1, "UNCLAIMED": 1, "FAILED": 1}
+    # Queued once: another tick pays nobody twice
+    asyncio.run(scheduler.tick())
+    assert scheduler.payouts.count_documents({}) == 3
+
+
+def test_resending_a_batch_paypal_accepted_needs_review(scheduler):
+    wish_id = fulfilled_wish(scheduler, "paid@example.com")
+    scheduler.queue_fulfilled()
+    scheduler.submit_batch()
+    batch = scheduler.batches.find_one({})
+    assert batch["status"] == "PENDING"
+
+    # As if the answer had been lost: the resend reuses the sender_batch_id
+    scheduler.batches.update_one({"id": batch["id"]}, {"$set": {
+        "status": "SUBMITTING", "retry_at": datetime.utcnow() - timedelta(seconds=1)
+    }})
+    assert scheduler.resend_submitting() == 1
+
+    assert scheduler.batches.find_one({"id": batch["id"]})["status"] == "UNCONFIRMED"
+    assert payout_of(scheduler, wish_id)["status"] == "unconfirmed"
+    assert scheduler.submit_batch() == 0
+
+
+def test_unknown_outcome_is_resent_under_the_same_id(scheduler):
+    wish_id = fulfilled_wish(scheduler, "paid@example.com")
+    scheduler.queue_fulfilled()
+    now = datetime.utcnow()
+    # A worker recorded the batch and died before PayPal saw it
+    scheduler.payouts.update_many({}, {"$set": {"status": "claimed", "batch_id": "lost", "updated_at": now}})
+    scheduler.batches.insert_one({"id": "lost", "status": "SUBMITTING", "items": 1, "total": 25.0, "attempts": 1,
+                                  "retry_at": now - timedelta(seconds=1), "created_at": now, "updated_at": now})
+
+    assert scheduler.resend_submitting() == 1
+
+    batch = scheduler.batches.find_one({"id": "lost"})
+    assert (batch["status"], batch["attempts"]) == ("PENDING", 2)
+    assert payout_of(scheduler, wish_id)["status"] == "submitted"
+
+
+def test_claims_without_a_batch_go_back_to_the_queue(scheduler):
+    orphan, recorded = fulfilled_wish(scheduler, "a@example.com"), fulfilled_wish(scheduler, "b@example.com")
+    scheduler.queue_fulfilled()
+    stale = datetime.utcnow() - timedelta(seconds=scheduler.claim_timeout + 1)
+    scheduler.payouts.update_one({"wish_id": orphan}, {"$set": {
+        "status": "claimed", "batch_id": "never-recorded", "updated_at": stale
+    }})
+    scheduler.payouts.update_one({"wish_id": recorded}, {"$set": {
+        "status": "claimed", "batch_id": "recorded", "updated_at": stale
+    }})
+    scheduler.batches.insert_one({"id": "recorded", "status": "SUBMITTING"})
+
+    assert scheduler.release_stale_claims() == 1
+
+    assert payout_of(scheduler, orphan)["status"] == "queued"
+    assert "batch_id" not in payout_of(scheduler, orphan)
+    assert payout_of(scheduler, recorded)["status"] == "claimed"
+
+
+def test_donations_after_the_payout_are_paid_out_as_a_top_up(scheduler):
+    wish_id = fulfilled_wish(scheduler, "paid@example.com")
+    scheduler.queue_fulfilled()
+    # What add_donations does for a wish that is already fulfilled
+    scheduler.wishes.update_one({"id": wish_id}, {"$inc": {"donations_received": 7.5}, "$set": {"payout_due": True}})
+
+    assert scheduler.queue_fulfilled() == 1
+    assert scheduler.queue_fulfilled() == 0
+
+    payouts = list(scheduler.payouts.find({"wish_id": wish_id}).sort("sequence", 1))
+    assert [(payout["sequence"], payout["amount"]) for payout in payouts] == [(0, 25.0), (1, 7.5)]
+    assert "payout_due" not in scheduler.wishes.find_one({"id": wish_id})
+
+
+def test_wishes_without_a_receiver_stay_unqueued_and_are_reported(scheduler):
+    wish_id = fulfilled_wish(scheduler, None)
+    scheduler.wishes.update_one({"id": wish_id}, {"$unset": {"creator_email": ""}})
+
+    assert scheduler.queue_fulfilled() == 0
+
+    assert "payout_queued_at" not in scheduler.wishes.find_one({"id": wish_id})
+    assert scheduler.summary()["no_receiver"] == [wish_id]
+
+
+def test_late_donations_mark_the_payout_due(server, make_wish, pay):
+    wish = make_wish(amount_needed=10.0)
+    pay(purpose="posting_fee", wish_id=wish["id"], amount=2.0, currency="EUR")
+    pay(purpose="donation", wish_id=wish["id"], amount=10.0, currency="EUR")
+    assert "payout_due" not in server.storage.wishes.get(wish["id"])
+
+    pay(purpose="donation", wish_id=wish["id"], amount=3.0, currency="EUR")
+
+    assert server.storage.wishes.get(wish["id"])["payout_due"] is True
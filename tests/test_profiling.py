@@ -0,0 +1,50 @@
+import threading
+import time
+from collections import Counter
+
+from profiling import RequestProfiler, StackSampler
+
+ADMIN = {"X-Admin-Token": "pytest"}
+
+
+def busy(seconds):
+    until = time.monotonic() + seconds
+    while time.monotonic() < until:
+        sum(range(100))
+
+
+def test_an_admin_can_profile_a_request(http):
+    response = http.get("/api/statistics", headers={"X-Profile": "1", **ADMIN})
+    profile_id = response.headers["X-Profile-Id"]
+
+    (profile,) = [profile for profile in http.get("/api/admin/profiles", headers=ADMIN).json()
+                  if profile["id"] == profile_id]
+    assert profile["route"] == "/api/statistics"
+    assert http.get(f"/api/admin/profiles/{profile_id}", headers=ADMIN).status_code == 200
+
+
+def test_profiling_needs_the_admin_token(http):
+    response = http.get("/api/statistics", headers={"X-Profile": "1", "X-Admin-Token": "wrong"})
+
+    assert "X-Profile-Id" not in response.headers
+
+
+def test_a_long_request_stops_collecting_after_max_duration():
+    sampler = StackSampler(interval=0.001)
+    stacks = Counter()
+    sampler.start(stacks, threading.get_ident(), max_duration=0.05)
+    busy(0.15)
+    collected = sum(stacks.values())
+    busy(0.1)
+
+    assert collected > 0
+    assert sum(stacks.values()) == collected
+    sampler.stop(stacks)
+
+
+def test_excluded_routes_are_never_sampled():
+    profiler = RequestProfiler(sample_every=1, exclude={"/api/events"})
+
+    assert not profiler.should_sample("/api/events")
+    assert profiler.should_sample("/api/wishes")
+    assert "/api/events" not in profiler.route_seen
@@ -0,0 +1,41 @@
+from rate_limit import RateLimiter, TokenBuckets
+from storage import MemoryClient
+
+
+def test_a_bucket_allows_its_burst_then_refills_at_its_rate():
+    buckets = TokenBuckets(rate=0.5, burst=2)
+
+    assert [buckets.take("client", now=100.0) for _ in range(3)] == [0.0, 0.0, 2.0]
+    assert buckets.take("client", now=101.0) == 1.0
+    assert buckets.take("client", now=104.0) == 0.0
+    assert buckets.take("someone-else", now=104.0) == 0.0
+
+
+def test_an_evicted_client_starts_over_with_a_full_bucket():
+    buckets = TokenBuckets(rate=0.01, burst=1, capacity=2)
+    buckets.take("a", now=0.0)
+    buckets.take("b", now=0.0)
+    buckets.take("c", now=0.0)
+
+    assert list(buckets.slots) == ["b", "c"]
+    assert buckets.take("a", now=0.0) == 0.0
+
+
+def test_local_buckets_take_over_when_the_shared_ones_fail():
+    # The memory backend has no pipeline updates, like a MongoDB that cannot be reached
+    limiter = RateLimiter({"wishes": (1 / 60, 1)}, collection=MemoryClient()["test"].rate_limits)
+
+    assert limiter.check("wishes", "10.0.0.1") == 0
+    assert limiter.check("wishes", "10.0.0.1") == 60
+
+
+def test_clients_over_the_limit_get_429_with_retry_after(http, server, monkeypatch):
+    monkeypatch.setattr(server, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(server, "rate_limiter", RateLimiter({"wishes": (1 / 60, 1), "payments": (1, 1)}))
+    wish = {"title": "Rate limited", "description": "Posted twice", "amount_needed": 10.0, "currency": "EUR",
+            "category": "Other", "creator_name": "Creator", "creator_email": "creator@example.com"}
+
+    assert http.post("/api/wishes", json=wish).status_code == 200
+    refused = http.post("/api/wishes", json=wish)
+    assert refused.status_code == 429
+    assert refused.headers["Retry-After"] == "60"
@@ -0,0 +1,40 @@
+from similarity import WishIndex
+
+WISHES = [
+    {"id": "laptop", "title": "Laptop for coding school", "description": "A used laptop so I can learn programming"},
+    {"id": "notebook", "title": "Programming laptop", "description": "Need a laptop for my programming course"},
+    {"id": "surgery", "title": "Knee surgery", "description": "Help me pay for surgery on my knee"},
+    {"id": "wheelchair", "title": "Wheelchair", "description": "A wheelchair after my knee surgery"},
+    {"id": "guitar", "title": "Guitar lessons", "description": "Lessons to learn the guitar"},
+]
+
+
+def test_wishes_worded_alike_rank_first_and_the_query_wish_is_left_out():
+    index = WishIndex.build(WISHES, dim=2 ** 12)
+
+    ranked = index.candidates(WISHES[0]["title"], WISHES[0]["description"], limit=2, exclude="laptop")
+
+    assert [wish_id for wish_id, _ in ranked][0] == "notebook"
+    assert "laptop" not in [wish_id for wish_id, _ in ranked]
+    assert all(0 < score <= 1.0001 for _, score in ranked)
+    assert index.candidates("", "", limit=3) == []
+
+
+def test_a_saved_index_answers_like_the_built_one(tmp_path):
+    index = WishIndex.build(WISHES, dim=2 ** 12)
+    path = str(tmp_path / "wish_index.npz")
+    index.save(path)
+
+    loaded = WishIndex.load(path)
+    assert loaded.candidates("knee surgery", "", limit=2) == index.candidates("knee surgery", "", limit=2)
+
+
+def test_wishes_added_after_the_build_are_found_and_survive_a_rebuild():
+    index = WishIndex.build(WISHES, dim=2 ** 12)
+    index.add({"id": "ukulele", "title": "Ukulele lessons", "description": "Lessons for the ukulele"})
+    assert "ukulele" in [wish_id for wish_id, _ in index.candidates("ukulele", "", limit=3)]
+
+    rebuilt = WishIndex.build(WISHES, dim=2 ** 12)
+    rebuilt.adopt(index)
+    assert rebuilt.stats()["added"] == 1
+    assert "ukulele" in [wish_id for wish_id, _ in rebuilt.candidates("ukulele", "", limit=3)]
@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+from slow_ops import SlowOperationLog, filter_shape, redact
+
+
+def command_events(request_id, command_name, command, duration_ms, reply):
+    started = SimpleNamespace(request_id=request_id, command_name=command_name, command=command,
+                              database_name="wishplatform")
+    succeeded = SimpleNamespace(request_id=request_id, command_name=command_name,
+                                duration_micros=duration_ms * 1000, reply=reply)
+    return started, succeeded
+
+
+class ExplainingClient:
+    """Answers explain like a server that scanned the whole collection"""
+
+    def __getitem__(self, database_name):
+        return self
+
+    def command(self, name, command, verbosity):
+        return {"executionStats": {"totalDocsExamined": 5000, "totalKeysExamined": 0, "nReturned": 2}}
+
+
+def test_filters_keep_their_shape_but_lose_their_values():
+    assert redact({"creator_email": "someone@example.com", "amount": {"$gte": 5}}) == \
+        {"creator_email": "?", "amount": {"$gte": "?"}}
+    assert filter_shape("aggregate", {"pipeline": [{"$match": {"status": "paid"}}, {"$group": {"_id": "$x"}}]}) == \
+        [{"$match": {"status": "?"}}, {"$group": "..."}]
+
+
+def test_only_commands_above_the_threshold_are_kept():
+    log = SlowOperationLog(threshold_ms=50, explain_sample_rate=0)
+    for request_id, duration_ms in [(1, 10), (2, 80)]:
+        started, succeeded = command_events(request_id, "find", {"find": "wishes", "filter": {"status": "active"}},
+                                            duration_ms, {"cursor": {"firstBatch": [{}, {}]}})
+        log.started(started)
+        log.succeeded(succeeded)
+
+    (record,) = log.snapshot()
+    assert (record["route"], record["collection"], record["duration_ms"]) == ("background", "wishes", 80)
+    assert (record["filter"], record["docs_returned"]) == ({"status": "?"}, 2)
+
+
+def test_sampled_slow_commands_are_explained_in_the_background():
+    log = SlowOperationLog(threshold_ms=50, explain_sample_rate=1)
+    log.attach(ExplainingClient())
+    started, succeeded = command_events(1, "find", {"find": "wishes", "filter": {}, "lsid": {"id": "x"}}, 80, None)
+    log.started(started)
+    log.failed(succeeded)
+    log._explainer.shutdown(wait=True)
+
+    (record,) = log.snapshot()
+    assert record["failed"] is True
+    assert (record["docs_examined"], record["docs_returned"]) == (5000, 2)
@@ -0,0 +1,51 @@
+from datetime import datetime
+
+import pytest
+
+from storage import MemoryClient, Storage, empty_category_stats
+
+
+@pytest.fixture
+def storage():
+    storage = Storage(MemoryClient()["test"])
+    storage.wishes.collection.insert_many([
+        {"id": "a", "category": "Education", "status": "active", "payment_status": "paid", "currency": "eur",
+         "donations_received": 10.0, "fulfillment_percentage": 20.0, "created_at": datetime(2025, 1, 1)},
+        {"id": "b", "category": "Education", "status": "fulfilled", "payment_status": "paid", "currency": "EUR",
+         "donations_received": 40.0, "fulfillment_percentage": 100.0, "created_at": datetime(2025, 1, 2)},
+        {"id": "c", "category": "Travel", "status": "active", "payment_status": "paid", "currency": "USD",
+         "donations_received": 5.0, "fulfillment_percentage": 10.0, "created_at": datetime(2025, 1, 3)},
+        {"id": "d", "category": "Health", "status": "active", "payment_status": "pending", "currency": "EUR",
+         "donations_received": 0.0, "created_at": datetime(2025, 1, 4)},
+    ])
+    return storage
+
+
+def test_raised_by_currency_groups_case_insensitively(storage):
+    assert storage.wishes.raised_by_currency({"payment_status": "paid"}) == {"EUR": 50.0, "USD": 5.0}
+    assert storage.wishes.raised_by_currency({"status": "fulfilled"}) == {"EUR": 40.0}
+
+
+def test_category_stats_matches_the_pipeline(storage):
+    categories, overall = storage.wishes.category_stats(["Education", "Health", "Other"], "Other")
+
+    assert categories["Education"] == {
+        "wishes": 2, "active": 1, "paid": 2, "fulfilled": 1, "raised": {"EUR": 50.0}, "average_fulfillment": 60.0
+    }
+    # Unknown categories count towards the fallback
+    assert categories["Other"]["wishes"] == 1
+    assert categories["Other"]["raised"] == {"USD": 5.0}
+    # Unpaid wishes are counted but neither raise money nor average in
+    assert categories["Health"] == {
+        "wishes": 1, "active": 1, "paid": 0, "fulfilled": 0, "raised": {}, "average_fulfillment": None
+    }
+    assert overall == {
+        "wishes": 4, "active": 3, "paid": 3, "fulfilled": 1, "raised": {"EUR": 50.0, "USD": 5.0},
+        "average_fulfillment": pytest.approx(130 / 3)
+    }
+
+
+def test_category_stats_of_no_wishes():
+    categories, overall = Storage(MemoryClient()["empty"]).wishes.category_stats(["Other"], "Other")
+    assert categories == {}
+    assert overall == empty_category_stats()
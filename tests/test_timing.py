@@ -0,0 +1,36 @@
+from timing import RequestTimings, _current, record, span, timed
+
+
+def test_spans_cost_nothing_outside_a_sampled_request():
+    @timed("work")
+    def work():
+        return 42
+
+    with span("outside"):
+        record("mongo", 1.0)
+    assert work() == 42
+    assert _current.get() is None
+
+
+def test_repeated_spans_are_summed_with_a_call_count():
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        record("mongo", 0.002)
+        record("mongo", 0.003)
+        with span("paypal_execute"):
+            pass
+    finally:
+        _current.reset(token)
+
+    header = timings.header_value(0.01)
+    assert header.startswith('mongo;dur=5.00;desc="2 calls", paypal_execute;dur=')
+    assert header.endswith("total;dur=10.00")
+
+
+def test_admins_get_a_server_timing_header(http, make_wish):
+    wish = make_wish()
+
+    timed_response = http.get(f"/api/wishes/{wish['id']}", headers={"X-Admin-Token": "pytest"})
+    assert "total;dur=" in timed_response.headers["Server-Timing"]
+    assert "Server-Timing" not in http.get(f"/api/wishes/{wish['id']}").headers